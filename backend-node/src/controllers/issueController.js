@@ -1,3 +1,4 @@
+const mongoose = require('mongoose');
 const Issue = require('../models/Issue');
 const Newsletter = require('../models/Newsletter');
 const Paper = require('../models/Paper'); // Import Paper model
@@ -8,7 +9,7 @@ const Reading = require('../models/Reading'); // Import Reading model
 // Create a new issue for a newsletter
 exports.createIssue = async (req, res) => {
   try {
-    const { newsletterId, title, publicationDate, summary, introduction, conclusion, contentMarkdown, status } = req.body; // Get newsletterId from body
+    const { newsletterId, title, publicationDate, summary, introduction, conclusion, contentMarkdown, status, idempotencyKey } = req.body; // Get newsletterId from body
 
     // Verify that the newsletter exists
     const newsletter = await Newsletter.findById(newsletterId);
@@ -16,7 +17,7 @@ exports.createIssue = async (req, res) => {
       return res.status(404).json({ message: 'Newsletter not found' });
     }
 
-    const newIssue = new Issue({
+    const fields = {
       newsletterId,
       title,
       publicationDate,
@@ -26,7 +27,20 @@ exports.createIssue = async (req, res) => {
       contentMarkdown,
       issueFormat: newsletter.issueFormat ?? 'classic',
       status,
-    });
+    };
+
+    // A retried or resumed run sends the same key: return the issue it already created
+    if (idempotencyKey) {
+      const result = await Issue.findOneAndUpdate(
+        { idempotencyKey },
+        { $setOnInsert: { ...fields, idempotencyKey } },
+        { upsert: true, new: true, runValidators: true, setDefaultsOnInsert: true, includeResultMetadata: true }
+      );
+      const created = !result.lastErrorObject?.updatedExisting;
+      return res.status(created ? 201 : 200).json(result.value);
+    }
+
+    const newIssue = new Issue(fields);
     await newIssue.save();
     res.status(201).json(newIssue);
   } catch (error) {
@@ -231,6 +245,67 @@ exports.getConsecutiveUnreadCount = async (req, res) => {
   }
 };
 
+// Consecutive unread counts of many (newsletterId, userId) pairs, so the Python worker
+// doesn't need one request per newsletter
+exports.getConsecutiveUnreadCounts = async (req, res) => {
+  try {
+    const { pairs = [] } = req.body;
+    const newsletterIds = pairs.map(p => p.newsletterId);
+    const newsletters = await Newsletter.find({ _id: { $in: newsletterIds } }, 'reactivatedAt').lean();
+    const reactivated = newsletters.filter(n => n.reactivatedAt);
+    const reactivatedIds = new Set(reactivated.map(n => String(n._id)));
+
+    // The 5 latest issues of each newsletter since its last reactivation
+    const latestIssues = await Issue.aggregate([
+      { $match: { $or: [
+        { newsletterId: { $in: newsletterIds.filter(id => !reactivatedIds.has(String(id))).map(id => new mongoose.Types.ObjectId(id)) } },
+        ...reactivated.map(n => ({ newsletterId: n._id, publicationDate: { $gte: n.reactivatedAt } })),
+      ] } },
+      { $sort: { publicationDate: -1 } },
+      { $group: { _id: '$newsletterId', issueIds: { $push: '$_id' } } },
+      { $project: { issueIds: { $slice: ['$issueIds', 5] } } },
+    ]);
+    const issuesByNewsletter = new Map(latestIssues.map(g => [String(g._id), g.issueIds]));
+
+    const readings = await Reading.find({
+      issueId: { $in: latestIssues.flatMap(g => g.issueIds) },
+      userId: { $in: pairs.map(p => p.userId) },
+    }, 'issueId userId').lean();
+    const read = new Set(readings.map(r => `${r.issueId}:${r.userId}`));
+
+    const counts = {};
+    for (const { newsletterId, userId } of pairs) {
+      let count = 0;
+      for (const issueId of issuesByNewsletter.get(String(newsletterId)) || []) {
+        if (read.has(`${issueId}:${userId}`)) break;
+        count++;
+      }
+      counts[newsletterId] = count;
+    }
+    res.json({ counts });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
+// Date of the latest issue of many newsletters (publication date, or creation date)
+exports.getLatestIssueDates = async (req, res) => {
+  try {
+    const { newsletterIds = [] } = req.body;
+    const latest = await Issue.aggregate([
+      { $match: { newsletterId: { $in: newsletterIds.map(id => new mongoose.Types.ObjectId(id)) } } },
+      { $group: { _id: '$newsletterId', publicationDate: { $max: '$publicationDate' }, createdAt: { $max: '$createdAt' } } },
+    ]);
+    const dates = {};
+    for (const group of latest) {
+      dates[String(group._id)] = group.publicationDate || group.createdAt;
+    }
+    res.json({ dates });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
 exports.getIssueReadStatus = async (req, res) => {
   try {
     if (!req.auth || !req.auth.payload || !req.auth.payload.sub) {
@@ -1,8 +1,10 @@
+const mongoose = require('mongoose');
 const Newsletter = require('../models/Newsletter');
 const User = require('../models/User');
 const Issue = require('../models/Issue'); // Import Issue model
 const Paper = require('../models/Paper'); // Import Paper model
 const Reading = require('../models/Reading'); // Import Reading model
+const WorkerShard = require('../models/WorkerShard');
 const nodemailer = require('nodemailer');
 require('dotenv').config();
 
@@ -134,40 +136,82 @@ exports.getAuthenticatedUserNewsletters = async (req, res) => {
 };
 
 // Get all newsletters (admin only or backend)
+//
+// Optional query parameters, used by the Python worker:
+// - status: only the newsletters with this status
+// - updatedSince: only the newsletters updated after this date (incremental sync)
+// - dueBefore: only the newsletters due before this date (last search, or latest issue, plus frequency)
+// - fields: comma-separated fields to return (`_id` is always returned)
+// - limit / after: pages of `limit` newsletters ordered by ID, after the `after` ID. The response is
+//   then `{ newsletters, nextCursor }`, with a null cursor on the last page.
+const FREQUENCY_DAYS = { weekly: 7, biweekly: 14, monthly: 30 };
+const DAY_MS = 24 * 60 * 60 * 1000;
+
 exports.getAllNewsletters = async (req, res) => {
   try {
-    const newsletters = await Newsletter.aggregate([
-      {
-        $lookup: {
-          from: 'users',
-          localField: 'userId',
-          foreignField: '_id',
-          as: 'userDetails',
-        },
-      },
-      {
-        $lookup: {
+    const { status, updatedSince, dueBefore, ids, fields, after } = req.query;
+    const limit = req.query.limit ? Math.min(parseInt(req.query.limit), 1000) : null;
+    const projection = fields ? fields.split(',').map(f => f.trim()).filter(Boolean) : null;
+    const wants = (field) => !projection || projection.includes(field);
+
+    const match = {};
+    if (status) match.status = status;
+    if (updatedSince) match.updatedAt = { $gt: new Date(updatedSince) };
+    if (after) match._id = { $gt: new mongoose.Types.ObjectId(after) };
+    if (ids) {
+      // Comma-separated IDs, e.g. the due newsletters of a worker's scheduler
+      match._id = { ...match._id, $in: ids.split(',').filter(Boolean).map(id => new mongoose.Types.ObjectId(id.trim())) };
+    }
+
+    const pipeline = [{ $match: match }, { $sort: { _id: 1 } }];
+    if (wants('creatorName')) {
+      pipeline.push(
+        { $lookup: { from: 'users', localField: 'userId', foreignField: '_id', as: 'userDetails' } },
+        { $addFields: { creatorName: { $arrayElemAt: ['$userDetails.name', 0] } } },
+      );
+    }
+    if (wants('issueCount') || wants('lastIssueDate') || dueBefore) {
+      // Only the count and the latest date of the issues, rather than the issues themselves
+      pipeline.push(
+        { $lookup: {
           from: 'issues',
-          localField: '_id',
-          foreignField: 'newsletterId',
-          as: 'issues',
-        },
-      },
-      {
-        $addFields: {
-          creatorName: { $arrayElemAt: ['$userDetails.name', 0] },
-          issueCount: { $size: '$issues' },
-          lastIssueDate: { $max: '$issues.createdAt' },
-        },
-      },
-      {
-        $project: {
-          userDetails: 0,
-          issues: 0,
-        },
-      },
-    ]);
-    res.json(newsletters);
+          let: { newsletterId: '$_id' },
+          pipeline: [
+            { $match: { $expr: { $eq: ['$newsletterId', '$$newsletterId'] } } },
+            { $group: { _id: null, count: { $sum: 1 }, last: { $max: '$createdAt' } } },
+          ],
+          as: 'issueStats',
+        } },
+        { $addFields: {
+          issueCount: { $ifNull: [{ $arrayElemAt: ['$issueStats.count', 0] }, 0] },
+          lastIssueDate: { $arrayElemAt: ['$issueStats.last', 0] },
+        } },
+      );
+    }
+    if (dueBefore) {
+      pipeline.push(
+        { $addFields: { dueAt: { $add: [
+          { $ifNull: ['$lastSearch', '$lastIssueDate'] },
+          { $multiply: [{ $switch: {
+            branches: Object.entries(FREQUENCY_DAYS).map(([frequency, days]) => ({ case: { $eq: ['$frequency', frequency] }, then: days })),
+            default: FREQUENCY_DAYS.weekly,
+          } }, DAY_MS] },
+        ] } } },
+        // Newsletters that never ran have no due date and are due right away
+        { $match: { $or: [{ dueAt: null }, { dueAt: { $lte: new Date(dueBefore) } }] } },
+      );
+    }
+    if (limit) pipeline.push({ $limit: limit });
+    pipeline.push(projection
+      ? { $project: Object.fromEntries(projection.map(f => [f, 1])) }
+      : { $project: { userDetails: 0, issueStats: 0, dueAt: 0 } });
+
+    const newsletters = await Newsletter.aggregate(pipeline);
+    if (!limit) {
+      return res.json(newsletters);
+    }
+    const nextCursor = newsletters.length === limit ? String(newsletters[newsletters.length - 1]._id) : null;
+    res.json({ newsletters, nextCursor });
   } catch (error) {
     res.status(500).json({ message: error.message });
   }
@@ -189,8 +233,8 @@ exports.getNewsletterById = async (req, res) => {
 // Update a newsletter
 exports.updateNewsletter = async (req, res) => {
   try {
-    const { description, status, rankingStrategy, frequency, issueFormat, queries, lastSearch, filters, inactivityWarningSentAt } = req.body;
-    const update = { description, status, rankingStrategy, frequency, issueFormat, queries, lastSearch, filters, inactivityWarningSentAt };
+    const { description, status, rankingStrategy, frequency, issueFormat, searchEngine, queries, lastSearch, filters, inactivityWarningSentAt } = req.body;
+    const update = { description, status, rankingStrategy, frequency, issueFormat, searchEngine, queries, lastSearch, filters, inactivityWarningSentAt };
 
     if (status === 'active') {
       const current = await Newsletter.findById(req.params.id, 'status');
@@ -330,6 +374,107 @@ exports.resetNewsletterLastSearch = async (req, res) => {
   }
 };
 
+// IDs and DOIs of the papers already published in the issues of a newsletter, so the worker
+// can drop them right after the search
+exports.getPublishedPapers = async (req, res) => {
+  try {
+    const issueIds = await Issue.find({ newsletterId: req.params.id }).distinct('_id');
+    const papers = await Paper.find({ issueId: { $in: issueIds } }, { paperId: 1, doi: 1, _id: 0 }).lean();
+    res.json({
+      paperIds: [...new Set(papers.map(p => p.paperId).filter(Boolean))],
+      dois: [...new Set(papers.map(p => p.doi).filter(Boolean))],
+    });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
+// Leases of the sharded daily cycle: each Python worker claims active newsletters for a few
+// minutes, renews its leases while it processes them and releases them when they are done.
+// A newsletter is claimable when its lease expired (its worker died) and it isn't done.
+const claimableFilter = (now) => ({
+  status: 'active',
+  'lease.expiresAt': { $not: { $gt: now } },
+  'lease.doneUntil': { $not: { $gt: now } },
+});
+
+exports.claimNewsletters = async (req, res) => {
+  try {
+    const { workerId, limit = 1, ttlSeconds = 120 } = req.body;
+    if (!workerId) {
+      return res.status(400).json({ message: 'workerId is required' });
+    }
+    const now = new Date();
+    const newsletters = [];
+    // One atomic update per newsletter, so two workers never claim the same one
+    for (let i = 0; i < Math.min(parseInt(limit), 100); i++) {
+      const newsletter = await Newsletter.findOneAndUpdate(
+        claimableFilter(now),
+        { $set: { 'lease.holder': workerId, 'lease.expiresAt': new Date(now.getTime() + ttlSeconds * 1000) } },
+        { new: true, sort: { lastSearch: 1 } }
+      ).lean();
+      if (!newsletter) break;
+      newsletters.push(newsletter);
+    }
+    const pending = await Newsletter.countDocuments({
+      status: 'active',
+      'lease.holder': { $ne: workerId },
+      'lease.expiresAt': { $gt: now },
+      'lease.doneUntil': { $not: { $gt: now } },
+    });
+    res.json({ newsletters, pending });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
+exports.renewNewsletterLeases = async (req, res) => {
+  try {
+    const { workerId, newsletterIds = [], ttlSeconds = 120 } = req.body;
+    const filter = { _id: { $in: newsletterIds }, 'lease.holder': workerId };
+    await Newsletter.updateMany(filter, { $set: { 'lease.expiresAt': new Date(Date.now() + ttlSeconds * 1000) } });
+    const renewed = await Newsletter.find(filter).distinct('_id');
+    res.json({ renewed: renewed.map(String) });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
+exports.releaseNewsletterLeases = async (req, res) => {
+  try {
+    const { workerId, newsletterIds = [], doneSeconds = 0 } = req.body;
+    const result = await Newsletter.updateMany(
+      { _id: { $in: newsletterIds }, 'lease.holder': workerId },
+      { $set: {
+        'lease.holder': null,
+        'lease.expiresAt': null,
+        'lease.doneUntil': doneSeconds ? new Date(Date.now() + doneSeconds * 1000) : null,
+      } }
+    );
+    res.json({ released: result.modifiedCount });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
+// Records the progress of a worker and returns the progress of the workers seen recently
+exports.workerHeartbeat = async (req, res) => {
+  try {
+    const { workerId, progress = {}, maxAgeSeconds = 360 } = req.body;
+    if (!workerId) {
+      return res.status(400).json({ message: 'workerId is required' });
+    }
+    const now = new Date();
+    await WorkerShard.updateOne({ workerId }, { $set: { progress, heartbeatAt: now } }, { upsert: true });
+    const shards = await WorkerShard.find({ heartbeatAt: { $gt: new Date(now.getTime() - maxAgeSeconds * 1000) } })
+      .sort({ workerId: 1 })
+      .lean();
+    res.json({ shards: shards.map(s => ({ ...s.progress, workerId: s.workerId, heartbeatAt: s.heartbeatAt })) });
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
 exports.countNewsletters = async (req, res) => {
   try {
     const count = await Newsletter.countDocuments();
@@ -46,7 +46,25 @@ exports.getPapersByIssue = async (req, res) => {
 exports.createPapers = async (req, res) => {
   try {
     const papersData = req.body; // expecting an array of paper objects, each with an issueId
-    const createdPapers = await Paper.insertMany(papersData);
+    if (!Array.isArray(papersData) || papersData.length === 0) {
+      return res.status(201).json([]);
+    }
+    // Papers are keyed by (issueId, paperId): without them, they would all collapse onto one document
+    const unkeyed = papersData.filter(paper => !paper.issueId || !paper.paperId);
+    if (unkeyed.length > 0) {
+      return res.status(400).json({ message: `${unkeyed.length} papers have no issueId or paperId.` });
+    }
+    // Upsert on (issueId, paperId), so a retried request doesn't insert the papers twice
+    await Paper.bulkWrite(papersData.map(paper => ({
+      updateOne: {
+        filter: { issueId: paper.issueId, paperId: paper.paperId },
+        update: { $setOnInsert: paper },
+        upsert: true,
+      },
+    })), { ordered: false });
+    const createdPapers = await Paper.find({
+      $or: papersData.map(paper => ({ issueId: paper.issueId, paperId: paper.paperId })),
+    });
     res.status(201).json(createdPapers);
   } catch (error) {
     res.status(500).json({ message: error.message });
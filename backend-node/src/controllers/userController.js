@@ -150,6 +150,17 @@ exports.getUserById = async (req, res) => {
   }
 };
 
+// Email and name of many users at once (used by the Python backend)
+exports.getUsersByIds = async (req, res) => {
+  try {
+    const { ids = [] } = req.body;
+    const users = await User.find({ _id: { $in: ids } }, 'email name').lean();
+    res.status(200).json(users);
+  } catch (error) {
+    res.status(500).json({ message: error.message });
+  }
+};
+
 exports.getUserByAuth0Id = async (req, res) => {
   try {
     const user = await User.findOne({ auth0Id: req.params.auth0Id });
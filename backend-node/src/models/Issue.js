@@ -42,10 +42,18 @@ const IssueSchema = new mongoose.Schema({
     enum: ['useful', 'not_useful', null],
     default: null,
   },
+  // Key of the search window the issue was generated for, set by the Python worker
+  idempotencyKey: {
+    type: String,
+  },
   createdAt: {
     type: Date,
     default: Date.now,
   },
 }, {timestamps: true});
 
+IssueSchema.index({ idempotencyKey: 1 }, { unique: true, sparse: true });
+// Issues of a newsletter, latest first (listing, unread counts, latest issue dates)
+IssueSchema.index({ newsletterId: 1, publicationDate: -1 });
+
 module.exports = mongoose.model('Issue', IssueSchema);
\ No newline at end of file
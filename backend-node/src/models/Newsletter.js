@@ -42,6 +42,11 @@ const NewsletterSchema = new mongoose.Schema({
     enum: ['classic', 'state_of_the_art'],
     default: 'classic'
   },
+  searchEngine: {
+    type: String,
+    enum: ['semantic_scholar', 'openalex', 'all', 'local'],
+    default: 'semantic_scholar'
+  },
   queries: {
     type: [String],
     default: []
@@ -52,6 +57,12 @@ const NewsletterSchema = new mongoose.Schema({
   reactivatedAt: {
     type: Date,
   },
+  // Lease of the Python worker processing the newsletter, when the daily cycle is sharded
+  lease: {
+    holder: { type: String },
+    expiresAt: { type: Date },
+    doneUntil: { type: Date },
+  },
   filters: {
     venues: {
       type: [String],
@@ -87,4 +98,6 @@ const NewsletterSchema = new mongoose.Schema({
   }
 }, {timestamps: true});
 
+NewsletterSchema.index({ status: 1, 'lease.expiresAt': 1 });
+
 module.exports = mongoose.model('Newsletter', NewsletterSchema);
\ No newline at end of file
@@ -14,6 +14,9 @@ const PaperSchema = new mongoose.Schema({
     type: String,
     required: true,
   },
+  doi: {
+    type: String,
+  },
   authors: {
     type: [String],
     default: [],
@@ -46,4 +49,7 @@ const PaperSchema = new mongoose.Schema({
   },
 }, {timestamps: true});
 
+// Papers are upserted on (issueId, paperId), see paperController.createPapers
+PaperSchema.index({ issueId: 1, paperId: 1 }, { unique: true });
+
 module.exports = mongoose.model('Paper', PaperSchema, 'papers');
\ No newline at end of file
@@ -0,0 +1,21 @@
+const mongoose = require('mongoose');
+
+// Progress reported by a Python worker of the sharded daily cycle
+const WorkerShardSchema = new mongoose.Schema({
+  workerId: {
+    type: String,
+    required: true,
+    unique: true,
+  },
+  progress: {
+    type: mongoose.Schema.Types.Mixed,
+    default: {},
+  },
+  heartbeatAt: {
+    type: Date,
+    default: Date.now,
+    expires: 24 * 60 * 60, // Workers gone for a day are forgotten
+  },
+});
+
+module.exports = mongoose.model('WorkerShard', WorkerShardSchema);
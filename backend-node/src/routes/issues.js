@@ -6,6 +6,10 @@ const adminOrBackendCheck = require('../middleware/adminMiddleware');
 // Get consecutive unread issue count for a newsletter + user (admin/backend only)
 router.get('/byNewsletterId/:newsletterId/consecutive-unread/:userId', adminOrBackendCheck, issueController.getConsecutiveUnreadCount);
 
+// Consecutive unread counts of many newsletter + user pairs, and latest issue dates of many newsletters (admin/backend only)
+router.post('/consecutive-unread/bulk', adminOrBackendCheck, issueController.getConsecutiveUnreadCounts);
+router.post('/latest-dates', adminOrBackendCheck, issueController.getLatestIssueDates);
+
 // Get all issues for the authenticated user
 router.get('/', issueController.getIssuesForAuthenticatedUser);
 
@@ -18,6 +18,15 @@ router.get('/all', adminOrBackendCheck, newsletterController.getAllNewsletters);
 // Get newsletters overdue for generation (admin only)
 router.get('/overdue', adminOrBackendCheck, newsletterController.getOverdueNewsletters);
 
+// Leases and heartbeats of the Python workers sharing the daily cycle (admin or backend only)
+router.post('/leases/claim', adminOrBackendCheck, newsletterController.claimNewsletters);
+router.post('/leases/renew', adminOrBackendCheck, newsletterController.renewNewsletterLeases);
+router.post('/leases/release', adminOrBackendCheck, newsletterController.releaseNewsletterLeases);
+router.post('/leases/heartbeat', adminOrBackendCheck, newsletterController.workerHeartbeat);
+
+// IDs and DOIs of the papers already published by a newsletter (admin or backend only)
+router.get('/:id/published-papers', adminOrBackendCheck, newsletterController.getPublishedPapers);
+
 // Reset lastSearch to queue a newsletter for the next worker run (admin only)
 router.post('/:id/reset-last-search', adminOrBackendCheck, newsletterController.resetNewsletterLastSearch);
 
@@ -1,6 +1,7 @@
 const express = require('express');
 const router = express.Router();
 const userController = require('../controllers/userController');
+const adminOrBackendCheck = require('../middleware/adminMiddleware');
 
 // Get all users (admin only)
 router.get('/', userController.getAllUsers);
@@ -25,6 +26,9 @@ router.delete('/saved-papers/:paperId', userController.unsavePaper);
 // Get user by Auth0 ID (used by Python backend)
 router.get('/by-auth0/:auth0Id', userController.getUserByAuth0Id);
 
+// Get the email and name of many users (admin or backend only)
+router.post('/bulk', adminOrBackendCheck, userController.getUsersByIds);
+
 // Get user by ID
 router.get('/:userId', userController.getUserById);
 
@@ -3,6 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from paper_search import SemanticSearch
+from search_cache import CachedSearch, get_search_cache
+from config import SEARCH_CACHE_ENABLED
+from http_client import close_async_http_client
+from author_cache import get_author_cache
+from llm_scheduler import get_llm_scheduler, close_openai_client
 from newsletter_creator import generate_queries
 from datetime import datetime, timedelta
 import logging
@@ -11,7 +16,9 @@ import os
 from contextlib import asynccontextmanager
 from auth import auth_verifier
 from worker_state import worker_state
-from api_client import ApiClient
+from api_client import AsyncApiClient
+from leases import aggregate_shards
+from circuit_breaker import circuit_breaker_stats
 import time
 
 # Configure logging
@@ -33,6 +40,8 @@ async def lifespan(app: FastAPI):
         await loop_task
     except asyncio.CancelledError:
         logging.info("Background newsletter generation loop cancelled.")
+    await close_async_http_client()
+    await close_openai_client()
 
 app = FastAPI(title="My Research Digest Python Service", lifespan=lifespan)
 
@@ -63,7 +72,7 @@ class GenerateQueriesRequest(BaseModel):
 async def generate_queries_endpoint(request: GenerateQueriesRequest, token_payload: dict = Depends(auth_verifier.verify)):
     try:
         logging.info(f"Generating queries for topic: {request.topic}")
-        queries = generate_queries(request.topic, request.description)
+        queries = await generate_queries(request.topic, request.description)
         return {"queries": queries}
     except Exception as e:
         logging.error(f"Error in generate-queries endpoint: {str(e)}")
@@ -74,6 +83,8 @@ async def test_search(request: TestSearchRequest, token_payload: dict = Depends(
     try:
         logging.info(f"Authenticated request from user: {token_payload.get('sub')}")
         searcher = SemanticSearch()
+        if SEARCH_CACHE_ENABLED:
+            searcher = CachedSearch(searcher, get_search_cache())
         
         # Test search for the last 7 days
         now = datetime.now()
@@ -84,18 +95,18 @@ async def test_search(request: TestSearchRequest, token_payload: dict = Depends(
         
         results_by_query = []
         
-        for i, query in enumerate(request.queries):
-            # Respect rate limit (1 request/s)
-            if i > 0:
-                await asyncio.sleep(1)
-                
-            papers = searcher.search(
+        # Queries run concurrently, paced by the rate limiter shared with the worker
+        all_papers = await asyncio.gather(*[
+            searcher.asearch(
                 query=query,
                 start_date=start_date,
                 nb_papers=5, # Limit per query for testing
                 end_date=end_date,
                 filters=filters_dict,
             )
+            for query in request.queries
+        ])
+        for query, papers in zip(request.queries, all_papers):
             results_by_query.append({
                 "query": query,
                 "papers": papers,
@@ -109,11 +120,11 @@ async def test_search(request: TestSearchRequest, token_payload: dict = Depends(
         logging.error(f"Error in test_search endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-_node_api_client = ApiClient(os.getenv('NODE_API_BASE_URL'))
+_node_api_client = AsyncApiClient(os.getenv('NODE_API_BASE_URL'))
 _role_cache: dict = {}  # { auth0_id: (role, expires_at) }
 _ROLE_CACHE_TTL = 300   # 5 minutes
 
-def require_admin(token_payload: dict):
+async def require_admin(token_payload: dict):
     sub = token_payload.get('sub')
     if not sub:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -123,7 +134,7 @@ def require_admin(token_payload: dict):
     if cached and now < cached[1]:
         role = cached[0]
     else:
-        user = _node_api_client.get_user_by_auth0_id(sub)
+        user = await _node_api_client.get_user_by_auth0_id(sub)
         role = user.get('role') if user else None
         _role_cache[sub] = (role, now + _ROLE_CACHE_TTL)
 
@@ -133,23 +144,37 @@ def require_admin(token_payload: dict):
 
 @app.get("/worker/status")
 async def get_worker_status(token_payload: dict = Depends(auth_verifier.verify)):
-    require_admin(token_payload)
+    await require_admin(token_payload)
+    author_cache = get_author_cache()
+    llm_scheduler = get_llm_scheduler()
     return {
         "status": worker_state.status,
         "cycle_started_at": worker_state.cycle_started_at,
         "cycle_completed_at": worker_state.cycle_completed_at,
         "next_cycle_at": worker_state.next_cycle_at,
+        "scheduled_newsletters": worker_state.scheduled_newsletters,
         "total_newsletters": worker_state.total_newsletters,
         "processed_count": worker_state.processed_count,
         "current_newsletter_topic": worker_state.current_newsletter_topic,
         "current_step": worker_state.current_step,
+        "in_progress": list(worker_state.in_progress.values()),
         "cycle_log": worker_state.cycle_log,
+        "search_stats": worker_state.search_stats,
+        "hedge_stats": worker_state.hedge_stats,
+        "llm_batch_stats": worker_state.llm_batch_stats,
+        "api_stats": worker_state.api_stats,
+        "worker_id": worker_state.worker_id,
+        "shards": worker_state.shards,
+        "cluster": aggregate_shards(worker_state.shards) if worker_state.worker_id else None,
+        "author_cache_stats": {**author_cache.stats, "hit_rate": author_cache.hit_rate()},
+        "llm_stats": {**llm_scheduler.stats, **llm_scheduler.limits},
+        "circuit_breakers": circuit_breaker_stats(),
     }
 
 
 @app.post("/worker/trigger")
 async def trigger_worker_cycle(token_payload: dict = Depends(auth_verifier.verify)):
-    require_admin(token_payload)
+    await require_admin(token_payload)
     if worker_state.status == "running":
         raise HTTPException(status_code=409, detail="A cycle is already running")
     worker_state.manual_trigger = True
@@ -158,12 +183,12 @@ async def trigger_worker_cycle(token_payload: dict = Depends(auth_verifier.verif
 
 @app.post("/worker/stop")
 async def stop_worker_cycle(token_payload: dict = Depends(auth_verifier.verify)):
-    require_admin(token_payload)
+    await require_admin(token_payload)
     if worker_state.status != "running":
         raise HTTPException(status_code=409, detail="No cycle is currently running")
     worker_state.should_stop = True
     worker_state.status = "stopping"
-    return {"message": "Stop requested — will halt after current newsletter finishes"}
+    return {"message": "Stop requested — will halt once in-flight newsletters finish"}
 
 
 if __name__ == "__main__":
@@ -1,57 +1,163 @@
+import asyncio
+import random
+import threading
+import httpx
 import requests
 import logging
 import os
 import time
 from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from config import NEWSLETTER_PAGE_SIZE, API_DEADLINE, API_ATTEMPT_TIMEOUT, API_MAX_CONNECTIONS, API_TOKEN_REFRESH_MARGIN
+from http_client import get_api_http_client
+from circuit_breaker import get_circuit_breaker, is_failure_status
+from deadline import remaining as budget_remaining
 
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 AUTH0_AUDIENCE = os.getenv('AUTH0_AUDIENCE')
 AUTH0_CLIENT_ID = os.getenv('AUTH0_PYTHON_CLIENT_ID')
 AUTH0_CLIENT_SECRET = os.getenv('AUTH0_PYTHON_CLIENT_SECRET')
 
+# Transient answers of the Node API, retried until the deadline of the call. The endpoints the
+# worker writes to are idempotent, so POST and PUT calls are retried too
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _call_deadline(deadline):
+    """Monotonic deadline of a call: `deadline` seconds from now, within the time budget of the current newsletter."""
+    seconds = deadline
+    left = budget_remaining()
+    if left is not None:
+        seconds = min(seconds, left)
+    return time.monotonic() + seconds
+
+
+def _token_payload():
+    return {
+        'client_id': AUTH0_CLIENT_ID,
+        'client_secret': AUTH0_CLIENT_SECRET,
+        'audience': AUTH0_AUDIENCE,
+        'grant_type': 'client_credentials'
+    }
+
+
+def _retry_delay(attempt, headers=None):
+    """Seconds before the next attempt: the Retry-After of the answer, else a jittered exponential backoff."""
+    retry_after = headers.get('Retry-After') if headers is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1)
+
+
+class _CallPolicy:
+    """
+    Retry and circuit breaker policy of a call, shared by `ApiClient` and `AsyncApiClient`: each
+    attempt goes through the breaker named `breaker`, and connection errors and transient answers
+    are retried with backoff until `deadline` seconds have passed.
+    """
+    def __init__(self, deadline, breaker):
+        self.deadline_at = _call_deadline(deadline)
+        self.breaker = get_circuit_breaker(breaker)
+        self.attempt = 0
+        self._started = None
+
+    def attempt_timeout(self):
+        """Timeout of the next attempt, None once the deadline passed."""
+        remaining = self.deadline_at - time.monotonic()
+        return min(remaining, API_ATTEMPT_TIMEOUT) if remaining > 0 else None
+
+    def allow(self):
+        """Whether the breaker lets the next attempt through."""
+        self._started = time.monotonic()
+        return self.breaker.allow()
+
+    def record(self, status_code=None):
+        """Records the answer of an attempt (None for a connection error). Returns whether it should be retried."""
+        if status_code is None:
+            self.breaker.record(False)
+            return True
+        self.breaker.record(not is_failure_status(status_code), time.monotonic() - self._started)
+        return status_code in RETRY_STATUSES
+
+    def retry_delay(self, headers=None):
+        """Seconds to wait before the next attempt, None when it would start after the deadline."""
+        delay = _retry_delay(self.attempt, headers)
+        if time.monotonic() + delay >= self.deadline_at:
+            return None
+        self.attempt += 1
+        return delay
+
+
 class ApiClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, deadline=API_DEADLINE):
         self.base_url = base_url
+        self.deadline = deadline
         self.session = requests.Session()
         self.token = None
         self.token_expires_at = 0
-        retry = Retry(
-            total=10,
-            read=5,
-            connect=5,
-            backoff_factor=2,
-            status_forcelist=(429, 500, 502, 503, 504)
-        )
-        adapter = HTTPAdapter(max_retries=retry)
+        # Worker threads call the client concurrently, one of them refreshes the token for all
+        self._token_lock = threading.Lock()
+        # Retries are made by `_request`, within the deadline of each call
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_MAX_CONNECTIONS, max_retries=0)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
 
     def _get_access_token(self):
-        if self.token and time.time() < self.token_expires_at:
+        if self.token and time.time() < self.token_expires_at - API_TOKEN_REFRESH_MARGIN:
             return self.token
+        with self._token_lock:
+            # Another thread may have refreshed the token while this one waited
+            if self.token and time.time() < self.token_expires_at - API_TOKEN_REFRESH_MARGIN:
+                return self.token
+            logging.info("Fetching new Auth0 access token...")
+            try:
+                # Auth0 has its own breaker, so its outages don't open the one of the Node API and the
+                # other way around
+                response = self._request('POST', f"https://{AUTH0_DOMAIN}/oauth/token", breaker="auth0",
+                                         json=_token_payload())
+                response.raise_for_status()
+                token_data = response.json()
+                self.token = token_data['access_token']
+                self.token_expires_at = time.time() + token_data['expires_in']
+                logging.info("Auth0 access token fetched successfully.")
+                return self.token
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error fetching Auth0 access token: {e}")
+                return None
 
-        logging.info("Fetching new Auth0 access token...")
-        token_url = f"https://{AUTH0_DOMAIN}/oauth/token"
-        headers = {'content-type': 'application/json'}
-        payload = {
-            'client_id': AUTH0_CLIENT_ID,
-            'client_secret': AUTH0_CLIENT_SECRET,
-            'audience': AUTH0_AUDIENCE,
-            'grant_type': 'client_credentials'
-        }
-        try:
-            response = requests.post(token_url, headers=headers, json=payload)
-            response.raise_for_status()
-            token_data = response.json()
-            self.token = token_data['access_token']
-            self.token_expires_at = time.time() + token_data['expires_in'] - 300  # Refresh 5 minutes before expiry
-            logging.info("Auth0 access token fetched successfully.")
-            return self.token
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching Auth0 access token: {e}")
-            return None
-        # return "token"
+    def _request(self, method, url, deadline=None, breaker="node_api", **kwargs):
+        """
+        Sends a request, retrying connection errors and transient answers until `deadline` seconds
+        (the client's deadline by default) have passed, through the circuit breaker named `breaker`.
+        Returns the last response.
+        """
+        policy = _CallPolicy(deadline or self.deadline, breaker)
+        response, error = None, None
+        while True:
+            timeout = policy.attempt_timeout()
+            if timeout is None:
+                # The deadline passed while waiting to retry, the last failure stands
+                if response is not None:
+                    return response
+                raise error or requests.exceptions.Timeout(f"Deadline exceeded for {method} {url}")
+            if not policy.allow():
+                raise requests.exceptions.ConnectionError(f"The {breaker} circuit breaker is open")
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+                retry = policy.record(response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                response, error = None, e
+                retry = policy.record()
+            if not retry:
+                return response
+            delay = policy.retry_delay(response.headers if response is not None else None)
+            if delay is None:
+                if response is not None:
+                    return response
+                raise error
+            time.sleep(delay)
 
     def get_user_info(self, user_id):
         """Retrieves the email and name of a user from the backend API."""
@@ -60,7 +166,7 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.get(f"{self.base_url}/users/{user_id}", headers=headers)
+            response = self._request('GET', f"{self.base_url}/users/{user_id}", headers=headers)
             response.raise_for_status()
             user_data = response.json()
             return {'email': user_data.get('email'), 'name': user_data.get('name')}
@@ -68,6 +174,20 @@ class ApiClient:
             logging.error(f"Error retrieving user {user_id} email and name: {e}")
             return None
 
+    def get_users_info(self, user_ids):
+        """Retrieves the email and name of many users in one request, as a dict keyed by user ID."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/users/bulk", json={'ids': list(user_ids)}, headers=headers)
+            response.raise_for_status()
+            return {str(user['_id']): {'email': user.get('email'), 'name': user.get('name')} for user in response.json()}
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error retrieving the email and name of {len(user_ids)} users: {e}")
+            return None
+
     def get_user_by_auth0_id(self, auth0_id):
         """Retrieves a user by their Auth0 ID."""
         token = self._get_access_token()
@@ -75,7 +195,7 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.get(f"{self.base_url}/users/by-auth0/{auth0_id}", headers=headers)
+            response = self._request('GET', f"{self.base_url}/users/by-auth0/{auth0_id}", headers=headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -89,13 +209,55 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.get(f"{self.base_url}/newsletters/all", headers=headers)
+            response = self._request('GET', f"{self.base_url}/newsletters/all", headers=headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logging.error(f"Error retrieving newsletters: {e}")
             return None
 
+    def iter_newsletter_pages(self, status=None, due_before=None, updated_since=None, ids=None, fields=None, page_size=NEWSLETTER_PAGE_SIZE):
+        """
+        Yields the newsletters page by page (lists of at most `page_size`), filtered by `status`,
+        due before `due_before` and updated after `updated_since` (ISO dates) and among `ids`, with only `fields`.
+        Raises a RequestException when a page can't be fetched, so a partial listing isn't taken for a complete one.
+        """
+        params = {'limit': page_size}
+        if status:
+            params['status'] = status
+        if due_before:
+            params['dueBefore'] = due_before
+        if updated_since:
+            params['updatedSince'] = updated_since
+        if ids:
+            params['ids'] = ','.join(str(i) for i in ids)
+        if fields:
+            params['fields'] = ','.join(fields)
+        cursor = None
+        while True:
+            token = self._get_access_token()
+            if not token:
+                raise requests.exceptions.RequestException("No access token to list the newsletters")
+            headers = {'Authorization': f'Bearer {token}'}
+            try:
+                response = self._request('GET', f"{self.base_url}/newsletters/all", headers=headers,
+                                            params={**params, 'after': cursor} if cursor else params)
+                response.raise_for_status()
+                page = response.json()
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error listing newsletters: {e}")
+                raise
+            if page['newsletters']:
+                yield page['newsletters']
+            if not page.get('nextCursor'):
+                return
+            cursor = page['nextCursor']
+
+    def iter_newsletters(self, **filters):
+        """Yields the newsletters one by one, see `iter_newsletter_pages` for the filters."""
+        for page in self.iter_newsletter_pages(**filters):
+            yield from page
+
     def get_latest_issue(self, newsletter_id):
         """Retrieves the latest issue for a given newsletter."""
         token = self._get_access_token()
@@ -103,7 +265,7 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.get(f"{self.base_url}/issues/byNewsletterId/{newsletter_id}?limit=1&sort=-publicationDate", headers=headers)
+            response = self._request('GET', f"{self.base_url}/issues/byNewsletterId/{newsletter_id}?limit=1&sort=-publicationDate", headers=headers)
             response.raise_for_status()
             issues = response.json()
             return issues[0] if issues else None
@@ -122,7 +284,7 @@ class ApiClient:
             return []
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.post(f"{self.base_url}/papers", json=papers, headers=headers)
+            response = self._request('POST', f"{self.base_url}/papers", json=papers, headers=headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -144,7 +306,7 @@ class ApiClient:
         issue_data['newsletterId'] = newsletter_id
         
         try:
-            response = self.session.post(f"{self.base_url}/issues", json=issue_data, headers=headers)
+            response = self._request('POST', f"{self.base_url}/issues", json=issue_data, headers=headers)
             response.raise_for_status()
             logging.info(f"Successfully created issue for newsletter {newsletter_id}")
             return response.json()
@@ -159,16 +321,43 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.get(
-                f"{self.base_url}/issues/byNewsletterId/{newsletter_id}/consecutive-unread/{user_id}",
-                headers=headers
-            )
+            response = self._request('GET', f"{self.base_url}/issues/byNewsletterId/{newsletter_id}/consecutive-unread/{user_id}", headers=headers)
             response.raise_for_status()
             return response.json().get('count', 0)
         except requests.exceptions.RequestException as e:
             logging.error(f"Error getting consecutive unread count for newsletter {newsletter_id}: {e}")
             return None
 
+    def get_consecutive_unread_counts(self, pairs):
+        """Returns the consecutive unread counts of many (newsletter_id, user_id) pairs, as a dict keyed by newsletter ID."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        payload = {'pairs': [{'newsletterId': str(newsletter_id), 'userId': str(user_id)} for newsletter_id, user_id in pairs]}
+        try:
+            response = self._request('POST', f"{self.base_url}/issues/consecutive-unread/bulk", json=payload, headers=headers)
+            response.raise_for_status()
+            return response.json().get('counts', {})
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error getting the consecutive unread counts of {len(pairs)} newsletters: {e}")
+            return None
+
+    def get_latest_issue_dates(self, newsletter_ids):
+        """Returns the date of the latest issue of many newsletters, as a dict keyed by newsletter ID (newsletters without issue are left out)."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/issues/latest-dates",
+                                         json={'newsletterIds': [str(i) for i in newsletter_ids]}, headers=headers)
+            response.raise_for_status()
+            return response.json().get('dates', {})
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error getting the latest issue dates of {len(newsletter_ids)} newsletters: {e}")
+            return None
+
     def update_newsletter(self, newsletter_id, newsletter_data):
         """Updates a newsletter's information."""
         token = self._get_access_token()
@@ -176,10 +365,192 @@ class ApiClient:
             return None
         headers = {'Authorization': f'Bearer {token}'}
         try:
-            response = self.session.put(f"{self.base_url}/newsletters/{newsletter_id}", json=newsletter_data, headers=headers)
+            response = self._request('PUT', f"{self.base_url}/newsletters/{newsletter_id}", json=newsletter_data, headers=headers)
             response.raise_for_status()
             logging.info(f"Successfully updated newsletter {newsletter_id}")
             return response.json()
         except requests.exceptions.RequestException as e:
             logging.error(f"Error updating newsletter {newsletter_id}: {e}")
             return None
+
+    def get_published_papers(self, newsletter_id):
+        """Retrieves the paper IDs and DOIs already published in the issues of a newsletter."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('GET', f"{self.base_url}/newsletters/{newsletter_id}/published-papers", headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error retrieving published papers of newsletter {newsletter_id}: {e}")
+            return None
+
+    def claim_newsletters(self, worker_id, limit, ttl):
+        """Claims up to `limit` active newsletters for `ttl` seconds. Returns the claimed newsletters and the number held by other workers."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/newsletters/leases/claim",
+                                         json={'workerId': worker_id, 'limit': limit, 'ttlSeconds': ttl}, headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error claiming newsletters for worker {worker_id}: {e}")
+            return None
+
+    def renew_newsletter_leases(self, worker_id, newsletter_ids, ttl):
+        """Extends the leases of a worker. Returns the IDs of the newsletters it still holds."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/newsletters/leases/renew",
+                                         json={'workerId': worker_id, 'newsletterIds': newsletter_ids, 'ttlSeconds': ttl}, headers=headers)
+            response.raise_for_status()
+            return response.json().get('renewed', [])
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error renewing the leases of worker {worker_id}: {e}")
+            return None
+
+    def release_newsletter_leases(self, worker_id, newsletter_ids, done_ttl=0):
+        """Releases the leases of a worker, marking the newsletters as done for `done_ttl` seconds."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/newsletters/leases/release",
+                                         json={'workerId': worker_id, 'newsletterIds': newsletter_ids, 'doneSeconds': done_ttl}, headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error releasing the leases of worker {worker_id}: {e}")
+            return None
+
+    def worker_heartbeat(self, worker_id, progress, max_age):
+        """Reports the progress of a worker. Returns the progress of the workers seen in the last `max_age` seconds."""
+        token = self._get_access_token()
+        if not token:
+            return None
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            response = self._request('POST', f"{self.base_url}/newsletters/leases/heartbeat",
+                                         json={'workerId': worker_id, 'progress': progress, 'maxAgeSeconds': max_age}, headers=headers)
+            response.raise_for_status()
+            return response.json().get('shards', [])
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error sending the heartbeat of worker {worker_id}: {e}")
+            return None
+
+
+class AsyncApiClient:
+    """
+    Async client of the Node API for the callers running on the event loop, currently the admin
+    check of the API endpoints. It only has the endpoints they use, with the retry and circuit
+    breaker policy of `ApiClient`. The worker deliberately keeps `ApiClient`, called through
+    `asyncio.to_thread` from the pipeline and from its thread-bound helpers. Requests share the pooled client of
+    `http_client.get_api_http_client`, and each call has an overall `deadline` covering its retries.
+
+    The Auth0 token is refreshed once for all the concurrent callers: the first caller to find it
+    close to expiry starts the refresh in the background and keeps using the current token, and
+    callers finding no valid token wait for that same refresh.
+    """
+    def __init__(self, base_url, deadline=API_DEADLINE):
+        self.base_url = base_url
+        self.deadline = deadline
+        self.token = None
+        self.token_expires_at = 0
+        self._refresh = None
+        self.stats = {"token_refreshes": 0, "retries": 0}
+
+    async def _fetch_token(self):
+        logging.info("Fetching new Auth0 access token...")
+        self.stats["token_refreshes"] += 1
+        # A single attempt, the next caller starts another refresh. Auth0 has its own breaker, see
+        # `ApiClient._get_access_token`
+        policy = _CallPolicy(API_ATTEMPT_TIMEOUT, "auth0")
+        if not policy.allow():
+            logging.error("Error fetching Auth0 access token: the auth0 circuit breaker is open")
+            return None
+        try:
+            try:
+                response = await get_api_http_client().post(f"https://{AUTH0_DOMAIN}/oauth/token", json=_token_payload(),
+                                                            timeout=API_ATTEMPT_TIMEOUT)
+            except httpx.TransportError:
+                policy.record()
+                raise
+            policy.record(response.status_code)
+            response.raise_for_status()
+            token_data = response.json()
+            self.token = token_data['access_token']
+            self.token_expires_at = time.time() + token_data['expires_in']
+            logging.info("Auth0 access token fetched successfully.")
+            return self.token
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            logging.error(f"Error fetching Auth0 access token: {e}")
+            return None
+
+    async def _get_access_token(self, timeout=None):
+        now = time.time()
+        if self.token and now < self.token_expires_at - API_TOKEN_REFRESH_MARGIN:
+            return self.token
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._fetch_token())
+        if self.token and now < self.token_expires_at:
+            # Still valid, the refresh completes in the background
+            return self.token
+        try:
+            # Shielded, so a caller giving up doesn't cancel the refresh of the others
+            return await asyncio.wait_for(asyncio.shield(self._refresh), timeout or self.deadline)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _request(self, method, path, deadline=None, **kwargs):
+        """
+        Sends an authenticated request to the Node API, retried like the requests of `ApiClient`.
+        Returns the response, raises an `httpx.HTTPError` when it isn't successful.
+        """
+        policy = _CallPolicy(deadline or self.deadline, "node_api")
+        response, error = None, None
+        while True:
+            token = await self._get_access_token(timeout=max(policy.deadline_at - time.monotonic(), 0.001))
+            if not token:
+                raise httpx.HTTPError(f"No access token for {method} {path}")
+            timeout = policy.attempt_timeout()
+            if timeout is None:
+                # The deadline passed while waiting to retry, the last failure stands
+                if response is not None:
+                    response.raise_for_status()
+                raise error or httpx.TimeoutException(f"Deadline exceeded for {method} {path}")
+            if not policy.allow():
+                raise httpx.ConnectError("The node_api circuit breaker is open")
+            try:
+                response = await get_api_http_client().request(
+                    method, f"{self.base_url}{path}", headers={'Authorization': f'Bearer {token}'}, timeout=timeout, **kwargs)
+                retry = policy.record(response.status_code)
+            except httpx.TransportError as e:
+                response, error = None, e
+                retry = policy.record()
+            if not retry:
+                response.raise_for_status()
+                return response
+            delay = policy.retry_delay(response.headers if response is not None else None)
+            if delay is None:
+                if response is not None:
+                    response.raise_for_status()
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def get_user_by_auth0_id(self, auth0_id):
+        """Retrieves a user by their Auth0 ID."""
+        try:
+            return (await self._request('GET', f"/users/by-auth0/{auth0_id}")).json()
+        except httpx.HTTPError as e:
+            logging.error(f"Error retrieving user by auth0Id {auth0_id}: {e}")
+            return None
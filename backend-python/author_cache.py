@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import CACHE_DIR, AUTHOR_CACHE_MAX_ENTRIES, AUTHOR_CACHE_TTL, AUTHOR_CACHE_PERSIST
+
+
+class AuthorCache:
+    """
+    Bounded LRU cache of author h-indexes keyed by OpenAlex author ID, with a TTL since
+    h-indexes change slowly.
+
+    When `path` is set, entries are also written to a SQLite file and looked up there on
+    memory misses, so they survive restarts.
+    """
+    def __init__(self, max_entries: int = AUTHOR_CACHE_MAX_ENTRIES, ttl: int = AUTHOR_CACHE_TTL, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS author_h_index (author_id TEXT PRIMARY KEY, h_index INTEGER NOT NULL, fetched_at REAL NOT NULL)")
+
+    def _put(self, author_id: str, h_index: int, fetched_at: float):
+        self._entries[author_id] = (h_index, fetched_at)
+        self._entries.move_to_end(author_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _load(self, author_ids: List[str], now: float) -> Dict[str, Tuple[int, float]]:
+        rows = {}
+        # SQLite limits the number of query parameters, so the IDs are looked up in chunks
+        for i in range(0, len(author_ids), 500):
+            chunk = author_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for author_id, h_index, fetched_at in self._conn.execute(
+                    f"SELECT author_id, h_index, fetched_at FROM author_h_index WHERE author_id IN ({placeholders})", chunk):
+                if now - fetched_at <= self.ttl:
+                    rows[author_id] = (h_index, fetched_at)
+        return rows
+
+    def get_many(self, author_ids: Iterable[str]) -> Tuple[Dict[str, int], List[str]]:
+        """Returns the cached h-indexes and the list of author IDs missing from the cache."""
+        now = time.time()
+        found, misses = {}, []
+        with self._lock:
+            for author_id in dict.fromkeys(author_ids):
+                entry = self._entries.get(author_id)
+                if entry is not None and now - entry[1] <= self.ttl:
+                    self._entries.move_to_end(author_id)
+                    found[author_id] = entry[0]
+                else:
+                    misses.append(author_id)
+            if misses and self._conn is not None:
+                for author_id, (h_index, fetched_at) in self._load(misses, now).items():
+                    self._put(author_id, h_index, fetched_at)
+                    found[author_id] = h_index
+                misses = [author_id for author_id in misses if author_id not in found]
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(misses)
+        return found, misses
+
+    def set_many(self, h_indexes: Dict[str, int]):
+        now = time.time()
+        with self._lock:
+            for author_id, h_index in h_indexes.items():
+                self._put(author_id, h_index, now)
+            if self._conn is not None and h_indexes:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO author_h_index (author_id, h_index, fetched_at) VALUES (?, ?, ?)",
+                        [(author_id, h_index, now) for author_id, h_index in h_indexes.items()])
+                    self._conn.execute("DELETE FROM author_h_index WHERE fetched_at < ?", (now - self.ttl,))
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+
+_author_cache: Optional[AuthorCache] = None
+_author_cache_lock = threading.Lock()
+
+
+def get_author_cache() -> AuthorCache:
+    """Returns the author cache shared by the OpenAlex searches of the process."""
+    global _author_cache
+    with _author_cache_lock:
+        if _author_cache is None:
+            path = os.path.join(CACHE_DIR, "authors.sqlite3") if AUTHOR_CACHE_PERSIST else None
+            _author_cache = AuthorCache(path=path)
+        return _author_cache
@@ -0,0 +1,71 @@
+"""
+Compares the deduplication of search results on a labelled set of papers: the former key on the
+normalized title against DedupIndex (identifiers, then MinHash LSH over the title shingles).
+For each method, reports the pairwise precision and recall of the duplicate pairs, the number of
+unique papers left and the time per paper.
+
+Usage:
+    python benchmark_dedup.py
+    python benchmark_dedup.py --papers labelled.json --thresholds 0.7,0.8,0.9
+
+Papers are read from a JSON list of paper dicts, each one with a "cluster" label shared by the
+copies of the same paper (default: tests/fixtures/dedup_papers.json).
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+from dedup import DedupIndex
+from newsletter_creator import normalize_title
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures", "dedup_papers.json")
+
+
+def title_key_clusters(papers: List[Dict]) -> List[int]:
+    keys = {}
+    return [keys.setdefault(normalize_title(p), len(keys)) for p in papers]
+
+
+def index_clusters(threshold: float) -> Callable[[List[Dict]], List[int]]:
+    def run(papers):
+        index = DedupIndex(threshold=threshold)
+        return [index.add(p) for p in papers]
+    return run
+
+
+def pairwise_scores(labels: List[str], clusters: List[int]) -> Tuple[float, float]:
+    """Precision and recall of the pairs of papers put in the same cluster."""
+    true_pairs = {(i, j) for i, j in itertools.combinations(range(len(labels)), 2) if labels[i] == labels[j]}
+    found_pairs = {(i, j) for i, j in itertools.combinations(range(len(labels)), 2) if clusters[i] == clusters[j]}
+    precision = len(true_pairs & found_pairs) / len(found_pairs) if found_pairs else 1.0
+    recall = len(true_pairs & found_pairs) / len(true_pairs) if true_pairs else 1.0
+    return precision, recall
+
+
+def evaluate(papers: List[Dict], method: Callable[[List[Dict]], List[int]], repeat: int = 20) -> Dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clusters = method(papers)
+    elapsed = (time.perf_counter() - start) / repeat
+    precision, recall = pairwise_scores([p["cluster"] for p in papers], clusters)
+    return {"precision": precision, "recall": recall, "unique": len(set(clusters)), "us_per_paper": elapsed / len(papers) * 1e6}
+
+
+def main(args):
+    with open(args.papers) as f:
+        papers = json.load(f)
+    print(f"{len(papers)} papers, {len({p['cluster'] for p in papers})} distinct papers")
+    methods = [("title key", title_key_clusters)] + [(f"index@{t}", index_clusters(t)) for t in args.thresholds]
+    print(f"{'method':>12} {'precision':>10} {'recall':>8} {'unique':>7} {'us/paper':>9}")
+    for name, method in methods:
+        scores = evaluate(papers, method)
+        print(f"{name:>12} {scores['precision']:>10.0%} {scores['recall']:>8.0%} {scores['unique']:>7} {scores['us_per_paper']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", default=DEFAULT_FIXTURE, help="JSON file holding the labelled papers")
+    parser.add_argument("--thresholds", type=lambda s: [float(t) for t in s.split(",")], default=[0.7, 0.8, 0.9])
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+"""
+Compares the local corpus engine with the remote engines on the same queries. For each engine,
+reports the latency of the searches (median and p95) and the papers found per query, and for
+each remote engine, the share of its papers the local corpus also found (matched on their DOI,
+arXiv and external IDs, or on their normalized titles).
+
+Usage:
+    python benchmark_local_corpus.py --queries "LLM agents" "protein folding" --start-date 2026-01-01
+    python benchmark_local_corpus.py --queries-file queries.txt --engines semantic_scholar,openalex --nb-papers 50
+
+Queries files hold one query per line. The corpus is read from LOCAL_CORPUS_PATH unless --db is given.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Set
+from dedup import paper_identifiers
+from local_corpus import LocalCorpus, LocalCorpusSearch
+from newsletter_creator import normalize_title
+from paper_search import SemanticSearch, OpenAlexSearch
+from http_client import close_async_http_client
+
+REMOTE_ENGINES = {"semantic_scholar": SemanticSearch, "openalex": OpenAlexSearch}
+
+
+def paper_keys(paper: Dict) -> Set[str]:
+    keys = paper_identifiers(paper)
+    if normalize_title(paper):
+        keys.add(f"title:{normalize_title(paper)}")
+    return keys
+
+
+def overlap(local: List[Dict], remote: List[Dict]) -> float:
+    """Share of the remote papers also found by the local corpus."""
+    if not remote:
+        return 1.0
+    local_keys = set().union(*(paper_keys(p) for p in local)) if local else set()
+    return sum(bool(paper_keys(p) & local_keys) for p in remote) / len(remote)
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+async def run(args):
+    queries = list(args.queries or [])
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries += [line.strip() for line in f if line.strip()]
+    engines = {"local": LocalCorpusSearch(LocalCorpus(args.db) if args.db else None)}
+    engines.update({name: REMOTE_ENGINES[name]() for name in args.engines})
+
+    latencies = {name: [] for name in engines}
+    counts = {name: 0 for name in engines}
+    overlaps = {name: [] for name in args.engines}
+    for query in queries:
+        results = {}
+        for name, searcher in engines.items():
+            start = time.perf_counter()
+            results[name] = await searcher.asearch(query, args.start_date, args.nb_papers, end_date=args.end_date)
+            latencies[name].append(time.perf_counter() - start)
+            counts[name] += len(results[name])
+        for name in args.engines:
+            overlaps[name].append(overlap(results["local"], results[name]))
+    await close_async_http_client()
+
+    print(f"{len(queries)} queries, {args.nb_papers} papers per query from {args.start_date}")
+    print(f"{'engine':>17} {'p50 ms':>9} {'p95 ms':>9} {'papers/query':>13} {'overlap':>8}")
+    for name in engines:
+        found = f"{sum(overlaps[name]) / len(overlaps[name]):.0%}" if overlaps.get(name) else "-"
+        print(f"{name:>17} {percentile(latencies[name], 50) * 1000:>9.1f} {percentile(latencies[name], 95) * 1000:>9.1f} "
+              f"{counts[name] / max(len(queries), 1):>13.1f} {found:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", nargs="*", help="Queries to search")
+    parser.add_argument("--queries-file", help="File holding one query per line")
+    parser.add_argument("--start-date", default="2026-01-01")
+    parser.add_argument("--end-date")
+    parser.add_argument("--nb-papers", type=int, default=20)
+    parser.add_argument("--engines", type=lambda s: [e for e in s.split(",") if e], default=["semantic_scholar", "openalex"],
+                        help="Remote engines to compare with, comma-separated")
+    parser.add_argument("--db", help="SQLite file of the local corpus")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,52 @@
+"""
+Compares the relevance filter modes on the same papers: one call per paper against batches
+of K papers per call. For each K, reports the number of LLM calls, the fallbacks to single-paper
+calls, the latency, the throughput and the agreement with the single-paper verdicts.
+
+Usage:
+    python benchmark_relevance.py --topic "LLM agents" --papers papers.json --batch-sizes 4,8,16
+    python benchmark_relevance.py --topic "LLM agents" --start-date 2026-01-01 --batch-sizes 8
+
+Papers are read from a JSON list of {"title", "abstract"} objects, or searched on Semantic Scholar.
+"""
+import argparse
+import asyncio
+import json
+import time
+from newsletter_creator import NewsletterCreator
+
+
+async def run(args):
+    creator = NewsletterCreator(model=args.model)
+    if args.papers:
+        with open(args.papers) as f:
+            papers = json.load(f)
+    else:
+        papers = await creator.search(args.topic, args.description, args.start_date, max_papers=args.max_papers)
+    papers = [p for p in papers if p.get('title') and p.get('abstract')]
+    print(f"{len(papers)} papers, model {args.model}")
+
+    reference = None
+    print(f"{'K':>4} {'calls':>6} {'fallbacks':>10} {'seconds':>8} {'papers/s':>9} {'relevant':>9} {'agreement':>10}")
+    for batch_size in [1] + [k for k in args.batch_sizes if k > 1]:
+        creator.filter_stats = {"calls": 0, "fallbacks": 0}
+        start = time.monotonic()
+        verdicts = [v['is_relevant'] for v in await creator.judge_relevance(args.topic, papers, args.description, batch_size=batch_size)]
+        elapsed = time.monotonic() - start
+        if reference is None:
+            reference = verdicts
+        agreement = sum(a == b for a, b in zip(verdicts, reference)) / len(papers) if papers else 1.0
+        print(f"{batch_size:>4} {creator.filter_stats['calls']:>6} {creator.filter_stats['fallbacks']:>10} {elapsed:>8.1f} "
+              f"{len(papers) / elapsed if elapsed else 0:>9.2f} {verdicts.count('yes'):>9} {agreement:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topic", required=True)
+    parser.add_argument("--description", default="")
+    parser.add_argument("--papers", help="JSON file holding the papers to classify")
+    parser.add_argument("--start-date", default="2026-01-01", help="Start date of the search when --papers is not given")
+    parser.add_argument("--max-papers", type=int, default=50)
+    parser.add_argument("--batch-sizes", type=lambda s: [int(k) for k in s.split(",")], default=[4, 8, 16])
+    parser.add_argument("--model", default="gpt-5-mini")
+    asyncio.run(run(parser.parse_args()))
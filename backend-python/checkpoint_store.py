@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+from config import CACHE_DIR, CHECKPOINT_TTL
+
+
+def idempotency_key(newsletter_id: str, start_date: str, end_date: str) -> str:
+    """Key of the issue of a newsletter for a search window, so retried or resumed persistence can't create it twice."""
+    return f"{newsletter_id}:{start_date}:{end_date}"
+
+
+class NewsletterRun:
+    """
+    The run of a newsletter for one search window, and the outputs of its completed stages.
+    `stage in run` tells whether a stage was checkpointed, since a stage output can be None.
+    """
+    def __init__(self, store: "CheckpointStore", newsletter_id: str, start_date: str, end_date: str):
+        self.store = store
+        self.newsletter_id = newsletter_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.key = idempotency_key(newsletter_id, start_date, end_date)
+
+    def __contains__(self, stage: str) -> bool:
+        return self.store._load(self.key, stage) is not None
+
+    def get(self, stage: str) -> Any:
+        payload = self.store._load(self.key, stage)
+        return json.loads(payload) if payload is not None else None
+
+    def put(self, stage: str, value: Any):
+        self.store._save(self.key, stage, json.dumps(value, default=str))
+
+    def finish(self):
+        """Drops the run and its checkpoints once the issue is delivered."""
+        self.store._finish(self.newsletter_id, self.key)
+
+
+class CheckpointStore:
+    """
+    Persistent checkpoints of the daily cycle, stored in SQLite.
+
+    A newsletter has at most one unfinished run, keyed by its search window. When a cycle is
+    interrupted (restart, /worker/stop), the next cycle resumes the run of the newsletter with
+    the same window, after its last completed stage. Runs older than `ttl` seconds are dropped.
+    """
+    def __init__(self, path: Optional[str] = None, ttl: int = CHECKPOINT_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "checkpoints.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    newsletter_id TEXT PRIMARY KEY,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    started_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    run_key TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_key, stage)
+                )
+            """)
+
+    def _expire(self, now: float):
+        expired = [idempotency_key(*row) for row in self._conn.execute(
+            "SELECT newsletter_id, start_date, end_date FROM runs WHERE started_at < ?", (now - self.ttl,))]
+        self._conn.executemany("DELETE FROM checkpoints WHERE run_key = ?", [(key,) for key in expired])
+        self._conn.execute("DELETE FROM runs WHERE started_at < ?", (now - self.ttl,))
+
+    def has_run(self, newsletter_id: str) -> bool:
+        """Returns whether the newsletter has an unfinished run to resume."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM runs WHERE newsletter_id = ? AND started_at >= ?",
+                                     (newsletter_id, time.time() - self.ttl)).fetchone()
+        return row is not None
+
+    def start_run(self, newsletter_id: str, start_date: str, end_date: str) -> NewsletterRun:
+        """Returns the unfinished run of the newsletter, with its original window, or starts one for the given window."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._expire(now)
+            row = self._conn.execute("SELECT start_date, end_date FROM runs WHERE newsletter_id = ?", (newsletter_id,)).fetchone()
+            if row is not None:
+                start_date, end_date = row
+            else:
+                self._conn.execute("INSERT INTO runs (newsletter_id, start_date, end_date, started_at) VALUES (?, ?, ?, ?)",
+                                   (newsletter_id, start_date, end_date, now))
+        return NewsletterRun(self, newsletter_id, start_date, end_date)
+
+    def _load(self, run_key: str, stage: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM checkpoints WHERE run_key = ? AND stage = ?", (run_key, stage)).fetchone()
+        return row[0] if row else None
+
+    def _save(self, run_key: str, stage: str, payload: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO checkpoints (run_key, stage, payload, created_at) VALUES (?, ?, ?, ?)",
+                               (run_key, stage, payload, time.time()))
+
+    def _finish(self, newsletter_id: str, run_key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE run_key = ?", (run_key,))
+            self._conn.execute("DELETE FROM runs WHERE newsletter_id = ?", (newsletter_id,))
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Returns the checkpoint store shared by the cycles of the process."""
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore()
+        return _checkpoint_store
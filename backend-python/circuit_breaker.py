@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from config import CIRCUIT_BREAKERS_ENABLED, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, CIRCUIT_LATENCY_SLOS
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of an external dependency (a search engine, the Node API).
+
+    Calls are recorded as failures when they error, get a 429/5xx answer or take longer than the
+    latency SLO. After `failure_threshold` consecutive failures the breaker opens: calls fail fast
+    for `reset_timeout` seconds, then a single probe call is let through (half-open). The breaker
+    closes again when the probe succeeds, and reopens when it fails.
+    Thread-safe, since the dependencies are called both from the event loop and from threads.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_SECONDS,
+                 latency_slo: Optional[float] = None, enabled: bool = True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_slo = latency_slo
+        self.enabled = enabled
+        self.state = "closed"  # "closed" | "open" | "half_open"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.stats = {"failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected (open or probing, and not yet due for a probe)."""
+        with self._lock:
+            return self.enabled and self.state != "closed" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a call may go through. Counts the rejected calls."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == "closed":
+                return True
+            # A probe that never reported (e.g. cancelled) is replaced after `reset_timeout` too
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # This call is the probe, the others keep failing fast until it completes
+                self.state = "half_open"
+                self.opened_at = now
+                logging.info(f"Circuit breaker of {self.name} is half-open, probing.")
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, ok: bool, latency: float = 0.0):
+        """Records the outcome of a call, `ok` being False when it errored or got a 429/5xx answer."""
+        if not self.enabled:
+            return
+        slow = self.latency_slo is not None and latency > self.latency_slo
+        with self._lock:
+            if ok and not slow:
+                if self.state != "closed":
+                    logging.info(f"Circuit breaker of {self.name} is closed again.")
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.stats["slow_calls" if ok else "failures"] += 1
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.stats["opened"] += 1
+                logging.warning(f"Circuit breaker of {self.name} opened after {self.failures} failed or slow calls.")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, **self.stats}
+
+
+def is_failure_status(status_code: int) -> bool:
+    """Answers telling that the dependency is degraded, rather than the request being wrong."""
+    return status_code == 429 or status_code >= 500
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Returns the circuit breaker of a dependency, shared by the worker and the API endpoints."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, latency_slo=CIRCUIT_LATENCY_SLOS.get(name), enabled=CIRCUIT_BREAKERS_ENABLED)
+        return _breakers[name]
+
+
+def circuit_breaker_stats() -> Dict[str, Dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
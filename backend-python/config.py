@@ -1,4 +1,173 @@
+import os
+
 FIELDS = "title,authors,abstract,url,publicationVenue,publicationDate," + \
         "citationCount,referenceCount,isOpenAccess,openAccessPdf,authors.authorId," + \
         "authors.name,authors.affiliations,authors.paperCount,authors.citationCount," + \
-        "authors.hIndex,externalIds"
\ No newline at end of file
+        "authors.hIndex,externalIds"
+# Fields of the first search phase, the others are only fetched for the papers kept by the
+# relevance filter (see SEARCH_LAZY_ENRICHMENT)
+LEAN_FIELDS = "title,abstract,url,publicationDate,externalIds"
+
+# Number of concurrent workers for each stage of the daily cycle pipeline
+WORKER_CONCURRENCY = {
+    "checking": int(os.getenv("WORKER_CHECK_CONCURRENCY", 8)),
+    "searching": int(os.getenv("WORKER_SEARCH_CONCURRENCY", 2)),
+    "generating": int(os.getenv("WORKER_LLM_CONCURRENCY", 4)),
+    "persisting": int(os.getenv("WORKER_PERSIST_CONCURRENCY", 2)),
+    "emailing": int(os.getenv("WORKER_EMAIL_CONCURRENCY", 2)),
+}
+# Maximum number of newsletters waiting in front of each stage
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", 4))
+
+# Due-time scheduler of the worker: seconds between two syncs of the newsletters updated since the
+# last one, seconds between two full syncs, and delay before retrying a newsletter that failed
+SCHEDULER_SYNC_SECONDS = int(os.getenv("SCHEDULER_SYNC_SECONDS", 300))
+SCHEDULER_FULL_SYNC_SECONDS = int(os.getenv("SCHEDULER_FULL_SYNC_SECONDS", 24 * 60 * 60))
+SCHEDULER_RETRY_SECONDS = int(os.getenv("SCHEDULER_RETRY_SECONDS", 60 * 60))
+
+# IDs sent per bulk request to the Node API (users, unread counts, latest issue dates)
+API_BULK_SIZE = int(os.getenv("API_BULK_SIZE", 500))
+# Newsletters per page when the worker lists them
+NEWSLETTER_PAGE_SIZE = int(os.getenv("NEWSLETTER_PAGE_SIZE", 200))
+
+# Directory of the local caches (search responses, ...)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+# Sharding of the daily cycle across worker processes or nodes: enabled flag, lease backend ("api" for
+# the Node API, "local" for a SQLite file shared by the processes of a host), worker ID (hostname and
+# PID when empty), lease duration (seconds, renewed every third of it), newsletters claimed per request
+# and seconds a finished newsletter stays done, so the other workers don't process it again in the cycle
+WORKER_SHARDING = os.getenv("WORKER_SHARDING", "false").lower() == "true"
+WORKER_LEASE_BACKEND = os.getenv("WORKER_LEASE_BACKEND", "api")
+WORKER_ID = os.getenv("WORKER_ID", "")
+WORKER_LEASE_TTL = int(os.getenv("WORKER_LEASE_TTL", 120))
+WORKER_LEASE_CLAIM_BATCH = int(os.getenv("WORKER_LEASE_CLAIM_BATCH", 2))
+WORKER_LEASE_DONE_TTL = int(os.getenv("WORKER_LEASE_DONE_TTL", 12 * 60 * 60))
+WORKER_LEASE_DB = os.getenv("WORKER_LEASE_DB", os.path.join(CACHE_DIR, "leases.sqlite3"))
+
+# Persistent search cache: enabled flag, per-engine TTL (seconds) and size cap
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_TTLS = {
+    "semantic_scholar": int(os.getenv("SEARCH_CACHE_TTL_SEMANTIC_SCHOLAR", 12 * 60 * 60)),
+    "openalex": int(os.getenv("SEARCH_CACHE_TTL_OPENALEX", 12 * 60 * 60)),
+}
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_MB", 200)) * 1024 * 1024
+
+# Local corpus searched by the "local" engine: SQLite full-text index built from bulk metadata
+# dumps (see local_corpus.py), and records written per transaction while ingesting a dump
+LOCAL_CORPUS_PATH = os.getenv("LOCAL_CORPUS_PATH", os.path.join(CACHE_DIR, "local_corpus.sqlite3"))
+LOCAL_CORPUS_BATCH_SIZE = int(os.getenv("LOCAL_CORPUS_BATCH_SIZE", 1000))
+
+# OpenAI calls: max calls in flight, retries of 429/5xx errors, and remaining requests/tokens
+# (from the x-ratelimit-* headers) below which calls wait for the limit to reset
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_MIN_REMAINING_REQUESTS = int(os.getenv("LLM_MIN_REMAINING_REQUESTS", 2))
+LLM_MIN_REMAINING_TOKENS = int(os.getenv("LLM_MIN_REMAINING_TOKENS", 10000))
+# Connection pool of the shared OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 32))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 16))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 600))
+
+# Batch API mode of the daily cycle: the LLM calls of all the due newsletters are submitted as batches.
+# Backend ("openai", or "local" for the offline stand-in), seconds without new request before a batch
+# is submitted, seconds between two polls, requests per batch, submissions per request, and
+# newsletters waiting for their batches at the same time
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() == "true"
+LLM_BATCH_BACKEND = os.getenv("LLM_BATCH_BACKEND", "openai")
+LLM_BATCH_COLLECT_SECONDS = float(os.getenv("LLM_BATCH_COLLECT_SECONDS", 30))
+LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", 60))
+LLM_BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", 50000))
+LLM_BATCH_MAX_ATTEMPTS = int(os.getenv("LLM_BATCH_MAX_ATTEMPTS", 2))
+LLM_BATCH_MAX_NEWSLETTERS = int(os.getenv("LLM_BATCH_MAX_NEWSLETTERS", 1000))
+
+# Embeddings of the embedding ranking strategy: persistent store flag and inputs per request
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+EMBEDDING_CHUNK_SIZE = int(os.getenv("EMBEDDING_CHUNK_SIZE", 256))
+
+# Number of papers classified per relevance filter call (1 for one call per paper)
+RELEVANCE_BATCH_SIZE = int(os.getenv("RELEVANCE_BATCH_SIZE", 1))
+
+# Embedding pre-filter ahead of the LLM relevance filter: enabled flag, share of the relevant papers
+# the calibrated floor must keep, relevant verdicts needed before dropping papers, and share of the
+# papers below the floor still sent to the LLM so the calibration keeps seeing them
+RELEVANCE_PREFILTER_ENABLED = os.getenv("RELEVANCE_PREFILTER_ENABLED", "false").lower() == "true"
+RELEVANCE_PREFILTER_RECALL = float(os.getenv("RELEVANCE_PREFILTER_RECALL", 0.98))
+RELEVANCE_PREFILTER_MIN_SAMPLES = int(os.getenv("RELEVANCE_PREFILTER_MIN_SAMPLES", 30))
+RELEVANCE_PREFILTER_EXPLORE_RATE = float(os.getenv("RELEVANCE_PREFILTER_EXPLORE_RATE", 0.05))
+
+# Checkpoints of the daily cycle, so an interrupted cycle resumes each newsletter after its last
+# completed stage: enabled flag and age (seconds) after which an unfinished run is dropped
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", 3 * 24 * 60 * 60))
+
+# Persistent cache of the LLM relevance verdicts: enabled flag and TTL (seconds)
+RELEVANCE_CACHE_ENABLED = os.getenv("RELEVANCE_CACHE_ENABLED", "true").lower() == "true"
+RELEVANCE_CACHE_TTL = int(os.getenv("RELEVANCE_CACHE_TTL", 90 * 24 * 60 * 60))
+
+# OpenAlex author h-index cache: enabled flag, max entries kept in memory, TTL (seconds)
+# and whether entries are also persisted under CACHE_DIR
+AUTHOR_CACHE_ENABLED = os.getenv("AUTHOR_CACHE_ENABLED", "true").lower() == "true"
+AUTHOR_CACHE_MAX_ENTRIES = int(os.getenv("AUTHOR_CACHE_MAX_ENTRIES", 50000))
+AUTHOR_CACHE_TTL = int(os.getenv("AUTHOR_CACHE_TTL", 7 * 24 * 60 * 60))
+AUTHOR_CACHE_PERSIST = os.getenv("AUTHOR_CACHE_PERSIST", "true").lower() == "true"
+
+# Two-phase search: request LEAN_FIELDS first and enrich only the papers kept by the relevance filter
+SEARCH_LAZY_ENRICHMENT = os.getenv("SEARCH_LAZY_ENRICHMENT", "true").lower() == "true"
+
+# Papers requested per query (fetched lazily, page by page) and number of unique candidates
+# after which a newsletter stops pulling pages (0 for no limit)
+SEARCH_MAX_PAPERS_PER_QUERY = int(os.getenv("SEARCH_MAX_PAPERS_PER_QUERY", 10))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 0))
+
+# Deduplication of the search results: Jaccard similarity of the title shingles above which two
+# papers without a shared identifier are duplicates, MinHash permutations and LSH bands
+DEDUP_TITLE_THRESHOLD = float(os.getenv("DEDUP_TITLE_THRESHOLD", 0.8))
+DEDUP_MINHASH_PERMUTATIONS = int(os.getenv("DEDUP_MINHASH_PERMUTATIONS", 64))
+DEDUP_LSH_BANDS = int(os.getenv("DEDUP_LSH_BANDS", 16))
+
+# Search engines rate limits as (requests per second, burst)
+RATE_LIMITS = {
+    "semantic_scholar": (float(os.getenv("SEMANTIC_SCHOLAR_RATE_LIMIT", 1)), int(os.getenv("SEMANTIC_SCHOLAR_BURST", 1))),
+    "openalex": (float(os.getenv("OPENALEX_RATE_LIMIT", 10)), int(os.getenv("OPENALEX_BURST", 10))),
+}
+# SQLite file shared by the processes of a host to enforce the rate limits together (per process when empty)
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "")
+
+# Hedged searches: a query the primary engine hasn't answered within its SEARCH_HEDGE_PERCENTILE
+# latency is also sent to the other engine, once SEARCH_HEDGE_MIN_SAMPLES latencies were measured
+# (over the last SEARCH_HEDGE_WINDOW queries of the engine)
+SEARCH_HEDGING_ENABLED = os.getenv("SEARCH_HEDGING_ENABLED", "false").lower() == "true"
+SEARCH_HEDGE_PERCENTILE = float(os.getenv("SEARCH_HEDGE_PERCENTILE", 95))
+SEARCH_HEDGE_MIN_SAMPLES = int(os.getenv("SEARCH_HEDGE_MIN_SAMPLES", 20))
+SEARCH_HEDGE_WINDOW = int(os.getenv("SEARCH_HEDGE_WINDOW", 200))
+
+# Pooled async HTTP client used by the search engines
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+
+# Calls of the Python service to the Node API: overall deadline of a call in seconds, retries
+# included, timeout of each attempt, connection pool, and how long before its expiry the Auth0
+# token is refreshed
+API_DEADLINE = float(os.getenv("API_DEADLINE", 30))
+API_ATTEMPT_TIMEOUT = float(os.getenv("API_ATTEMPT_TIMEOUT", 10))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", 20))
+API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("API_MAX_KEEPALIVE_CONNECTIONS", 10))
+API_TOKEN_REFRESH_MARGIN = float(os.getenv("API_TOKEN_REFRESH_MARGIN", 300))
+
+# Circuit breakers of the search engines and the Node API: consecutive failed or slow calls
+# opening a breaker, seconds before an open breaker lets a probe call through, and latency SLO
+# of a call in seconds per dependency
+CIRCUIT_BREAKERS_ENABLED = os.getenv("CIRCUIT_BREAKERS_ENABLED", "true").lower() == "true"
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", 60))
+CIRCUIT_LATENCY_SLOS = {
+    "semantic_scholar": float(os.getenv("SEMANTIC_SCHOLAR_LATENCY_SLO", 20)),
+    "openalex": float(os.getenv("OPENALEX_LATENCY_SLO", 20)),
+    "node_api": float(os.getenv("NODE_API_LATENCY_SLO", 5)),
+    "auth0": float(os.getenv("AUTH0_LATENCY_SLO", 5)),
+}
+# Time budget of a newsletter in seconds, shared by the calls of its checks, search and
+# generation (0 for none)
+NEWSLETTER_BUDGET_SECONDS = float(os.getenv("NEWSLETTER_BUDGET_SECONDS", 900))
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import API_BULK_SIZE
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CycleCache:
+    """
+    Control-plane data of the newsletters of one cycle: the email and name of their users, their
+    consecutive unread counts and the date of their latest issue. `prefetch` loads them for all the
+    due newsletters with a few bulk requests; anything it missed is fetched one by one, once.
+    """
+    def __init__(self, api_client, bulk_size: int = API_BULK_SIZE):
+        self.api_client = api_client
+        self.bulk_size = bulk_size
+        self.users: Dict[str, Optional[Dict]] = {}
+        self.unread_counts: Dict[str, int] = {}
+        self.latest_issue_dates: Dict[str, Optional[str]] = {}
+        self.stats = {"bulk_requests": 0, "single_requests": 0}
+        # Worker threads share the cache, a value missed by `prefetch` is fetched once by one of them
+        # (see `_fetch_once`), without holding the lock during the request
+        self._lock = threading.Lock()
+        self._in_flight: Dict[tuple, Future] = {}
+
+    def prefetch(self, newsletters: List[Dict]):
+        """Loads the users, unread counts and latest issue dates of the newsletters in bulk."""
+        user_ids = list(dict.fromkeys(str(n['userId']) for n in newsletters if n.get('userId')))
+        for chunk in _chunks([u for u in user_ids if u not in self.users], self.bulk_size):
+            users = self.api_client.get_users_info(chunk)
+            with self._lock:
+                self.stats["bulk_requests"] += 1
+                if users is not None:
+                    # Users missing from the answer were deleted
+                    self.users.update({user_id: users.get(user_id) for user_id in chunk})
+
+        pairs = [(str(n['_id']), str(n['userId'])) for n in newsletters
+                 if n.get('userId') and n.get('status') == 'active' and str(n['_id']) not in self.unread_counts]
+        for chunk in _chunks(pairs, self.bulk_size):
+            counts = self.api_client.get_consecutive_unread_counts(chunk)
+            with self._lock:
+                self.stats["bulk_requests"] += 1
+                if counts is not None:
+                    self.unread_counts.update({newsletter_id: counts.get(newsletter_id, 0) for newsletter_id, _ in chunk})
+
+        # /newsletters/all gives lastIssueDate, newsletters from other sources (e.g. lease claims) don't
+        missing = [str(n['_id']) for n in newsletters if not n.get('lastSearch') and 'lastIssueDate' not in n
+                   and str(n['_id']) not in self.latest_issue_dates]
+        for chunk in _chunks(missing, self.bulk_size):
+            dates = self.api_client.get_latest_issue_dates(chunk)
+            with self._lock:
+                self.stats["bulk_requests"] += 1
+                if dates is not None:
+                    self.latest_issue_dates.update({newsletter_id: dates.get(newsletter_id) for newsletter_id in chunk})
+
+    def _fetch_once(self, store: Dict, name: str, key: str, fetch: Callable, keep: Callable = lambda value: True):
+        """
+        Returns `store[key]`, fetched with `fetch()` when missing and stored when `keep(value)`.
+        Threads missing the same key wait for the request of the first one (single-flight).
+        """
+        with self._lock:
+            if key in store:
+                return store[key]
+            future = self._in_flight.get((name, key))
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[(name, key)] = future
+                self.stats["single_requests"] += 1
+        if not is_owner:
+            return future.result()
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop((name, key), None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            if keep(value):
+                store[key] = value
+            self._in_flight.pop((name, key), None)
+        future.set_result(value)
+        return value
+
+    def user_contact(self, user_id) -> Tuple[Optional[str], str]:
+        """Returns the (email, name) of a user."""
+        if not user_id:
+            return None, 'user'
+        user_id = str(user_id)
+        user_info = self._fetch_once(self.users, "users", user_id, lambda: self.api_client.get_user_info(user_id))
+        if not user_info:
+            return None, 'user'
+        return user_info.get('email'), user_info.get('name') or 'user'
+
+    def unread_count(self, newsletter: Dict) -> Optional[int]:
+        """Returns the consecutive unread count of a newsletter for its user, or None when unknown."""
+        return self._fetch_once(
+            self.unread_counts, "unread_counts", str(newsletter['_id']),
+            lambda: self.api_client.get_consecutive_unread_count(newsletter['_id'], newsletter.get('userId')),
+            keep=lambda count: count is not None)
+
+    def latest_issue_date(self, newsletter: Dict) -> Optional[str]:
+        """Returns the date of the latest issue of a newsletter, or None when it has none."""
+        if 'lastIssueDate' in newsletter:
+            return newsletter['lastIssueDate']
+
+        def fetch():
+            latest_issue = self.api_client.get_latest_issue(newsletter['_id'])
+            return (latest_issue.get('publicationDate') or latest_issue.get('createdAt')) if latest_issue else None
+        return self._fetch_once(self.latest_issue_dates, "latest_issue_dates", str(newsletter['_id']), fetch)
@@ -10,6 +10,14 @@ class RelevanceOutput(BaseModel):
     reasonning: str
     is_relevant: Literal["yes", "no"]
 
+class PaperVerdict(BaseModel):
+    index: int
+    reasonning: str
+    is_relevant: Literal["yes", "no"]
+
+class BatchRelevanceOutput(BaseModel):
+    verdicts: List[PaperVerdict]
+
 class PaperAnalyzerOutput(BaseModel):
     synthesis: str = Field(..., description="A brief synthesis of the paper. Explain the paper’s contribution in simple terms. (2–4 sentences)")
     usefulness: str = Field(..., description="Explain why the paper matters, particularly given the newsletter topic / why should the reader should read it? (1–3 sentences)")
@@ -0,0 +1,50 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# Monotonic time by which the current unit of work (a newsletter) must be done. Context variables
+# follow the tasks and the `asyncio.to_thread` calls started under them, so every call made for
+# a newsletter sees its budget
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the time budget of the current unit of work is spent."""
+
+
+@contextmanager
+def budget(seconds: Optional[float]):
+    """
+    Runs the block with a time budget of `seconds` (none when None or 0). A budget nested in
+    another one can't extend it.
+    """
+    if not seconds:
+        yield
+        return
+    deadline_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline_at if current is None else min(current, deadline_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, None without budget."""
+    deadline_at = _deadline.get()
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+
+def timeout(default: float) -> float:
+    """
+    Timeout of a call: `default`, capped by the current budget. Raises DeadlineExceeded when the
+    budget is spent, so no call is started without time to complete.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("The time budget is spent")
+    return min(default, left)
@@ -0,0 +1,193 @@
+import re
+import zlib
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+import numpy as np
+from config import DEDUP_TITLE_THRESHOLD, DEDUP_MINHASH_PERMUTATIONS, DEDUP_LSH_BANDS
+
+# arXiv registers a DOI for every preprint (10.48550/arXiv.<id>), matched as an arXiv ID
+ARXIV_DOI = re.compile(r'^10\.48550/arxiv\.(.+)$')
+ARXIV_URL = re.compile(r'arxiv\.org/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$')
+# Identifiers of the Semantic Scholar `externalIds` (and of the OpenAlex papers, see OpenAlexSearch)
+# that designate a single paper. DBLP and ACL keys are left out, since they differ between versions.
+EXTERNAL_IDS = ("MAG", "PubMed", "PubMedCentral", "CorpusId")
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """Lower-cases a DOI and strips its resolver prefix ("https://doi.org/10.1/X" -> "10.1/x")."""
+    if not doi:
+        return None
+    doi = re.sub(r'^(https?://(dx\.)?doi\.org/|doi:)', '', doi.strip().lower())
+    return doi or None
+
+
+def normalize_arxiv_id(arxiv_id: Optional[str]) -> Optional[str]:
+    """Lower-cases an arXiv ID and strips its prefix and version ("arXiv:2301.00001v2" -> "2301.00001")."""
+    if not arxiv_id:
+        return None
+    arxiv_id = re.sub(r'^arxiv:', '', arxiv_id.strip().lower())
+    return re.sub(r'v\d+$', '', arxiv_id) or None
+
+
+def paper_identifiers(paper: Dict) -> Set[str]:
+    """Returns the normalized identifiers of a paper ("doi:...", "arxiv:...", "mag:...")."""
+    external_ids = paper.get("externalIds") or {}
+    identifiers = set()
+    doi = normalize_doi(external_ids.get("DOI"))
+    arxiv_id = normalize_arxiv_id(external_ids.get("ArXiv"))
+    if doi and ARXIV_DOI.match(doi):
+        arxiv_id = arxiv_id or normalize_arxiv_id(ARXIV_DOI.match(doi).group(1))
+    elif doi:
+        identifiers.add(f"doi:{doi}")
+    match = ARXIV_URL.search((paper.get("url") or "").lower())
+    if match and not arxiv_id:
+        arxiv_id = normalize_arxiv_id(match.group(1))
+    if arxiv_id:
+        identifiers.add(f"arxiv:{arxiv_id}")
+    for name in EXTERNAL_IDS:
+        if external_ids.get(name):
+            identifiers.add(f"{name.lower()}:{str(external_ids[name]).lower()}")
+    if paper.get("paperId"):
+        identifiers.add(f"id:{paper['paperId']}")
+    return identifiers
+
+
+def normalize_text(title: Optional[str]) -> str:
+    return " ".join(re.sub(r'[\W_]+', ' ', (title or "").lower()).split())
+
+
+def title_numbers(title: Optional[str]) -> FrozenSet[str]:
+    """Numbers of a title, which tell apart papers such as "Llama 2" and "Llama 3" despite similar shingles."""
+    return frozenset(re.findall(r'\d+', normalize_text(title)))
+
+
+def title_shingles(title: Optional[str], k: int = 3) -> Set[str]:
+    """Character k-grams of the title, once lower-cased and stripped of punctuation."""
+    text = normalize_text(title)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets, with seeded permutations so signatures are stable across processes."""
+    def __init__(self, num_perm: int = DEDUP_MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # Hashes are 32-bit and the coefficients below 2^29, so a * x + b can't overflow 64 bits
+        self.a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME).min(axis=0)
+
+
+class DedupIndex:
+    """
+    Incremental index of the unique papers of a search.
+
+    A paper is a duplicate of an indexed one when they share an identifier (DOI, arXiv ID,
+    `externalIds`, engine ID), or else when the Jaccard similarity of their title shingles
+    reaches `threshold`. Title candidates are found with MinHash LSH (`bands` bands of the
+    signature), so each paper is compared with a handful of papers rather than the whole index.
+    Papers with different DOIs, different arXiv IDs or different numbers in their titles are
+    never merged on their titles.
+    """
+    def __init__(self, threshold: float = DEDUP_TITLE_THRESHOLD, num_perm: int = DEDUP_MINHASH_PERMUTATIONS, bands: int = DEDUP_LSH_BANDS):
+        if num_perm % bands:
+            raise ValueError("The number of permutations must be a multiple of the number of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.papers: List[Dict] = []
+        self.stats = {"unique": 0, "id_duplicates": 0, "title_duplicates": 0}
+        self._identifiers: Dict[str, int] = {}
+        self._versions: List[Set[str]] = []
+        self._shingles: List[Set[str]] = []
+        self._numbers: List[FrozenSet[str]] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def _band_keys(self, shingles: Set[str]) -> List[bytes]:
+        signature = self.hasher.signature(shingles)
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _conflict(self, versions: Set[str], i: int) -> bool:
+        for kind in ("doi:", "arxiv:"):
+            mine = {v for v in versions if v.startswith(kind)}
+            theirs = {v for v in self._versions[i] if v.startswith(kind)}
+            if mine and theirs and not mine & theirs:
+                return True
+        return False
+
+    def _find_by_title(self, shingles: Set[str], band_keys: List[bytes], versions: Set[str], numbers: FrozenSet[str]) -> Optional[int]:
+        candidates = {i for band, key in enumerate(band_keys) for i in self._buckets[band].get(key, ())}
+        best, best_similarity = None, self.threshold
+        for i in candidates:
+            if numbers != self._numbers[i] or self._conflict(versions, i):
+                continue
+            similarity = jaccard(shingles, self._shingles[i])
+            if similarity >= best_similarity:
+                best, best_similarity = i, similarity
+        return best
+
+    def add(self, paper: Dict) -> int:
+        """Indexes a paper and returns the position in `papers` of the unique paper it is a copy of (or of itself when new)."""
+        identifiers = paper_identifiers(paper)
+        # DOIs and arXiv IDs designate one version of a paper, two different ones are two papers
+        versions = {identifier for identifier in identifiers if identifier.startswith(("doi:", "arxiv:"))}
+        match = next((self._identifiers[identifier] for identifier in identifiers if identifier in self._identifiers), None)
+        if match is not None:
+            self.stats["id_duplicates"] += 1
+        else:
+            shingles = title_shingles(paper.get("title"))
+            numbers = title_numbers(paper.get("title"))
+            band_keys = self._band_keys(shingles) if shingles else []
+            match = self._find_by_title(shingles, band_keys, versions, numbers) if shingles else None
+            if match is not None:
+                self.stats["title_duplicates"] += 1
+            else:
+                match = len(self.papers)
+                self.papers.append(paper)
+                self._versions.append(set())
+                self._shingles.append(shingles)
+                self._numbers.append(numbers)
+                for band, key in enumerate(band_keys):
+                    self._buckets[band].setdefault(key, []).append(match)
+                self.stats["unique"] += 1
+
+        # The identifiers of every version are kept, so later copies match any of them
+        for identifier in identifiers:
+            self._identifiers.setdefault(identifier, match)
+        self._versions[match] |= versions
+        return match
+
+
+def paper_doi(paper: Dict) -> Optional[str]:
+    """Returns the normalized DOI of a paper, or the DOI arXiv registers for it when it only has an arXiv ID."""
+    doi = normalize_doi((paper.get("externalIds") or {}).get("DOI"))
+    if doi:
+        return doi
+    arxiv_id = next((i[len("arxiv:"):] for i in paper_identifiers(paper) if i.startswith("arxiv:")), None)
+    return f"10.48550/arxiv.{arxiv_id}" if arxiv_id else None
+
+
+class PublishedIndex:
+    """Identifiers of the papers a newsletter already published, to drop them from new searches."""
+    def __init__(self, paper_ids: Iterable[str] = (), dois: Iterable[str] = ()):
+        self.identifiers: Set[str] = {f"id:{paper_id}" for paper_id in paper_ids}
+        for doi in dois:
+            self.identifiers |= paper_identifiers({"externalIds": {"DOI": doi}})
+
+    def __contains__(self, paper: Dict) -> bool:
+        return not self.identifiers.isdisjoint(paper_identifiers(paper))
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from config import CACHE_DIR, EMBEDDING_CHUNK_SIZE
+
+
+def content_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode('utf-8')).hexdigest()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Returns the indexes of the `k` highest scores, from the highest to the lowest."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class EmbeddingStore:
+    """
+    Persistent store of L2-normalized embeddings keyed by a hash of the model and the text.
+
+    Vectors are appended to a raw float32 file read through a memory map, and an SQLite index
+    maps each hash to its row. Appends run in an immediate transaction, so several processes
+    can share the same directory.
+    """
+    def __init__(self, model: str, directory: Optional[str] = None):
+        self.model = model
+        self.directory = directory or os.path.join(CACHE_DIR, "embeddings")
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r'[^\w.-]', '_', model)
+        self.vectors_path = os.path.join(self.directory, f"{name}.f32")
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._conn = sqlite3.connect(os.path.join(self.directory, f"{name}.sqlite3"), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+
+    def _vectors(self, max_row: int) -> np.ndarray:
+        # The memory map is reopened when rows were appended since it was opened
+        if self._matrix is None or max_row >= len(self._matrix):
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+        return self._matrix
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Returns the stored vectors of the given hashes."""
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            rows = {}
+            # SQLite limits the number of query parameters, so the hashes are looked up in chunks
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(self._conn.execute(f"SELECT hash, row FROM embeddings WHERE hash IN ({placeholders})", chunk).fetchall())
+            if rows:
+                matrix = self._vectors(max(rows.values()))
+                found = {h: np.array(matrix[row]) for h, row in rows.items()}
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(unique) - len(found)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]):
+        """Normalizes and stores vectors, ignoring hashes already stored by another process."""
+        if not vectors:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    self.dim = len(next(iter(vectors.values())))
+                    self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                hashes = list(vectors)
+                existing = set()
+                for i in range(0, len(hashes), 500):
+                    chunk = hashes[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    existing.update(h for (h,) in self._conn.execute(f"SELECT hash FROM embeddings WHERE hash IN ({placeholders})", chunk))
+                new = [h for h in hashes if h not in existing]
+                if not new:
+                    self._conn.execute("COMMIT")
+                    return
+                matrix = normalize_rows(np.asarray([vectors[h] for h in new], dtype=np.float32))
+                start = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+                with open(self.vectors_path, "ab") as f:
+                    # A row partly written by a crashed process is dropped, so the new rows stay aligned
+                    f.truncate(start * 4 * self.dim)
+                    f.write(matrix.tobytes())
+                self._conn.executemany("INSERT INTO embeddings (hash, row) VALUES (?, ?)", [(h, start + i) for i, h in enumerate(new)])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+async def embed_texts(texts: List[str], model: str, embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+                      store: Optional[EmbeddingStore] = None, chunk_size: int = EMBEDDING_CHUNK_SIZE) -> np.ndarray:
+    """
+    Returns the L2-normalized embeddings of `texts`, one row per text. Only the texts missing
+    from the store are sent to `embed_fn`, in concurrent chunks of at most `chunk_size` inputs.
+    """
+    hashes = [content_hash(model, text) for text in texts]
+    vectors = await asyncio.to_thread(store.get_many, hashes) if store is not None else {}
+
+    misses = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+    if misses:
+        items = list(misses.items())
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = await asyncio.gather(*[embed_fn([text for _, text in chunk]) for chunk in chunks])
+        embedded = {h: np.asarray(embedding, dtype=np.float32)
+                    for chunk, embeddings in zip(chunks, results) for (h, _), embedding in zip(chunk, embeddings)}
+        if store is not None:
+            await asyncio.to_thread(store.put_many, embedded)
+        vectors.update(embedded)
+
+    return normalize_rows(np.stack([vectors[h] for h in hashes]).astype(np.float32))
+
+
+_embedding_stores: Dict[str, EmbeddingStore] = {}
+_embedding_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model: str) -> EmbeddingStore:
+    """Returns the embedding store of a model, shared by the process."""
+    with _embedding_stores_lock:
+        if model not in _embedding_stores:
+            _embedding_stores[model] = EmbeddingStore(model)
+        return _embedding_stores[model]
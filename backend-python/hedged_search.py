@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from paper_search import PaperSearch
+from rate_limiter import get_rate_limiter
+from circuit_breaker import get_circuit_breaker
+from config import SEARCH_HEDGE_PERCENTILE, SEARCH_HEDGE_MIN_SAMPLES, SEARCH_HEDGE_WINDOW
+
+
+class LatencyTracker:
+    """Latencies of the last `window` queries of an engine. Safe to use from several threads."""
+    def __init__(self, window: int = SEARCH_HEDGE_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        """The `p`-th percentile (nearest rank) of the latencies, None with fewer than `min_samples` of them."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(engine: str) -> LatencyTracker:
+    """Returns the latency tracker of an engine, kept across cycles."""
+    with _trackers_lock:
+        if engine not in _trackers:
+            _trackers[engine] = LatencyTracker()
+        return _trackers[engine]
+
+
+class SearchHedger:
+    """
+    Per-cycle hedging policy of the paper searches.
+
+    A query the primary engine hasn't answered within its `percentile` latency is also sent to the
+    secondary engine, and the first non-empty answer wins. A hedge is only sent while the secondary
+    engine has a rate-limiter token to spare and a closed circuit breaker, so hedges never delay
+    the queries of the secondary engine. When the hedge wins, the primary query still completes in
+    the background: its latency keeps the percentile honest, and gives the time the hedge saved.
+    """
+    def __init__(self, percentile: float = SEARCH_HEDGE_PERCENTILE, min_samples: int = SEARCH_HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.stats = {"queries": 0, "hedged": 0, "hedge_wins": 0, "no_budget": 0, "hedge_rate": 0.0, "saved_seconds": 0.0}
+        self._background = set()
+
+    def wrap(self, primary: PaperSearch, secondary: PaperSearch) -> "HedgedSearch":
+        return HedgedSearch(primary, secondary, self)
+
+    def _track(self, task: asyncio.Task, callback=None):
+        """Keeps a reference to a task left running, and retrieves its outcome."""
+        self._background.add(task)
+
+        def done(task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is None and callback:
+                callback()
+        task.add_done_callback(done)
+
+    async def _can_hedge(self, secondary: PaperSearch) -> bool:
+        if get_circuit_breaker(secondary.name).is_open():
+            return False
+        # The SQLite-backed limiters are read off the event loop
+        return await asyncio.to_thread(get_rate_limiter(secondary.name).available) >= 1
+
+    async def search(self, primary: PaperSearch, secondary: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        def run(searcher):
+            return asyncio.ensure_future(searcher.asearch(query, start_date, nb_papers, end_date=end_date, filters=filters))
+
+        # Cached and memoized results come back at once, and would skew the latencies
+        if await asyncio.to_thread(primary.is_cached, query, start_date, nb_papers, end_date=end_date, filters=filters):
+            return await primary.asearch(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+        self.stats["queries"] += 1
+        tracker = get_latency_tracker(primary.name)
+        delay = tracker.percentile(self.percentile, self.min_samples)
+        started = time.monotonic()
+        primary_task, hedge_task = run(primary), None
+        primary_task.add_done_callback(
+            lambda task: tracker.record(time.monotonic() - started) if not task.cancelled() and task.exception() is None else None)
+        try:
+            if delay is None or (await asyncio.wait({primary_task}, timeout=delay))[0]:
+                return await primary_task
+            if not await self._can_hedge(secondary):
+                self.stats["no_budget"] += 1
+                return await primary_task
+
+            logging.info(f"Hedging {primary.name} query with {secondary.name} after {delay:.1f}s: {query}")
+            self.stats["hedged"] += 1
+            self.stats["hedge_rate"] = self.stats["hedged"] / self.stats["queries"]
+            hedge_task = run(secondary)
+            pending = {primary_task, hedge_task}
+            winner = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The primary answer is preferred when both arrive together
+                for task in sorted(done, key=lambda task: task is not primary_task):
+                    if task.exception() is None and task.result():
+                        winner = task
+                        break
+        except asyncio.CancelledError:
+            for task in (primary_task, hedge_task):
+                if task:
+                    task.cancel()
+            raise
+        finally:
+            self.stats["hedge_rate"] = self.stats["hedged"] / self.stats["queries"]
+
+        if winner is None:
+            # Both engines failed or found nothing
+            return primary_task.result()
+        if winner is primary_task:
+            hedge_task.cancel()
+            self._track(hedge_task)
+            return winner.result()
+
+        self.stats["hedge_wins"] += 1
+        won_at = time.monotonic()
+
+        def saved():
+            self.stats["saved_seconds"] += time.monotonic() - won_at
+        self._track(primary_task, saved)
+        return winner.result()
+
+
+class HedgedSearch(PaperSearch):
+    """
+    A PaperSearch wrapper hedging the async searches of the `primary` searcher with the
+    `secondary` one, see SearchHedger. Results are returned at once rather than streamed, and the
+    synchronous methods are those of the primary searcher.
+    """
+    def __init__(self, primary: PaperSearch, secondary: PaperSearch, hedger: SearchHedger):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedger = hedger
+        self.name = primary.name
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        return self.primary.search(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        return await self.hedger.search(self.primary, self.secondary, query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        return self.primary.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size)
+
+    async def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        for paper in await self.asearch(query, start_date, nb_papers, end_date=end_date, filters=filters):
+            yield paper
+
+    def is_cached(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> bool:
+        return self.primary.is_cached(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.primary.cache_namespace
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        return self.primary.enrich(papers)
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        return await self.primary.aenrich(papers)
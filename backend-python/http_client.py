@@ -0,0 +1,48 @@
+import asyncio
+import weakref
+import httpx
+from config import (HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_TIMEOUT, API_MAX_CONNECTIONS,
+                    API_MAX_KEEPALIVE_CONNECTIONS, API_ATTEMPT_TIMEOUT)
+
+# One client per event loop, since an httpx.AsyncClient can't be shared between loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+# Clients of the Node API, in their own pool so searches don't hold up the control plane
+_api_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _pooled_client(clients, max_connections: int, max_keepalive_connections: int, timeout: float) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=60,
+            ),
+        )
+        clients[loop] = client
+    return client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the pooled HTTP client of the running event loop. Connections are kept alive
+    between requests, so the search engines don't pay a TLS handshake per call.
+    """
+    return _pooled_client(_clients, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_TIMEOUT)
+
+
+def get_api_http_client() -> httpx.AsyncClient:
+    """Returns the pooled HTTP client of the running event loop used for the Node API and Auth0."""
+    return _pooled_client(_api_clients, API_MAX_CONNECTIONS, API_MAX_KEEPALIVE_CONNECTIONS, API_ATTEMPT_TIMEOUT)
+
+
+async def close_async_http_client():
+    """Closes the pooled HTTP clients of the running event loop."""
+    loop = asyncio.get_running_loop()
+    for clients in (_clients, _api_clients):
+        client = clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from config import (CACHE_DIR, WORKER_ID, WORKER_LEASE_TTL, WORKER_LEASE_CLAIM_BATCH, WORKER_LEASE_DONE_TTL,
+                    WORKER_LEASE_DB)
+
+
+def default_worker_id() -> str:
+    return WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ApiLeaseBackend:
+    """Leases stored on the newsletters by the Node API, shared by all the workers of the deployment."""
+    def __init__(self, api_client):
+        self.api_client = api_client
+
+    def register(self, newsletters: Iterable[Dict]):
+        # The Node API claims among the active newsletters of its database
+        pass
+
+    def claim(self, worker_id: str, limit: int, ttl: int) -> Optional[Dict]:
+        return self.api_client.claim_newsletters(worker_id, limit, ttl)
+
+    def renew(self, worker_id: str, newsletter_ids: List[str], ttl: int) -> Optional[List[str]]:
+        return self.api_client.renew_newsletter_leases(worker_id, newsletter_ids, ttl)
+
+    def release(self, worker_id: str, newsletter_ids: List[str], done_ttl: int = 0):
+        self.api_client.release_newsletter_leases(worker_id, newsletter_ids, done_ttl)
+
+    def heartbeat(self, worker_id: str, progress: Dict, max_age: int) -> Optional[List[Dict]]:
+        return self.api_client.worker_heartbeat(worker_id, progress, max_age)
+
+
+class LocalLeaseBackend:
+    """
+    Stand-in for the lease endpoints of the Node API, in a SQLite file shared by the worker
+    processes of a host. Newsletters are those of the last `register` call.
+    """
+    def __init__(self, path: str = WORKER_LEASE_DB):
+        self.path = path or os.path.join(CACHE_DIR, "leases.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit, transactions are opened with BEGIN IMMEDIATE so claims don't race across processes
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                newsletter_id TEXT PRIMARY KEY,
+                newsletter TEXT NOT NULL,
+                holder TEXT,
+                expires_at REAL,
+                done_until REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                worker_id TEXT PRIMARY KEY,
+                progress TEXT NOT NULL,
+                heartbeat_at REAL NOT NULL
+            )
+        """)
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(time.time(), *args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def register(self, newsletters: Iterable[Dict]):
+        # Newsletters are streamed into a temporary table first, so the lock on the shared file
+        # is only taken once they are all known
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS registered (newsletter_id TEXT PRIMARY KEY, newsletter TEXT NOT NULL)")
+            self._conn.execute("DELETE FROM registered")
+            self._conn.executemany("INSERT OR REPLACE INTO registered VALUES (?, ?)", (
+                (str(n['_id']), json.dumps(n, default=str)) for n in newsletters if n.get('status') == 'active'))
+
+        def run(now):
+            self._conn.execute("""
+                INSERT INTO leases (newsletter_id, newsletter) SELECT newsletter_id, newsletter FROM registered WHERE true
+                ON CONFLICT (newsletter_id) DO UPDATE SET newsletter = excluded.newsletter
+            """)
+            # Deleted or deactivated newsletters are no longer claimed, unless a worker still holds them
+            self._conn.execute("""
+                DELETE FROM leases WHERE newsletter_id NOT IN (SELECT newsletter_id FROM registered)
+                AND (expires_at IS NULL OR expires_at <= ?)
+            """, (now,))
+        self._transaction(run)
+
+    def claim(self, worker_id: str, limit: int, ttl: int) -> Dict:
+        def run(now):
+            rows = self._conn.execute("""
+                SELECT newsletter_id, newsletter FROM leases
+                WHERE (expires_at IS NULL OR expires_at <= ?) AND (done_until IS NULL OR done_until <= ?)
+                ORDER BY rowid LIMIT ?
+            """, (now, now, limit)).fetchall()
+            self._conn.executemany("UPDATE leases SET holder = ?, expires_at = ? WHERE newsletter_id = ?",
+                                   [(worker_id, now + ttl, row[0]) for row in rows])
+            pending = self._conn.execute("""
+                SELECT COUNT(*) FROM leases WHERE holder != ? AND expires_at > ? AND (done_until IS NULL OR done_until <= ?)
+            """, (worker_id, now, now)).fetchone()[0]
+            return {"newsletters": [json.loads(row[1]) for row in rows], "pending": pending}
+        return self._transaction(run)
+
+    def renew(self, worker_id: str, newsletter_ids: List[str], ttl: int) -> List[str]:
+        def run(now):
+            renewed = []
+            for newsletter_id in newsletter_ids:
+                cursor = self._conn.execute("UPDATE leases SET expires_at = ? WHERE newsletter_id = ? AND holder = ?",
+                                            (now + ttl, newsletter_id, worker_id))
+                if cursor.rowcount:
+                    renewed.append(newsletter_id)
+            return renewed
+        return self._transaction(run)
+
+    def release(self, worker_id: str, newsletter_ids: List[str], done_ttl: int = 0):
+        def run(now):
+            self._conn.executemany("""
+                UPDATE leases SET holder = NULL, expires_at = NULL, done_until = ? WHERE newsletter_id = ? AND holder = ?
+            """, [(now + done_ttl if done_ttl else None, newsletter_id, worker_id) for newsletter_id in newsletter_ids])
+        self._transaction(run)
+
+    def heartbeat(self, worker_id: str, progress: Dict, max_age: int) -> List[Dict]:
+        def run(now):
+            self._conn.execute("INSERT OR REPLACE INTO shards (worker_id, progress, heartbeat_at) VALUES (?, ?, ?)",
+                               (worker_id, json.dumps(progress, default=str), now))
+            rows = self._conn.execute("SELECT worker_id, progress, heartbeat_at FROM shards WHERE heartbeat_at > ? ORDER BY worker_id",
+                                      (now - max_age,)).fetchall()
+            return [{**json.loads(progress), "workerId": worker, "heartbeatAt": heartbeat_at} for worker, progress, heartbeat_at in rows]
+        return self._transaction(run)
+
+
+def aggregate_shards(shards: List[Dict]) -> Dict:
+    """Progress of the daily cycle summed over the workers that recently sent a heartbeat."""
+    return {
+        "workers": len(shards),
+        "running": sum(1 for shard in shards if shard.get("status") in ("running", "stopping")),
+        "processed_count": sum(shard.get("processed_count", 0) for shard in shards),
+        "in_progress": sum(shard.get("in_progress", 0) for shard in shards),
+        "claimed": sum(shard.get("claimed", 0) for shard in shards),
+    }
+
+
+class ShardCoordinator:
+    """
+    Partitions the newsletters of the daily cycle between the workers sharing a lease backend.
+
+    A worker claims `claim_batch` newsletters at a time, when its pipeline has room for them, and
+    holds a lease of `ttl` seconds on each, renewed every third of it until the newsletter is done.
+    Finished newsletters stay marked as done for `done_ttl` seconds, so no other worker processes
+    them again in the same cycle. When a worker dies, its leases expire and the other workers
+    claim its newsletters, so a worker with nothing left to claim keeps polling while newsletters
+    are held by others. A lease lost while a newsletter is processed (e.g. a long pause) can
+    lead to a newsletter processed twice, which the idempotency key of its issue absorbs.
+    """
+    def __init__(self, backend, worker_id: Optional[str] = None, ttl: int = WORKER_LEASE_TTL,
+                 claim_batch: int = WORKER_LEASE_CLAIM_BATCH, done_ttl: int = WORKER_LEASE_DONE_TTL):
+        self.backend = backend
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl = ttl
+        self.claim_batch = claim_batch
+        self.done_ttl = done_ttl
+        self.interval = max(ttl / 3, 0.01)
+        self.held: Dict[str, Dict] = {}
+        self.shards: List[Dict] = []
+        self.stats = {"claimed": 0, "finished": 0, "lost": 0}
+        self._finished: Dict[str, int] = {}  # newsletter ID -> seconds it stays done (0 when given up)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._state = None
+
+    async def start(self, newsletters: Iterable[Dict], state=None):
+        """Registers the newsletters of the cycle and starts renewing the leases of this worker."""
+        self._state = state
+        self.stats = {"claimed": 0, "finished": 0, "lost": 0}
+        try:
+            await asyncio.to_thread(self.backend.register, newsletters)
+        except Exception as e:
+            logging.warning(f"Could not register the newsletters of the cycle, claiming among those already registered: {e}")
+        await self.report()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        """Stops the renewals and releases the newsletters this worker claimed but didn't finish."""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        await self._flush()
+        if self.held:
+            await asyncio.to_thread(self.backend.release, self.worker_id, list(self.held))
+            self.held.clear()
+        await self.report()
+
+    async def claimed(self, should_stop: Callable[[], bool] = lambda: False) -> AsyncIterator[Dict]:
+        """Yields the newsletters claimed by this worker until none is left to any worker."""
+        while not should_stop():
+            await self._flush()
+            result = await asyncio.to_thread(self.backend.claim, self.worker_id, self.claim_batch, self.ttl)
+            if result is None:
+                logging.warning("Could not claim newsletters, retrying.")
+                await asyncio.sleep(self.interval)
+                continue
+            for newsletter in result["newsletters"]:
+                self.held[str(newsletter['_id'])] = newsletter
+                self.stats["claimed"] += 1
+            for newsletter in result["newsletters"]:
+                yield newsletter
+            if not result["newsletters"]:
+                if not result["pending"]:
+                    return
+                # Newsletters held by other workers are claimed back if their leases expire
+                await asyncio.sleep(self.interval)
+
+    def finish(self, newsletter_id: str, done: bool = True, done_ttl: Optional[int] = None):
+        """
+        Marks a newsletter of this worker as finished, its lease is released on the next flush.
+        A `done` newsletter isn't claimed again for `done_ttl` seconds (WORKER_LEASE_DONE_TTL by
+        default), a newsletter given up can be claimed right away.
+        """
+        if self.held.pop(newsletter_id, None) is not None:
+            self._finished[newsletter_id] = (self.done_ttl if done_ttl is None else int(done_ttl)) if done else 0
+            self.stats["finished"] += 1
+
+    async def _flush(self):
+        finished, self._finished = self._finished, {}
+        by_ttl: Dict[int, List[str]] = {}
+        for newsletter_id, done_ttl in finished.items():
+            by_ttl.setdefault(done_ttl, []).append(newsletter_id)
+        for done_ttl, newsletter_ids in by_ttl.items():
+            await asyncio.to_thread(self.backend.release, self.worker_id, newsletter_ids, done_ttl)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._flush()
+                await self._renew()
+                await self.report()
+            except Exception as e:
+                logging.error(f"Error renewing the leases of worker {self.worker_id}: {e}")
+
+    async def _renew(self):
+        held = list(self.held)
+        if not held:
+            return
+        renewed = await asyncio.to_thread(self.backend.renew, self.worker_id, held, self.ttl)
+        if renewed is None:
+            return
+        for newsletter_id in set(held) - set(renewed):
+            # Taken over by another worker after the lease expired
+            if self.held.pop(newsletter_id, None) is not None:
+                self.stats["lost"] += 1
+                logging.warning(f"Worker {self.worker_id} lost the lease of newsletter {newsletter_id}.")
+
+    async def other_cycle_started(self, since: Optional[str]) -> bool:
+        """
+        Sends a heartbeat while this worker is idle, and returns whether another worker started a
+        cycle after `since` (the end of the last cycle of this worker), so the idle workers join it
+        rather than waiting for their own cycle.
+        """
+        await self.report()
+        return any(shard.get("status") == "running" and shard.get("workerId") != self.worker_id
+                   and (since is None or (shard.get("cycle_started_at") or "") > since) for shard in self.shards)
+
+    def progress(self) -> Dict:
+        state = self._state
+        return {
+            "status": state.status if state else "running",
+            "cycle_started_at": state.cycle_started_at if state else None,
+            "processed_count": state.processed_count if state else self.stats["finished"],
+            "in_progress": len(state.in_progress) if state else len(self.held),
+            "claimed": self.stats["claimed"],
+        }
+
+    async def report(self):
+        """Sends the progress of this worker and keeps the progress of the live workers in `shards`."""
+        shards = await asyncio.to_thread(self.backend.heartbeat, self.worker_id, self.progress(), 3 * self.ttl)
+        if shards is not None:
+            self.shards = shards
+            if self._state is not None:
+                self._state.shards = shards
+
+
+def get_lease_backend(kind: str, api_client=None):
+    """Returns the lease backend of the given kind ("api" or "local")."""
+    if kind == "local":
+        return LocalLeaseBackend()
+    return ApiLeaseBackend(api_client)
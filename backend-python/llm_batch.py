@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple, Type
+import numpy as np
+from openai.types import Batch, CreateEmbeddingResponse, FileObject
+from openai.types.responses import ParsedResponse, Response
+from pydantic import BaseModel
+from llm_scheduler import get_openai_client
+from config import LLM_BATCH_COLLECT_SECONDS, LLM_BATCH_POLL_SECONDS, LLM_BATCH_MAX_REQUESTS, LLM_BATCH_MAX_ATTEMPTS
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRequestError(Exception):
+    """A request of a batch failed, or never got a result."""
+
+
+class BatchCollector:
+    """
+    Runs OpenAI calls through the Batch API instead of live requests.
+
+    Calls wait in a pending list per endpoint, and once no call was added for `collect_seconds`
+    (or `max_requests` are pending) the list is written to a JSONL file and submitted as one batch.
+    Each submitted batch is polled by its own task, and every caller resumes as soon as the batch
+    holding its request completes. Requests left without result by an expired or failed batch are
+    submitted again, up to `max_attempts` times.
+
+    The collector stands in for the LLMScheduler of a NewsletterCreator (batched calls are paced
+    by the batch backend, not by the live rate limits), and `client()` for its OpenAI client.
+    """
+    def __init__(self, backend=None, collect_seconds: float = LLM_BATCH_COLLECT_SECONDS, poll_seconds: float = LLM_BATCH_POLL_SECONDS,
+                 max_requests: int = LLM_BATCH_MAX_REQUESTS, max_attempts: int = LLM_BATCH_MAX_ATTEMPTS, completion_window: str = "24h"):
+        self._backend = backend
+        self.collect_seconds = collect_seconds
+        self.poll_seconds = poll_seconds
+        self.max_requests = max_requests
+        self.max_attempts = max_attempts
+        self.completion_window = completion_window
+        self.stats = {"requests": 0, "batches": 0, "in_flight": 0, "succeeded": 0, "failed": 0, "resubmitted": 0}
+        self._pending: Dict[str, List[Dict]] = {}
+        self._last_added: Dict[str, float] = {}
+        self._flushers: Dict[str, asyncio.Task] = {}
+        self._tasks = set()
+        self._ids = itertools.count()
+
+    @property
+    def backend(self):
+        """The OpenAI client of the running event loop, unless a backend was given."""
+        return self._backend or get_openai_client()
+
+    def client(self) -> "BatchClient":
+        return BatchClient(self)
+
+    async def run(self, fn: Callable, *args, priority: Optional[int] = None, **kwargs):
+        """Same interface as `LLMScheduler.run`. Batched calls are not limited in number, so they all join the next batch."""
+        return await fn(*args, **kwargs)
+
+    async def request(self, endpoint: str, body: Dict) -> Dict:
+        """Adds a request to the next batch of `endpoint` and returns the body of its response."""
+        future = asyncio.get_running_loop().create_future()
+        self._add(endpoint, {"custom_id": f"request-{next(self._ids)}", "body": body, "future": future, "attempts": 0})
+        self.stats["requests"] += 1
+        return await future
+
+    def _add(self, endpoint: str, request: Dict):
+        self._pending.setdefault(endpoint, []).append(request)
+        self._last_added[endpoint] = time.monotonic()
+        if len(self._pending[endpoint]) >= self.max_requests:
+            self._submit(endpoint)
+        elif endpoint not in self._flushers:
+            self._flushers[endpoint] = asyncio.create_task(self._flush_when_idle(endpoint))
+
+    async def _flush_when_idle(self, endpoint: str):
+        try:
+            while self._pending.get(endpoint):
+                delay = self._last_added[endpoint] + self.collect_seconds - time.monotonic()
+                if delay <= 0:
+                    self._submit(endpoint)
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            self._flushers.pop(endpoint, None)
+
+    def _submit(self, endpoint: str):
+        requests = self._pending.pop(endpoint, [])
+        # Callers cancelled in the meantime are left out of the batch
+        requests = [request for request in requests if not request["future"].done()]
+        if requests:
+            task = asyncio.create_task(self._run_batch(endpoint, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, endpoint: str, requests: List[Dict]):
+        self.stats["batches"] += 1
+        self.stats["in_flight"] += 1
+        try:
+            content = "".join(json.dumps({"custom_id": r["custom_id"], "method": "POST", "url": endpoint, "body": r["body"]}) + "\n" for r in requests)
+            batch_file = await self.backend.files.create(file=("batch.jsonl", content.encode("utf-8")), purpose="batch")
+            batch = await self.backend.batches.create(input_file_id=batch_file.id, endpoint=endpoint, completion_window=self.completion_window)
+            logging.info(f"Submitted batch {batch.id} ({len(requests)} requests to {endpoint})")
+            while batch.status not in FINAL_STATUSES:
+                await asyncio.sleep(self.poll_seconds)
+                batch = await self.backend.batches.retrieve(batch.id)
+            logging.info(f"Batch {batch.id} is {batch.status}")
+
+            results = {}
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    output = await self.backend.files.content(file_id)
+                    for line in output.text.splitlines():
+                        if line.strip():
+                            result = json.loads(line)
+                            results[result["custom_id"]] = result
+        except Exception as e:
+            logging.error(f"Batch of {len(requests)} requests to {endpoint} failed: {e}")
+            batch, results = None, {}
+        finally:
+            self.stats["in_flight"] -= 1
+
+        for request in requests:
+            future = request["future"]
+            if future.done():
+                continue
+            result = results.get(request["custom_id"])
+            response = (result or {}).get("response") or {}
+            if result is not None and response.get("status_code") == 200:
+                self.stats["succeeded"] += 1
+                future.set_result(response["body"])
+            elif result is None and request["attempts"] + 1 < self.max_attempts:
+                # Expired, cancelled or failed before running: the request goes to the next batch
+                request["attempts"] += 1
+                self.stats["resubmitted"] += 1
+                self._add(endpoint, request)
+            else:
+                self.stats["failed"] += 1
+                error = (result or {}).get("error") or response.get("body", {}).get("error") or f"no result (batch {getattr(batch, 'status', 'not submitted')})"
+                future.set_exception(BatchRequestError(f"Batched request to {endpoint} failed: {error}"))
+
+
+def _strict_schema(schema: Dict) -> Dict:
+    """Strict form of a JSON schema: every object lists all its properties as required and allows no others."""
+    schema = dict(schema)
+    if schema.get("type") == "object":
+        schema["properties"] = {name: _strict_schema(prop) for name, prop in schema.get("properties", {}).items()}
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    if "$defs" in schema:
+        schema["$defs"] = {name: _strict_schema(definition) for name, definition in schema["$defs"].items()}
+    if "items" in schema:
+        schema["items"] = _strict_schema(schema["items"])
+    if "anyOf" in schema:
+        schema["anyOf"] = [_strict_schema(variant) for variant in schema["anyOf"]]
+    return schema
+
+
+def json_schema_format(model: Type[BaseModel]) -> Dict:
+    """The `text.format` of a structured output request answered by `model`, as sent by `AsyncResponses.parse`."""
+    return {"type": "json_schema", "name": model.__name__, "schema": _strict_schema(model.model_json_schema()), "strict": True}
+
+
+class _BatchResponses:
+    def __init__(self, collector: BatchCollector):
+        self._collector = collector
+
+    async def create(self, **params) -> Response:
+        return Response.model_validate(await self._collector.request("/v1/responses", params))
+
+    async def parse(self, *, text_format: Type[BaseModel], **params) -> ParsedResponse:
+        """Same as `AsyncResponses.parse`: the output texts are validated by `text_format` and exposed as `output_parsed`."""
+        params["text"] = {**params.get("text", {}), "format": json_schema_format(text_format)}
+        response = (await self.create(**params)).model_dump()
+        for item in response["output"]:
+            if item["type"] != "message":
+                continue
+            for content in item["content"]:
+                if content["type"] == "output_text":
+                    content["parsed"] = text_format.model_validate_json(content["text"])
+        return ParsedResponse[text_format].model_validate(response)
+
+
+class _BatchEmbeddings:
+    def __init__(self, collector: BatchCollector):
+        self._collector = collector
+
+    async def create(self, **params) -> CreateEmbeddingResponse:
+        return CreateEmbeddingResponse.model_validate(await self._collector.request("/v1/embeddings", params))
+
+
+class BatchClient:
+    """The subset of the AsyncOpenAI client used by NewsletterCreator, with every call going through a BatchCollector."""
+    def __init__(self, collector: BatchCollector):
+        self.responses = _BatchResponses(collector)
+        self.embeddings = _BatchEmbeddings(collector)
+
+
+def placeholder_value(schema: Dict, defs: Optional[Dict] = None):
+    """Returns the simplest value matching a JSON schema (first enum value, empty string or list, zero)."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return placeholder_value(defs[schema["$ref"].split("/")[-1]], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return placeholder_value(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: placeholder_value(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    return {"array": [], "string": "", "integer": 0, "number": 0, "boolean": False, "null": None}.get(kind)
+
+
+def placeholder_handler(endpoint: str, body: Dict) -> Dict:
+    """Answers batched requests without calling any model: schema-valid placeholder outputs and deterministic embeddings."""
+    if endpoint == "/v1/embeddings":
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for i, text in enumerate(inputs):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            data.append({"object": "embedding", "index": i, "embedding": np.random.default_rng(seed).standard_normal(8).tolist()})
+        return {"object": "list", "model": body["model"], "data": data, "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    text_format = body.get("text", {}).get("format", {})
+    text = json.dumps(placeholder_value(text_format["schema"])) if text_format.get("type") == "json_schema" else ""
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body["model"],
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+class _LocalFiles:
+    def __init__(self, backend: "LocalBatchBackend"):
+        self._backend = backend
+
+    async def create(self, file, purpose: str):
+        name, content = file
+        file_id = f"file-{uuid.uuid4().hex}"
+        self._backend.files_content[file_id] = content.decode("utf-8") if isinstance(content, bytes) else content
+        return FileObject(id=file_id, bytes=len(content), created_at=int(time.time()), filename=name, object="file", purpose=purpose, status="processed")
+
+    async def content(self, file_id: str):
+        # Only the `text` attribute of the live response is read
+        return SimpleNamespace(text=self._backend.files_content[file_id])
+
+
+class _LocalBatches:
+    def __init__(self, backend: "LocalBatchBackend"):
+        self._backend = backend
+
+    async def create(self, input_file_id: str, endpoint: str, completion_window: str):
+        batch = Batch(id=f"batch_{uuid.uuid4().hex}", object="batch", endpoint=endpoint, input_file_id=input_file_id,
+                      completion_window=completion_window, created_at=int(time.time()), status="in_progress")
+        self._backend.submitted[batch.id] = (batch, time.monotonic())
+        return batch
+
+    async def retrieve(self, batch_id: str):
+        batch, submitted_at = self._backend.submitted[batch_id]
+        if batch.status == "in_progress" and time.monotonic() - submitted_at >= self._backend.delay:
+            batch = self._backend.complete(batch)
+            self._backend.submitted[batch_id] = (batch, submitted_at)
+        return batch
+
+
+class LocalBatchBackend:
+    """
+    In-process stand-in for the OpenAI Files and Batch endpoints, to run the batch mode offline.
+
+    Batches complete `delay` seconds after their submission, once polled. Each request is answered
+    by `handler(endpoint, body)`, which returns the response body; requests whose handler raises
+    get an error line, as in the output files of the Batch API.
+    """
+    def __init__(self, handler: Callable[[str, Dict], Dict] = placeholder_handler, delay: float = 0):
+        self.handler = handler
+        self.delay = delay
+        self.files_content: Dict[str, str] = {}
+        self.submitted: Dict[str, Tuple[Batch, float]] = {}
+        self.files = _LocalFiles(self)
+        self.batches = _LocalBatches(self)
+
+    def complete(self, batch: Batch) -> Batch:
+        outputs, errors = [], []
+        for line in self.files_content[batch.input_file_id].splitlines():
+            request = json.loads(line)
+            try:
+                body = self.handler(request["url"], request["body"])
+                outputs.append({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body}, "error": None})
+            except Exception as e:
+                errors.append({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                               "response": {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": {"message": str(e)}}}, "error": None})
+        update = {"status": "completed", "completed_at": int(time.time())}
+        for key, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+            if lines:
+                file_id = f"file-{uuid.uuid4().hex}"
+                self.files_content[file_id] = "".join(json.dumps(line) + "\n" for line in lines)
+                update[key] = file_id
+        return batch.model_copy(update=update)
@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+import weakref
+import httpx
+import openai
+from config import LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_MIN_REMAINING_REQUESTS, LLM_MIN_REMAINING_TOKENS, \
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_TIMEOUT
+
+# Lower values run first: the short filter calls go ahead of the analysis and writer calls
+PRIORITY_FILTER = 0
+PRIORITY_ANALYZE = 1
+PRIORITY_WRITE = 2
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parses the reset durations of the rate limit headers ("20ms", "1s", "6m0s", "1h2m3.5s") in seconds."""
+    if not value:
+        return None
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Returns the delay requested by the Retry-After headers of a failed response, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class LLMScheduler:
+    """
+    Central scheduler of the OpenAI calls.
+
+    At most `max_concurrency` calls are in flight, waiting callers are served by priority, and the rate limit headers of the responses are tracked to
+    pause before the limits are hit. 429 and 5xx errors are retried with jittered exponential
+    backoff, honouring Retry-After.
+    """
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 min_remaining_requests: int = LLM_MIN_REMAINING_REQUESTS, min_remaining_tokens: int = LLM_MIN_REMAINING_TOKENS):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_remaining_requests = min_remaining_requests
+        self.min_remaining_tokens = min_remaining_tokens
+        self.limits = {"remaining_requests": None, "remaining_tokens": None}
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "paced": 0}
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._active = 0
+        self._waiters = []
+        self._counter = itertools.count()
+
+    def record_headers(self, headers):
+        """Updates the known limits from the x-ratelimit-* headers of a response."""
+        now = time.monotonic()
+        with self._lock:
+            for kind in ("requests", "tokens"):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = int(remaining)
+                except ValueError:
+                    continue
+                self.limits[f"remaining_{kind}"] = remaining
+                reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                threshold = self.min_remaining_requests if kind == "requests" else self.min_remaining_tokens
+                if reset and remaining <= threshold:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client to give to the OpenAI client, recording the headers of every response."""
+        async def on_response(response: httpx.Response):
+            self.record_headers(response.headers)
+
+        return openai.DefaultAsyncHttpxClient(
+            timeout=OPENAI_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            event_hooks={"response": [on_response]},
+        )
+
+    async def _acquire(self, priority: int):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        # The slot is handed over to the waiter with the highest priority
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _pace(self):
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            self.stats["paced"] += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        return max(delay, requested) if requested is not None else delay
+
+    async def run(self, fn: Callable[..., Awaitable], *args, priority: int = PRIORITY_WRITE, **kwargs):
+        """Awaits an OpenAI call (a coroutine function), retrying rate limits and server errors."""
+        await self._acquire(priority)
+        try:
+            attempt = 0
+            while True:
+                await self._pace()
+                self.stats["calls"] += 1
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if getattr(e, "status_code", None) == 429:
+                        self.stats["rate_limited"] += 1
+                        # Every caller waits, not only the one that hit the limit
+                        self.pause(delay)
+                    self.stats["retries"] += 1
+                    attempt += 1
+                    logging.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self._release()
+
+
+_llm_scheduler: Optional[LLMScheduler] = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Returns the scheduler shared by all the NewsletterCreator instances of the process."""
+    global _llm_scheduler
+    with _llm_scheduler_lock:
+        if _llm_scheduler is None:
+            _llm_scheduler = LLMScheduler()
+        return _llm_scheduler
+
+
+# One client per event loop, since its connection pool can't be shared between loops
+_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    """
+    Returns the OpenAI client of the running event loop, reused across newsletters and cycles.
+    Retries are left to the scheduler, which also records the rate limit headers of its responses.
+    """
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None or client.is_closed():
+        client = openai.AsyncOpenAI(max_retries=0, http_client=get_llm_scheduler().http_client())
+        _openai_clients[loop] = client
+    return client
+
+
+async def close_openai_client():
+    """Closes the OpenAI client of the running event loop."""
+    client = _openai_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
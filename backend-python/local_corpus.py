@@ -0,0 +1,379 @@
+"""
+Local corpus of paper metadata, searched offline by the "local" engine.
+
+Papers are ingested from bulk metadata dumps (OpenAlex works snapshots, Semantic Scholar papers
+and abstracts datasets, or search results saved as JSON lines) into a SQLite database with an
+FTS5 full-text index over their titles and abstracts. Dumps are streamed line by line, gzipped
+or not, and written in batches, so they are never held in memory. Daily deltas are ingested the
+same way: a record replaces the stored paper unless the stored one was updated more recently,
+and the deleted papers listed by a delta are removed with `delete`.
+
+Usage:
+    python local_corpus.py ingest works_part_000.gz works_part_001.gz --source openalex
+    python local_corpus.py ingest papers.jsonl.gz abstracts.jsonl.gz --source semantic_scholar
+    python local_corpus.py delete deleted_ids.jsonl --source semantic_scholar
+"""
+import argparse
+import gzip
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from paper_search import PaperSearch, OpenAlexSearch, reconstruct_abstract
+from config import LOCAL_CORPUS_PATH, LOCAL_CORPUS_BATCH_SIZE
+
+# OpenAlex work types mapped to the Semantic Scholar publication types used by the newsletter filters
+OPENALEX_TYPES = {
+    "article": "JournalArticle",
+    "review": "Review",
+    "book": "Book",
+    "book-chapter": "BookSection",
+    "dataset": "Dataset",
+    "editorial": "Editorial",
+    "letter": "LettersAndComments",
+}
+
+COLUMNS = ["paper_id", "title", "abstract", "publication_date", "year", "venue", "publication_types",
+           "citation_count", "open_access", "url", "authors", "external_ids", "updated_at"]
+
+
+def _first(record: Dict, *keys):
+    """The first non-null value among `keys`, dumps and API responses spell the same fields differently."""
+    for key in keys:
+        if record.get(key) is not None:
+            return record[key]
+    return None
+
+
+def _json(value) -> Optional[str]:
+    return json.dumps(value) if value is not None else None
+
+
+def openalex_id(work: Dict) -> Optional[str]:
+    return work.get("id")
+
+
+def normalize_openalex(work: Dict) -> Optional[Dict]:
+    """Returns the row of an OpenAlex work (as in the works snapshot and the API), None without ID."""
+    paper_id = openalex_id(work)
+    if not paper_id:
+        return None
+    location = work.get("primary_location") or {}
+    source = location.get("source") or {}
+    types = [OPENALEX_TYPES[work["type"]]] if work.get("type") in OPENALEX_TYPES else []
+    if source.get("type") == "conference":
+        types.append("Conference")
+    authors = [{"name": (au.get("author") or {}).get("display_name"), "authorId": (au.get("author") or {}).get("id")}
+               for au in work.get("authorships") or [] if au]
+    inverted_index = work.get("abstract_inverted_index")
+    return {
+        "paper_id": paper_id,
+        "title": _first(work, "title", "display_name"),
+        "abstract": reconstruct_abstract(inverted_index) if inverted_index else None,
+        "publication_date": work.get("publication_date"),
+        "year": work.get("publication_year"),
+        "venue": source.get("display_name"),
+        "publication_types": _json(types) if work.get("type") else None,
+        "citation_count": work.get("cited_by_count"),
+        "open_access": int(bool((work.get("open_access") or {}).get("is_oa"))) if work.get("open_access") else None,
+        "url": work.get("doi") or location.get("landing_page_url"),
+        "authors": _json(authors) if "authorships" in work else None,
+        "external_ids": _json(OpenAlexSearch._external_ids(work)),
+        "updated_at": work.get("updated_date"),
+    }
+
+
+def semantic_scholar_id(record: Dict) -> Optional[str]:
+    # The datasets are keyed on the corpus ID, the API on the paper ID
+    corpus_id = _first(record, "corpusid", "corpusId")
+    return record.get("paperId") or (f"CorpusId:{corpus_id}" if corpus_id is not None else None)
+
+
+def normalize_semantic_scholar(record: Dict) -> Optional[Dict]:
+    """
+    Returns the row of a Semantic Scholar record: a paper of the papers dataset, an abstract of
+    the abstracts dataset (merged into the paper of the same corpus ID) or a paper of the API.
+    None without ID.
+    """
+    paper_id = semantic_scholar_id(record)
+    if not paper_id:
+        return None
+    external_ids = _first(record, "externalids", "externalIds")
+    corpus_id = _first(record, "corpusid", "corpusId")
+    if external_ids is not None and corpus_id is not None:
+        external_ids = {**external_ids, "CorpusId": str(corpus_id)}
+    authors = record.get("authors")
+    if authors is not None:
+        authors = [{"name": a.get("name"), "authorId": _first(a, "authorId", "authorid")} for a in authors if a]
+    open_access = _first(record, "isopenaccess", "isOpenAccess")
+    venue = record.get("venue") or (record.get("publicationVenue") or {}).get("name")
+    return {
+        "paper_id": paper_id,
+        "title": record.get("title"),
+        "abstract": record.get("abstract"),
+        "publication_date": _first(record, "publicationdate", "publicationDate"),
+        "year": record.get("year"),
+        "venue": venue or None,
+        "publication_types": _json(_first(record, "publicationtypes", "publicationTypes")),
+        "citation_count": _first(record, "citationcount", "citationCount"),
+        "open_access": int(bool(open_access)) if open_access is not None else None,
+        "url": record.get("url"),
+        "authors": _json(authors),
+        "external_ids": _json(external_ids),
+        "updated_at": _first(record, "updated", "updatedAt"),
+    }
+
+
+NORMALIZERS: Dict[str, Callable[[Dict], Optional[Dict]]] = {"openalex": normalize_openalex, "semantic_scholar": normalize_semantic_scholar}
+IDS: Dict[str, Callable[[Dict], Optional[str]]] = {"openalex": openalex_id, "semantic_scholar": semantic_scholar_id}
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Yields the records of a JSON lines file, gzipped when its name ends with .gz. Invalid lines are skipped."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping an invalid line of {path}")
+
+
+def match_expression(query: str) -> str:
+    """
+    Turns a free-text query into an FTS5 expression matching any of its words. Words are quoted
+    so that the query syntax (AND, NEAR, column filters...) is never interpreted, and the BM25
+    ranking puts the papers matching the most (and rarest) words first.
+    """
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(re.findall(r"\w+", query.lower())))
+
+
+class LocalCorpus:
+    """
+    SQLite store of the paper metadata, with an FTS5 index over titles and abstracts kept in
+    sync by triggers. Searches are ranked by BM25, titles weighing twice as much as abstracts.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or LOCAL_CORPUS_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    rowid INTEGER PRIMARY KEY,
+                    paper_id TEXT NOT NULL UNIQUE,
+                    title TEXT,
+                    abstract TEXT,
+                    publication_date TEXT,
+                    year INTEGER,
+                    venue TEXT,
+                    publication_types TEXT,
+                    citation_count INTEGER,
+                    open_access INTEGER,
+                    url TEXT,
+                    authors TEXT,
+                    external_ids TEXT,
+                    updated_at TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS papers_publication_date ON papers (publication_date)")
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts
+                USING fts5(title, abstract, content='papers', content_rowid='rowid')
+            """)
+            self._conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+                    INSERT INTO papers_fts (rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+                    INSERT INTO papers_fts (papers_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE OF title, abstract ON papers BEGIN
+                    INSERT INTO papers_fts (papers_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+                    INSERT INTO papers_fts (rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+                END;
+            """)
+
+    def upsert_many(self, records: Iterable[Dict], source: str, batch_size: int = LOCAL_CORPUS_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Stores the records of an engine (see NORMALIZERS), `batch_size` per transaction. The
+        fields a record leaves out keep their stored value, so partial records (e.g. the
+        abstracts dataset of Semantic Scholar) complete the stored papers. A record is skipped
+        when the stored paper was updated after it. Returns the number of stored, skipped
+        (older than the stored paper) and invalid records.
+        """
+        normalize = NORMALIZERS[source]
+        updates = ", ".join(f"{c} = COALESCE(excluded.{c}, {c})" for c in COLUMNS[1:])
+        sql = f"""
+            INSERT INTO papers ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+            ON CONFLICT (paper_id) DO UPDATE SET {updates}
+            WHERE excluded.updated_at IS NULL OR updated_at IS NULL OR excluded.updated_at >= updated_at
+        """
+        stats = {"stored": 0, "skipped": 0, "invalid": 0}
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return stats
+            rows = []
+            for record in batch:
+                row = normalize(record) if isinstance(record, dict) else None
+                if row is None:
+                    stats["invalid"] += 1
+                else:
+                    rows.append([row[c] for c in COLUMNS])
+            # The row count leaves out the changes of the FTS triggers
+            with self._lock, self._conn:
+                stored = self._conn.executemany(sql, rows).rowcount if rows else 0
+            stats["stored"] += stored
+            stats["skipped"] += len(rows) - stored
+
+    def ingest(self, path: str, source: str, batch_size: int = LOCAL_CORPUS_BATCH_SIZE) -> Dict[str, int]:
+        """Streams a JSON lines dump (or delta) of an engine into the corpus, see `upsert_many`."""
+        started = time.monotonic()
+        stats = self.upsert_many(read_records(path), source, batch_size=batch_size)
+        logging.info(f"Ingested {path} in {time.monotonic() - started:.1f}s: {stats}")
+        return stats
+
+    def delete(self, path: str, source: str, batch_size: int = LOCAL_CORPUS_BATCH_SIZE) -> int:
+        """Removes the papers listed in a JSON lines file of deleted records. Returns the number of papers removed."""
+        paper_id = IDS[source]
+        ids = (paper_id(record) for record in read_records(path) if isinstance(record, dict))
+        deleted = 0
+        while True:
+            batch = [[i] for i in itertools.islice(ids, batch_size) if i]
+            if not batch:
+                return deleted
+            with self._lock, self._conn:
+                deleted += self._conn.executemany("DELETE FROM papers WHERE paper_id = ?", batch).rowcount
+
+    def search(self, query: str, start_date: str, limit: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, offset: int = 0) -> List[Dict]:
+        """Returns up to `limit` papers matching the query, published in the date range and passing the filters, best first."""
+        expression = match_expression(query)
+        if not expression or limit <= 0:
+            return []
+        conditions = ["papers_fts MATCH ?", "p.title IS NOT NULL", "p.publication_date >= ?"]
+        params: List = [expression, start_date]
+        if end_date:
+            conditions.append("p.publication_date <= ?")
+            params.append(end_date)
+        filters = filters or {}
+        if filters.get("venues"):
+            conditions.append(f"lower(p.venue) IN ({','.join('?' * len(filters['venues']))})")
+            params.extend(v.lower() for v in filters["venues"])
+        if filters.get("publicationTypes"):
+            conditions.append(f"EXISTS (SELECT 1 FROM json_each(p.publication_types) WHERE value IN ({','.join('?' * len(filters['publicationTypes']))}))")
+            params.extend(filters["publicationTypes"])
+        if filters.get("minCitationCount"):
+            conditions.append("p.citation_count >= ?")
+            params.append(int(filters["minCitationCount"]))
+        if filters.get("openAccessPdf"):
+            conditions.append("p.open_access = 1")
+
+        sql = f"""
+            SELECT {", ".join(f"p.{c}" for c in COLUMNS)} FROM papers_fts JOIN papers p ON p.rowid = papers_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bm25(papers_fts, 2.0, 1.0) LIMIT ? OFFSET ?
+        """
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, limit, offset]).fetchall()
+        return [self._paper(dict(zip(COLUMNS, row))) for row in rows]
+
+    @staticmethod
+    def _paper(row: Dict) -> Dict:
+        """A stored row as a paper of the search engines (see config.FIELDS)."""
+        return {
+            "paperId": row["paper_id"],
+            "title": row["title"],
+            "abstract": row["abstract"] or "",
+            "year": row["year"],
+            "url": row["url"],
+            "publicationDate": row["publication_date"],
+            "authors": json.loads(row["authors"]) if row["authors"] else [],
+            "citationCount": row["citation_count"] or 0,
+            "venue": row["venue"],
+            "publicationVenue": {"name": row["venue"]} if row["venue"] else None,
+            "publicationTypes": json.loads(row["publication_types"]) if row["publication_types"] else [],
+            "isOpenAccess": bool(row["open_access"]),
+            "externalIds": json.loads(row["external_ids"]) if row["external_ids"] else {},
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+
+class LocalCorpusSearch(PaperSearch):
+    """
+    A paper searcher over the local corpus. Searches make no network call and are not rate
+    limited. The dumps carry no author metrics, so the h-indexes of the authors are unknown.
+    """
+    name = "local"
+    max_page_size = 500
+
+    def __init__(self, corpus: Optional[LocalCorpus] = None, lean: bool = False):
+        # Papers always come with all their fields, `lean` is accepted like for the remote engines
+        self.corpus = corpus if corpus is not None else get_local_corpus()
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Yields the papers of the local corpus matching the query, a page of `page_size` papers at a time.
+        """
+        page_size = min(page_size or nb_papers, self.max_page_size)
+        offset = 0
+        while offset < nb_papers:
+            limit = min(page_size, nb_papers - offset)
+            papers = self.corpus.search(query, start_date, limit, end_date=end_date, filters=filters, offset=offset)
+            yield from papers
+            if len(papers) < limit:
+                return
+            offset += limit
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Searches for papers in the local corpus.
+        """
+        return self.corpus.search(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+
+_local_corpus: Optional[LocalCorpus] = None
+_local_corpus_lock = threading.Lock()
+
+
+def get_local_corpus() -> LocalCorpus:
+    """Returns the local corpus shared by the worker and the API endpoints."""
+    global _local_corpus
+    with _local_corpus_lock:
+        if _local_corpus is None:
+            _local_corpus = LocalCorpus()
+        return _local_corpus
+
+
+def main(args):
+    corpus = LocalCorpus(args.db)
+    for path in args.paths:
+        if args.command == "ingest":
+            corpus.ingest(path, args.source)
+        else:
+            logging.info(f"Deleted {corpus.delete(path, args.source)} papers listed in {path}")
+    logging.info(f"The local corpus holds {len(corpus)} papers.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["ingest", "delete"])
+    parser.add_argument("paths", nargs="+", help="JSON lines files, gzipped when their name ends with .gz")
+    parser.add_argument("--source", choices=sorted(NORMALIZERS), required=True, help="Engine the records come from")
+    parser.add_argument("--db", default=LOCAL_CORPUS_PATH, help="SQLite file of the corpus")
+    main(parser.parse_args())
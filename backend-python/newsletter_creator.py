@@ -1,17 +1,61 @@
 import prompts
-from data_models import RelevanceOutput, QueryGeneratorOutput, PaperAnalyzerOutput, NewsletterWriterOutput, SotANewsletterOutput
-from paper_search import SemanticSearch, OpenAlexSearch
+from data_models import RelevanceOutput, BatchRelevanceOutput, QueryGeneratorOutput, PaperAnalyzerOutput, NewsletterWriterOutput, SotANewsletterOutput
+from paper_search import SemanticSearch, OpenAlexSearch, SearchError
+from circuit_breaker import get_circuit_breaker
+from search_cache import CachedSearch, get_search_cache
+from local_corpus import LocalCorpusSearch
+from llm_scheduler import LLMScheduler, get_llm_scheduler, get_openai_client, PRIORITY_FILTER, PRIORITY_ANALYZE, PRIORITY_WRITE
+from embedding_store import embed_texts, get_embedding_store, top_k
+from dedup import DedupIndex, PublishedIndex
+from relevance_cache import definition_key, paper_key, get_relevance_cache, calibrate_floor
+from config import SEARCH_CACHE_ENABLED, SEARCH_LAZY_ENRICHMENT, RELEVANCE_CACHE_ENABLED, RELEVANCE_BATCH_SIZE, EMBEDDING_STORE_ENABLED, \
+    RELEVANCE_PREFILTER_ENABLED, RELEVANCE_PREFILTER_RECALL, RELEVANCE_PREFILTER_MIN_SAMPLES, RELEVANCE_PREFILTER_EXPLORE_RATE
 import asyncio
+import random
+import sqlite3
+from contextlib import aclosing
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 import numpy as np
 import re
-from openai import OpenAI, AsyncOpenAI
-import time
+from openai import AsyncOpenAI
 
-def generate_queries(topic: str, description: str, model: str="gpt-5-mini") -> List[str]:
-    client = OpenAI()
-    response = client.responses.parse(
+# Engine searched instead of another one while the circuit breaker of the latter is open
+FALLBACK_ENGINES = {"semantic_scholar": "openalex", "openalex": "semantic_scholar"}
+
+
+def select_engines(search_engine: str) -> List[str]:
+    """
+    Returns the engines to search for a newsletter's `searchEngine` setting. An engine whose
+    circuit breaker is open is replaced by its fallback when the latter is healthy (or dropped in
+    "all" mode). Otherwise it is kept: its calls fail fast, and cached results are still served.
+    The "local" engine searches the local corpus, it has no fallback.
+    """
+    if search_engine == "openalex":
+        engines = ["openalex"]
+    elif search_engine == "local":
+        engines = ["local"]
+    elif search_engine == "all":
+        engines = ["semantic_scholar", "openalex"]
+    else: # Default is "semantic_scholar"
+        engines = ["semantic_scholar"]
+
+    selected = []
+    for engine in engines:
+        fallback = FALLBACK_ENGINES.get(engine)
+        if fallback and get_circuit_breaker(engine).is_open() and not get_circuit_breaker(fallback).is_open():
+            print(f"The {engine} circuit breaker is open, searching {fallback} instead.")
+            engine = fallback
+        if engine not in selected:
+            selected.append(engine)
+    return selected
+
+async def generate_queries(topic: str, description: str, model: str="gpt-5-mini", client: Optional[AsyncOpenAI] = None, llm_scheduler: Optional[LLMScheduler] = None) -> List[str]:
+    client = client or get_openai_client()
+    llm_scheduler = llm_scheduler or get_llm_scheduler()
+    response = await llm_scheduler.run(
+        client.responses.parse,
+        priority=PRIORITY_FILTER,
         model=model,
         input=prompts.query_generator_prompt.format(
             topic=topic,
@@ -41,104 +85,225 @@ def get_paper_score(paper: Dict) -> float:
     return float(np.log1p(citation_score) + max_h_index)
 
 
+def normalize_title(paper: Dict) -> str:
+    return re.sub(r'\W+', '', (paper.get("title") or "").lower())
+
+
 class NewsletterCreator:
-    def __init__(self, model: str = "gpt-5-mini", embedding_model="text-embedding-3-large", temperature: float = 0, api_client=None):
+    def __init__(self, model: str = "gpt-5-mini", embedding_model="text-embedding-3-large", temperature: float = 0, api_client=None, search_coalescer=None, hedger=None, relevance_cache=None, relevance_batch_size: int = RELEVANCE_BATCH_SIZE, llm_scheduler: Optional[LLMScheduler] = None, client: Optional[AsyncOpenAI] = None, embedding_store=None, prefilter: Optional[bool] = None):
         self.model = model
         self.embedding_model = embedding_model
         self.temperature = temperature
-        self.client = OpenAI()
+        self.llm_scheduler = llm_scheduler or get_llm_scheduler()
+        self._client = client
+        self.embedding_store = embedding_store
         self.api_client = api_client
-
-    def search(self, topic, description, start_date, end_date=None, max_papers: int = 10, queries=None, filters=None, newsletter_id=None, search_engine="semantic_scholar"):
+        self.search_coalescer = search_coalescer
+        self.hedger = hedger
+        self.relevance_cache = relevance_cache
+        self.relevance_batch_size = relevance_batch_size
+        self.prefilter = RELEVANCE_PREFILTER_ENABLED if prefilter is None else prefilter
+        self.filter_stats = {"calls": 0, "fallbacks": 0}
+        self.prefilter_stats = {"kept": 0, "dropped": 0}
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The shared OpenAI client of the running event loop, unless a client was given."""
+        return self._client or get_openai_client()
+
+    async def search(self, topic, description, start_date, end_date=None, max_papers: int = 10, queries=None, filters=None, newsletter_id=None, search_engine="semantic_scholar", max_candidates: Optional[int] = None):
         if not queries or len(queries) == 0:
             print("No stored queries found. Generating search queries...")
-            queries = generate_queries(topic, description, model=self.model)
+            queries = await generate_queries(topic, description, model=self.model, client=self.client, llm_scheduler=self.llm_scheduler)
             print("Search queries generated:", queries)
             # Update the newsletter with the generated queries if api_client and newsletter_id are provided
             if self.api_client and newsletter_id:
                 try:
-                    self.api_client.update_newsletter(newsletter_id, {"queries": queries})
+                    await asyncio.to_thread(self.api_client.update_newsletter, newsletter_id, {"queries": queries})
                     print(f"Newsletter {newsletter_id} updated with generated queries.")
                 except Exception as e:
                     print(f"Failed to update newsletter {newsletter_id} with queries: {e}")
         else:
             print("Using stored search queries:", queries)
 
-        searchers = []
-        if search_engine == "openalex":
-            searchers.append(OpenAlexSearch())
-        elif search_engine == "all":
-            searchers.append(SemanticSearch())
-            searchers.append(OpenAlexSearch())
-        else: # Default is "semantic_scholar"
-            searchers.append(SemanticSearch())
-
-        results = []
-        for searcher in searchers:
-            for query in queries:
-                results.extend(searcher.search(
-                    query, start_date, max_papers, end_date=end_date, filters=filters))
-                time.sleep(1) # Add a 1-second delay to respect API rate limits
-
-        # Filter unique papers (by title normalization if IDs differ, but paperId is usually a good start)
-        # We use a dict to deduplicate by title (normalized) to catch papers found across different engines
-        unique_papers = {}
-        for p in results:
-            title_norm = re.sub(r'\W+', '', p["title"].lower())
-            if title_norm not in unique_papers:
-                unique_papers[title_norm] = p
-
-        return list(unique_papers.values())
-
-    async def create_newsletter(self, topic: str, start_date: str, description: str="", nb_papers: int = 5, end_date: str = None, max_papers: int = 10, queries=None, ranking_strategy='author_based', filters=None, newsletter_id=None, search_engine="semantic_scholar", issue_format: str = 'classic') -> Dict:
+        # With lazy enrichment, the engines only return lean papers and `enrich_papers` fetches
+        # the authors metrics, venue and citations of the papers kept by the relevance filter
+        engines = {"semantic_scholar": SemanticSearch, "openalex": OpenAlexSearch, "local": LocalCorpusSearch}
+
+        def build(engine):
+            searcher = engines[engine](lean=SEARCH_LAZY_ENRICHMENT)
+            # The local corpus answers faster than the cache, and its results change with each delta
+            if SEARCH_CACHE_ENABLED and engine != LocalCorpusSearch.name:
+                searcher = CachedSearch(searcher, get_search_cache())
+            if self.search_coalescer:
+                searcher = self.search_coalescer.wrap(searcher)
+            return searcher
+
+        # With a hedger, slow queries of an engine are also sent to its fallback engine
+        selected = select_engines(search_engine)
+        searchers = [build(engine) for engine in selected]
+        if self.hedger:
+            searchers = [self.hedger.wrap(searcher, build(FALLBACK_ENGINES[engine])) if engine in FALLBACK_ENGINES else searcher
+                         for engine, searcher in zip(selected, searchers)]
+
+        # Engines run concurrently, each one pacing its queries with its own rate limiter,
+        # so "all" mode costs the latency of the slowest engine rather than the sum.
+        # Papers are deduplicated as the pages arrive (on their DOI, arXiv and external IDs, then
+        # on their titles, see DedupIndex), and once `max_candidates` unique papers were found
+        # the streams are closed, so the following pages are never requested.
+        # Papers the newsletter already published are dropped before counting as candidates
+        index = DedupIndex()
+        published = await self.published_papers(newsletter_id)
+        seen = []
+
+        async def search_query(searcher, query):
+            async with aclosing(searcher.aiter_search(query, start_date, max_papers, end_date=end_date, filters=filters)) as stream:
+                try:
+                    async for paper in stream:
+                        if max_candidates and len(index) >= max_candidates:
+                            break
+                        if paper in published:
+                            seen.append(paper)
+                            continue
+                        index.add(paper)
+                except SearchError:
+                    # Logged by the engine, the papers of the pages before the failed one are kept
+                    pass
+
+        await asyncio.gather(*[search_query(searcher, query) for searcher in searchers for query in queries])
+        if seen:
+            print(f"Dropped {len(seen)} results already published by the newsletter.")
+        duplicates = index.stats["id_duplicates"] + index.stats["title_duplicates"]
+        if duplicates:
+            print(f"Dropped {duplicates} duplicate papers ({index.stats['id_duplicates']} by ID, {index.stats['title_duplicates']} by title).")
+        return index.papers
+
+    async def published_papers(self, newsletter_id=None) -> PublishedIndex:
+        """Fetches the IDs and DOIs of the papers already published by the newsletter (an empty index without API client)."""
+        if not (self.api_client and newsletter_id):
+            return PublishedIndex()
+        published = await asyncio.to_thread(self.api_client.get_published_papers, newsletter_id)
+        if published is None:
+            print(f"Failed to fetch the papers published by newsletter {newsletter_id}, none are excluded.")
+            return PublishedIndex()
+        return PublishedIndex(published.get("paperIds", []), published.get("dois", []))
+
+    async def create_newsletter(self, topic: str, start_date: str, description: str="", nb_papers: int = 5, end_date: str = None, max_papers: int = 10, queries=None, ranking_strategy='author_based', filters=None, newsletter_id=None, search_engine="semantic_scholar", issue_format: str = 'classic', max_candidates: Optional[int] = None) -> Dict:
         print(f"Searching for papers (engine: {search_engine}, strategy: {ranking_strategy}, filters: {filters})...")
-        papers = self.search(topic, description=description, start_date=start_date, end_date=end_date, max_papers=max_papers, queries=queries, filters=filters, newsletter_id=newsletter_id, search_engine=search_engine)
+        papers = await self.search(topic, description=description, start_date=start_date, end_date=end_date, max_papers=max_papers, queries=queries, filters=filters, newsletter_id=newsletter_id, search_engine=search_engine, max_candidates=max_candidates)
+        return await self.generate_newsletter(topic, papers, description=description, nb_papers=nb_papers, ranking_strategy=ranking_strategy, issue_format=issue_format)
+
+    async def generate_newsletter(self, topic: str, papers: List[Dict], description: str="", nb_papers: int = 5, ranking_strategy='author_based', issue_format: str = 'classic', checkpoint=None) -> Optional[Dict]:
+        """
+        Runs the LLM part of the pipeline (filter, rank, analyze, write) on already searched papers.
+        Returns None when no relevant paper is left.
+        With a `checkpoint` (a NewsletterRun), the relevant papers, the analyses and the written issue
+        are saved as they complete, and a resumed run starts after the last saved one.
+        """
+        if checkpoint is not None and "written" in checkpoint:
+            print("Reusing the checkpointed issue.")
+            return checkpoint.get("written")
+
+        result = None
         if papers:
-            print(f"Found {len(papers)} papers. Filtering for relevance...")
-            papers = await self.filter_papers(topic, papers, description=description)
-            print(f"{len(papers)} papers are relevant.")
+            if checkpoint is not None and "filtered" in checkpoint:
+                papers = checkpoint.get("filtered")
+                print(f"Reusing {len(papers)} checkpointed relevant papers.")
+            else:
+                print(f"Found {len(papers)} papers. Filtering for relevance...")
+                papers = await self.filter_papers(topic, papers, description=description)
+                print(f"{len(papers)} papers are relevant.")
+                if len(papers) > 0:
+                    papers = await self.enrich_papers(papers)
+                await self._checkpoint(checkpoint, "filtered", papers)
             if len(papers) > 0:
                 if issue_format == 'state_of_the_art':
                     print(f"Writing state-of-the-art review for {len(papers)} papers...")
-                    newsletter = self.write_sota_newsletter(topic, papers, description=description)
+                    newsletter = await self.write_sota_newsletter(topic, papers, description=description)
                     papers_with_analysis = [{"paper": p, "analysis": {"synthesis": None, "usefulness": None}} for p in papers]
                 else:
-                    print(f"Ranking and top-{nb_papers} selection...")
-                    if ranking_strategy == 'author_based':
-                        for p in papers:
-                            p["score"] = get_paper_score(p)
-                        papers = sorted(papers, key=lambda p: p["score"], reverse=True)[:nb_papers]
+                    if checkpoint is not None and "analyzed" in checkpoint:
+                        papers_with_analysis = checkpoint.get("analyzed")
+                        print(f"Reusing {len(papers_with_analysis)} checkpointed analyses.")
                     else:
-                        response = self.client.embeddings.create(
-                            model=self.embedding_model,
-                            input=[f"{topic}\n{description}"] + [p["abstract"] for p in papers]
-                        )
-                        embbedings = [obj.embedding for obj in response.data]
-
-                        v0 = embbedings[0]
-                        norm0 = np.linalg.norm(v0)
-
-                        for i, p in enumerate(papers):
-                            emb = embbedings[i + 1]
-                            p["score"] = np.dot(v0, emb)/(norm0 * np.linalg.norm(emb))
-
-                        papers = sorted(papers, key=lambda p: p["score"], reverse=True)[:nb_papers]
-
-                    print(f"Analyzing {len(papers)} papers...")
-                    analyzes = await self.analyze_papers(topic, papers, description=description)
-                    papers_with_analysis = [{"paper": paper, "analysis": analysis.model_dump()} for paper, analysis in zip(papers, analyzes)]
-                    newsletter = self.write_newsletter(topic, papers_with_analysis, description=description)
-
-                return {'newsletter': newsletter, 'papers': papers_with_analysis}
-        return None
+                        print(f"Ranking and top-{nb_papers} selection...")
+                        if ranking_strategy == 'author_based':
+                            for p in papers:
+                                p["score"] = get_paper_score(p)
+                            papers = sorted(papers, key=lambda p: p["score"], reverse=True)[:nb_papers]
+                        else:
+                            # Vectors are normalized, so cosine similarities are a single matrix-vector product
+                            vectors = await self.embed([f"{topic}\n{description}"] + [p["abstract"] for p in papers])
+                            scores = vectors[1:] @ vectors[0]
+                            top = top_k(scores, nb_papers)
+                            papers = [papers[i] for i in top]
+                            for p, i in zip(papers, top):
+                                p["score"] = float(scores[i])
+
+                        print(f"Analyzing {len(papers)} papers...")
+                        analyzes = await self.analyze_papers(topic, papers, description=description)
+                        papers_with_analysis = [{"paper": paper, "analysis": analysis.model_dump()} for paper, analysis in zip(papers, analyzes)]
+                        await self._checkpoint(checkpoint, "analyzed", papers_with_analysis)
+                    newsletter = await self.write_newsletter(topic, papers_with_analysis, description=description)
+
+                result = {'newsletter': newsletter, 'papers': papers_with_analysis}
+        await self._checkpoint(checkpoint, "written", result)
+        return result
+
+    @staticmethod
+    async def _checkpoint(checkpoint, stage: str, value):
+        if checkpoint is None:
+            return
+        try:
+            await asyncio.to_thread(checkpoint.put, stage, value)
+        except sqlite3.Error as e:
+            print(f"Error writing the '{stage}' checkpoint: {e}")
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns the normalized embeddings of the texts. Texts already embedded with the same
+        model are read from the embedding store, the others are embedded in concurrent chunks.
+        """
+        async def embed_chunk(chunk):
+            response = await self.llm_scheduler.run(
+                self.client.embeddings.create,
+                priority=PRIORITY_ANALYZE,
+                model=self.embedding_model,
+                input=chunk
+            )
+            return [obj.embedding for obj in response.data]
+
+        store = self.embedding_store or (get_embedding_store(self.embedding_model) if EMBEDDING_STORE_ENABLED else None)
+        return await embed_texts(texts, self.embedding_model, embed_chunk, store=store)
+
+    async def enrich_papers(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Fetches the fields left out of lean search results, for each engine the papers come from.
+        Papers returned with all their fields have no "source" and are left untouched.
+        """
+        engines = {"semantic_scholar": SemanticSearch, "openalex": OpenAlexSearch}
+        by_source = {}
+        for p in papers:
+            if p.get("source") in engines:
+                by_source.setdefault(p.pop("source"), []).append(p)
+        if by_source:
+            print(f"Enriching {sum(len(group) for group in by_source.values())} papers...")
+            await asyncio.gather(*[engines[source](lean=True).aenrich(group) for source, group in by_source.items()])
+        return papers
+
+    async def judge_relevance(self, topic: str, papers: List[Dict], description: str="", batch_size: Optional[int] = None) -> List[Dict]:
+        """
+        Asks the LLM whether each paper is relevant and returns the RelevanceOutput dicts, in the
+        order of the papers. With a `batch_size` above 1, `batch_size` papers are classified per
+        call, and papers whose verdict is missing or malformed are judged again one by one.
+        """
+        batch_size = batch_size or self.relevance_batch_size
 
-    async def filter_papers(self, topic: str, papers: List[Dict], description: str="") -> List[Dict]:
         async def do_filter(paper):
-            if not paper['title'] or not paper['abstract']:
-                return 'no'
-
-            response = await asyncio.to_thread(
+            self.filter_stats["calls"] += 1
+            response = await self.llm_scheduler.run(
                 self.client.responses.parse,
+                priority=PRIORITY_FILTER,
                 model=self.model,
                 input=prompts.paper_filterer_prompt.format(
                     topic=topic,
@@ -149,18 +314,131 @@ class NewsletterCreator:
                 text_format=RelevanceOutput
             )
             parsed_response: RelevanceOutput = response.output_parsed
-            return parsed_response.is_relevant
+            return parsed_response.model_dump()
+
+        async def do_batch_filter(batch):
+            self.filter_stats["calls"] += 1
+            verdicts = {}
+            try:
+                response = await self.llm_scheduler.run(
+                    self.client.responses.parse,
+                    priority=PRIORITY_FILTER,
+                    model=self.model,
+                    input=prompts.paper_batch_filterer_prompt.format(
+                        topic=topic,
+                        description=description,
+                        papers="\n".join(
+                            prompts.paper_batch_item.format(index=i, title=p['title'], abstract=p['abstract'])
+                            for i, p in enumerate(batch, 1))
+                    ),
+                    text_format=BatchRelevanceOutput
+                )
+                parsed_response: BatchRelevanceOutput = response.output_parsed
+                for verdict in parsed_response.verdicts:
+                    # Verdicts are numbered from 1, out of range and repeated indexes are ignored
+                    if 1 <= verdict.index <= len(batch) and verdict.index not in verdicts:
+                        verdicts[verdict.index] = {"reasonning": verdict.reasonning, "is_relevant": verdict.is_relevant}
+            except Exception as e:
+                print(f"Batched relevance call failed, falling back to single-paper calls: {e}")
+
+            missing = [i for i in range(1, len(batch) + 1) if i not in verdicts]
+            self.filter_stats["fallbacks"] += len(missing)
+            for i, verdict in zip(missing, await asyncio.gather(*[do_filter(batch[i - 1]) for i in missing])):
+                verdicts[i] = verdict
+            return [verdicts[i] for i in range(1, len(batch) + 1)]
+
+        if batch_size <= 1:
+            return await asyncio.gather(*[do_filter(paper) for paper in papers])
+
+        batches = [papers[i:i + batch_size] for i in range(0, len(papers), batch_size)]
+        results = await asyncio.gather(*[do_batch_filter(batch) for batch in batches])
+        return [verdict for batch_verdicts in results for verdict in batch_verdicts]
+
+    def _filter_prompt(self) -> str:
+        return prompts.paper_filterer_prompt if self.relevance_batch_size <= 1 else prompts.paper_batch_filterer_prompt
 
-        tasks = [do_filter(paper) for paper in papers]
-        results = await asyncio.gather(*tasks)
-        filtered_papers = [paper for paper, is_relevant in zip(
-            papers, results) if is_relevant == "yes"]
+    async def filter_papers(self, topic: str, papers: List[Dict], description: str="") -> List[Dict]:
+        """
+        Keeps the papers the LLM judges relevant. Verdicts are cached per newsletter definition
+        (topic, description, filter prompt and model), so only unseen papers go to the model.
+        """
+        # Papers without title or abstract can't be judged and are dropped
+        candidates = [paper for paper in papers if paper['title'] and paper['abstract']]
+        keys = [paper_key(paper) for paper in candidates]
+        definition = definition_key(topic, description, self._filter_prompt(), self.model)
+        cache = self.relevance_cache or (get_relevance_cache() if RELEVANCE_CACHE_ENABLED else None)
+
+        verdicts = {}
+        if cache is not None:
+            try:
+                verdicts = await asyncio.to_thread(cache.get_many, definition, keys)
+            except sqlite3.Error as e:
+                print(f"Error reading the relevance cache: {e}")
+        misses = {key: paper for paper, key in zip(candidates, keys) if key not in verdicts}
+        if verdicts:
+            print(f"Reusing {len(verdicts)} cached relevance verdicts, {len(misses)} papers left to judge.")
+
+        similarities = {}
+        if self.prefilter and cache is not None and misses:
+            try:
+                vectors = await self.embed([f"{topic}\n{description}"] + [paper['abstract'] for paper in candidates])
+                similarities = dict(zip(keys, (vectors[1:] @ vectors[0]).tolist()))
+                misses = await self.prefilter_papers(misses, similarities, definition, cache)
+            except Exception as e:
+                print(f"Embedding pre-filter failed, sending every paper to the LLM: {e}")
+
+        results = await self.judge_relevance(topic, list(misses.values()), description=description)
+        new_verdicts = dict(zip(misses, results))
+        if cache is not None and new_verdicts:
+            try:
+                await asyncio.to_thread(cache.set_many, definition, new_verdicts)
+            except sqlite3.Error as e:
+                print(f"Error writing to the relevance cache: {e}")
+        verdicts.update(new_verdicts)
+
+        if similarities:
+            try:
+                await asyncio.to_thread(cache.record_similarities, definition, self.embedding_model,
+                                        {key: (similarities[key], verdict["is_relevant"] == "yes") for key, verdict in verdicts.items() if key in similarities})
+            except sqlite3.Error as e:
+                print(f"Error writing to the relevance cache: {e}")
+
+        # Papers dropped by the pre-filter have no verdict
+        filtered_papers = [paper for paper, key in zip(candidates, keys) if key in verdicts and verdicts[key]["is_relevant"] == "yes"]
         return filtered_papers
 
+    async def prefilter_papers(self, papers: Dict[str, Dict], similarities: Dict[str, float], definition: str, cache) -> Dict[str, Dict]:
+        """
+        Drops the papers whose embedding similarity to the newsletter is below a floor calibrated
+        on the past LLM verdicts of the newsletter definition, before they reach the LLM filter.
+        A small random share of the papers below the floor is kept so the calibration keeps seeing them.
+        """
+        history = await asyncio.to_thread(cache.similarity_history, definition, self.embedding_model)
+        floor = calibrate_floor(history, RELEVANCE_PREFILTER_RECALL, RELEVANCE_PREFILTER_MIN_SAMPLES)
+        if floor is None:
+            relevant = sum(is_relevant for _, is_relevant in history)
+            print(f"Embedding pre-filter not calibrated yet ({relevant}/{RELEVANCE_PREFILTER_MIN_SAMPLES} relevant verdicts), every paper goes to the LLM.")
+            return papers
+
+        kept, dropped = {}, []
+        for key, paper in papers.items():
+            if similarities[key] >= floor or random.random() < RELEVANCE_PREFILTER_EXPLORE_RATE:
+                kept[key] = paper
+            else:
+                dropped.append(paper)
+        self.prefilter_stats["kept"] += len(kept)
+        self.prefilter_stats["dropped"] += len(dropped)
+        if dropped:
+            print(f"Embedding pre-filter dropped {len(dropped)} of {len(papers)} papers below the similarity floor {floor:.3f}:")
+            for paper in dropped:
+                print(f"  - {similarities[paper_key(paper)]:.3f} {paper['title']}")
+        return kept
+
     async def analyze_papers(self, topic: str, papers: List[Dict], description: str="") -> List[PaperAnalyzerOutput]:
         async def do_analysis(paper):
-            response = await asyncio.to_thread(
+            response = await self.llm_scheduler.run(
                 self.client.responses.parse,
+                priority=PRIORITY_ANALYZE,
                 model=self.model,
                 input=prompts.paper_analyzer_prompt.format(
                     topic=topic,
@@ -177,13 +455,15 @@ class NewsletterCreator:
         results = await asyncio.gather(*tasks)
         return results
 
-    def write_sota_newsletter(self, topic: str, papers: List[Dict], description: str = "") -> Dict:
+    async def write_sota_newsletter(self, topic: str, papers: List[Dict], description: str = "") -> Dict:
         papers_list = ""
         for i, p in enumerate(papers, 1):
             authors = ", ".join(a.get("name", "") for a in p.get("authors", []))
             papers_list += f'{i}. "{p["title"]}" by {authors} ({p.get("url", "")})\nAbstract: {p.get("abstract", "")}\n\n'
 
-        response = self.client.responses.parse(
+        response = await self.llm_scheduler.run(
+            self.client.responses.parse,
+            priority=PRIORITY_WRITE,
             model="gpt-5.4-mini",
             input=prompts.sota_newsletter_prompt.format(
                 topic=topic,
@@ -195,7 +475,9 @@ class NewsletterCreator:
         )
         parsed: SotANewsletterOutput = response.output_parsed
 
-        summary_response = self.client.responses.create(
+        summary_response = await self.llm_scheduler.run(
+            self.client.responses.create,
+            priority=PRIORITY_WRITE,
             model=self.model,
             input=prompts.newsletter_summary_prompt.format(
                 topic=topic,
@@ -213,12 +495,14 @@ class NewsletterCreator:
             'is_sota': True,
         }
 
-    def write_newsletter(self, topic, papers_with_analysis: List[Dict], description: str="") -> Dict:
+    async def write_newsletter(self, topic, papers_with_analysis: List[Dict], description: str="") -> Dict:
         papers_summary = ""
         for item in papers_with_analysis:
             papers_summary += f"- {item['paper']['title']}: {item['analysis']['synthesis']}\n"
 
-        response = self.client.responses.parse(
+        response = await self.llm_scheduler.run(
+            self.client.responses.parse,
+            priority=PRIORITY_WRITE,
             model=self.model,
             input=prompts.newsletter_writer_prompt.format(
                 topic=topic,
@@ -252,7 +536,9 @@ class NewsletterCreator:
         newsletter += f"## 📈 Conclusion and Trends\n\n"
         newsletter += f"{conclusion}\n"
 
-        response = self.client.responses.create(
+        response = await self.llm_scheduler.run(
+            self.client.responses.create,
+            priority=PRIORITY_WRITE,
             model=self.model,
             input=prompts.newsletter_summary_prompt.format(
                 topic=topic,
@@ -1,17 +1,42 @@
 import requests
+import httpx
+import asyncio
+import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 import os
+import re
+import json
+import time
+from circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker, is_failure_status
+import deadline
+from deadline import DeadlineExceeded
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def search_key(engine: str, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> tuple:
+    """
+    Returns a hashable key identifying a search request. The query is case and whitespace
+    normalized and empty filters are dropped, so equivalent requests share the same key.
+    """
+    query_norm = re.sub(r'\s+', ' ', query.strip().lower())
+    filters_norm = {k: v for k, v in (filters or {}).items() if v}
+    return (engine, query_norm, start_date, end_date or '', nb_papers, json.dumps(filters_norm, sort_keys=True))
+
+class SearchError(Exception):
+    """Raised by the streaming searches when a result page fails: the papers yielded before it are incomplete."""
+
+
 class PaperSearch(ABC):
     """
     Abstract base class for a paper searcher.
     """
+    name = "unknown"
+
     @abstractmethod
     def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
         """
@@ -29,38 +54,164 @@ class PaperSearch(ABC):
         """
         pass
 
-from config import FIELDS
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Async version of `search`. Engines override it with a native implementation,
+        by default the sync search runs in a thread.
+        """
+        return await asyncio.to_thread(self.search, query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Yields the papers matching the query as the result pages arrive, up to `nb_papers`.
+        Engines override it to fetch pages lazily, so consumers that stop iterating early
+        don't pay for the pages they don't need. By default, the papers of `search` are yielded.
+        Raises SearchError when a page fails, after the papers of the previous pages.
+        """
+        yield from self.search(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    async def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search`.
+        """
+        for paper in await self.asearch(query, start_date, nb_papers, end_date=end_date, filters=filters):
+            yield paper
+
+    def iter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        The papers of `iter_search` after the first `offset`, to resume a search stopped early.
+        Engines override it to start their paging there, by default the first papers are fetched again and dropped.
+        """
+        return itertools.islice(self.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size), offset, None)
+
+    async def aiter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search_from`.
+        """
+        async for paper in self.aiter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size):
+            if offset:
+                offset -= 1
+                continue
+            yield paper
+
+    def _collect(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """The papers of `iter_search`, those found before the failed page when one fails."""
+        papers = []
+        try:
+            for paper in self.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters):
+                papers.append(paper)
+        except SearchError:
+            pass
+        return papers
+
+    async def _acollect(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """Async version of `_collect`."""
+        papers = []
+        try:
+            async for paper in self.aiter_search(query, start_date, nb_papers, end_date=end_date, filters=filters):
+                papers.append(paper)
+        except SearchError:
+            pass
+        return papers
+
+    def is_cached(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> bool:
+        """
+        Returns True if the search can be answered without calling the remote API.
+        Engines never cache by themselves, caching wrappers override this.
+        """
+        return False
+
+    @property
+    def cache_namespace(self) -> str:
+        """Name under which the results are cached and coalesced, engines returning different field sets use different namespaces."""
+        return self.name
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Adds the fields left out of lean search results (authors metrics, venue, citations) to
+        the given papers, in place. Engines that always return full results have nothing to add.
+        """
+        return papers
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Async version of `enrich`.
+        """
+        return await asyncio.to_thread(self.enrich, papers)
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.name)
+
+    def _http(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request to the engine through its circuit breaker, with HTTP_TIMEOUT capped by the
+        time budget of the newsletter. Raises CircuitOpenError while the breaker is open, and
+        DeadlineExceeded once the budget is spent.
+        """
+        timeout = deadline.timeout(HTTP_TIMEOUT)
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"The circuit breaker of {self.name} is open")
+        started = time.monotonic()
+        try:
+            response = getattr(requests, method)(url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(not is_failure_status(response.status_code), time.monotonic() - started)
+        return response
+
+    async def _ahttp(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Async version of `_http`, using the pooled HTTP client."""
+        timeout = deadline.timeout(HTTP_TIMEOUT)
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"The circuit breaker of {self.name} is open")
+        started = time.monotonic()
+        try:
+            response = await getattr(get_async_http_client(), method)(url, timeout=timeout, **kwargs)
+        except httpx.HTTPError:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(not is_failure_status(response.status_code), time.monotonic() - started)
+        return response
+
+from config import FIELDS, LEAN_FIELDS, AUTHOR_CACHE_ENABLED, HTTP_TIMEOUT
+from author_cache import AuthorCache, get_author_cache
+from rate_limiter import TokenBucket, get_rate_limiter
+from http_client import get_async_http_client
 
 class SemanticSearch(PaperSearch):
     """
     A paper searcher that uses the Semantic Scholar API.
     """
-    def __init__(self, api_key: Optional[str] = None):
+    name = "semantic_scholar"
+    url = "https://api.semanticscholar.org/graph/v1/paper/search"
+    batch_url = "https://api.semanticscholar.org/graph/v1/paper/batch"
+    max_page_size = 100
+    # The relevance search only serves the first 1000 results of a query
+    max_offset = 1000
+    batch_size = 500
+
+    def __init__(self, api_key: Optional[str] = None, rate_limiter: Optional[TokenBucket] = None, lean: bool = False):
+        """
+        With `lean`, searches only request LEAN_FIELDS and `enrich` fetches the other fields
+        for the papers that are kept.
+        """
         self.api_key = api_key or os.getenv("SEMANTIC_SCHOLAR_API_KEY")
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.name)
+        self.lean = lean
         if self.api_key:
             logging.info("SemanticSearch initialized with API key.")
         else:
             logging.warning("SemanticSearch initialized without API key. Rate limits may apply.")
-    
-    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
-        """
-        Searches for papers using the Semantic Scholar API.
 
-        Args:
-            query: The search query.
-            start_date: The start date of the search range (YYYY-MM-DD).
-            nb_papers: The maximum number of papers to return.
-            end_date: The end date of the search range (YYYY-MM-DD). Optional.
-            filters: A dictionary containing search filters (venues, publicationTypes, minCitationCount, openAccessPdf).
-
-        Returns:
-            A list of dictionaries, where each dictionary represents a paper.
-        """
+    def _build_params(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, offset: int = 0) -> Dict:
         params = {
             "query": query,
             "publicationDateOrYear": f"{start_date}:{end_date or ''}",
+            "offset": offset,
             "limit": nb_papers,
-            "fields": FIELDS
+            "fields": LEAN_FIELDS if self.lean else FIELDS
         }
 
         if filters:
@@ -75,19 +226,158 @@ class SemanticSearch(PaperSearch):
             
             if filters.get("openAccessPdf"):
                 params["openAccessPdf"] = "" # Presence of key means true for this API
+        return params
 
-        headers = {"x-api-key": self.api_key}
+    def _headers(self) -> Dict:
+        return {"x-api-key": self.api_key} if self.api_key else {}
 
-        logging.info(f"Searching for papers with query: {query} and filters: {filters}")
-        response = requests.get("https://api.semanticscholar.org/graph/v1/paper/search", params=params, headers=headers)
-        
-        if response.status_code == 200:
-            data = response.json().get('data', [])
+    def _parse_page(self, status_code: int, payload) -> Tuple[List[Dict], Optional[int]]:
+        """Returns the papers of a result page and the offset of the next page (None on the last page). Raises SearchError on an error status."""
+        if status_code == 200:
+            body = payload()
+            data = body.get('data', [])
             logging.info(f"Successfully retrieved {len(data)} papers from Semantic Scholar API.")
-            return data
-            
-        logging.error(f"Failed to retrieve papers from Semantic Scholar API. Status code: {response.status_code}")
-        return []
+            if self.lean:
+                for paper in data:
+                    paper["source"] = self.name
+            return data, body.get('next')
+
+        logging.error(f"Failed to retrieve papers from Semantic Scholar API. Status code: {status_code}")
+        raise SearchError(f"Semantic Scholar API answered {status_code}")
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Searches for papers using the Semantic Scholar API, following the `next` offsets
+        of the result pages.
+
+        Args:
+            query: The search query.
+            start_date: The start date of the search range (YYYY-MM-DD).
+            nb_papers: The maximum number of papers to yield.
+            end_date: The end date of the search range (YYYY-MM-DD). Optional.
+            filters: A dictionary containing search filters (venues, publicationTypes, minCitationCount, openAccessPdf).
+            page_size: The number of papers requested per page, at most 100. Optional.
+
+        Returns:
+            An iterator of dictionaries, where each dictionary represents a paper.
+        """
+        return self.iter_search_from(query, start_date, nb_papers, 0, end_date=end_date, filters=filters, page_size=page_size)
+
+    def iter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        The papers of `iter_search` after the first `offset`: the paging starts at that offset.
+        """
+        logging.info(f"Searching for papers with query: {query} and filters: {filters}")
+        page_size = min(page_size or nb_papers, self.max_page_size)
+        while offset is not None and offset < min(nb_papers, self.max_offset):
+            limit = min(page_size, nb_papers - offset, self.max_offset - offset)
+            params = self._build_params(query, start_date, limit, end_date=end_date, filters=filters, offset=offset)
+            self.rate_limiter.acquire_sync()
+            try:
+                response = self._http('get', self.url, params=params, headers=self._headers())
+            except (requests.RequestException, CircuitOpenError, DeadlineExceeded) as e:
+                logging.error(f"Failed to query Semantic Scholar API: {e}")
+                raise SearchError(str(e)) from e
+            data, next_offset = self._parse_page(response.status_code, response.json)
+            yield from data[:limit]
+            offset = next_offset if data and next_offset and next_offset > offset else None
+
+    def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search`, using the pooled HTTP client.
+        """
+        return self.aiter_search_from(query, start_date, nb_papers, 0, end_date=end_date, filters=filters, page_size=page_size)
+
+    async def aiter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search_from`.
+        """
+        logging.info(f"Searching for papers with query: {query} and filters: {filters}")
+        page_size = min(page_size or nb_papers, self.max_page_size)
+        while offset is not None and offset < min(nb_papers, self.max_offset):
+            limit = min(page_size, nb_papers - offset, self.max_offset - offset)
+            params = self._build_params(query, start_date, limit, end_date=end_date, filters=filters, offset=offset)
+            await self.rate_limiter.acquire()
+            try:
+                response = await self._ahttp('get', self.url, params=params, headers=self._headers())
+            except (httpx.HTTPError, CircuitOpenError, DeadlineExceeded) as e:
+                logging.error(f"Failed to query Semantic Scholar API: {e}")
+                raise SearchError(str(e)) from e
+            data, next_offset = self._parse_page(response.status_code, response.json)
+            for paper in data[:limit]:
+                yield paper
+            offset = next_offset if data and next_offset and next_offset > offset else None
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Searches for papers using the Semantic Scholar API.
+
+        Args:
+            query: The search query.
+            start_date: The start date of the search range (YYYY-MM-DD).
+            nb_papers: The maximum number of papers to return.
+            end_date: The end date of the search range (YYYY-MM-DD). Optional.
+            filters: A dictionary containing search filters (venues, publicationTypes, minCitationCount, openAccessPdf).
+
+        Returns:
+            A list of dictionaries, where each dictionary represents a paper. When a page fails,
+            the papers of the previous pages.
+        """
+        return self._collect(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Async version of `search`, using the pooled HTTP client.
+        """
+        return await self._acollect(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:lean" if self.lean else self.name
+
+    def _merge_batch(self, status_code: int, payload, batch: List[Dict]):
+        if status_code != 200:
+            logging.error(f"Failed to enrich papers from Semantic Scholar API. Status code: {status_code}")
+            return
+        # The response lists the papers in the order of the requested IDs, null for unknown IDs
+        for paper, details in zip(batch, payload()):
+            if details:
+                paper.update(details)
+
+    def _enrichable(self, papers: List[Dict]) -> List[List[Dict]]:
+        papers = [p for p in papers if p.get("paperId")]
+        return [papers[i:i + self.batch_size] for i in range(0, len(papers), self.batch_size)]
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Fetches the full FIELDS of the given papers with the /paper/batch endpoint.
+        """
+        for batch in self._enrichable(papers):
+            self.rate_limiter.acquire_sync()
+            try:
+                response = self._http('post', self.batch_url, params={"fields": FIELDS}, json={"ids": [p["paperId"] for p in batch]}, headers=self._headers())
+            except (requests.RequestException, CircuitOpenError, DeadlineExceeded) as e:
+                logging.error(f"Failed to enrich papers from Semantic Scholar API: {e}")
+                continue
+            self._merge_batch(response.status_code, response.json, batch)
+        return papers
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Async version of `enrich`, using the pooled HTTP client.
+        """
+        async def enrich_batch(batch):
+            await self.rate_limiter.acquire()
+            try:
+                response = await self._ahttp('post', self.batch_url, params={"fields": FIELDS}, json={"ids": [p["paperId"] for p in batch]}, headers=self._headers())
+            except (httpx.HTTPError, CircuitOpenError, DeadlineExceeded) as e:
+                logging.error(f"Failed to enrich papers from Semantic Scholar API: {e}")
+                return
+            self._merge_batch(response.status_code, response.json, batch)
+
+        await asyncio.gather(*[enrich_batch(batch) for batch in self._enrichable(papers)])
+        return papers
+
 
 def reconstruct_abstract(inverted_index: Dict[str, List[int]]) -> str:
     """
@@ -110,55 +400,125 @@ class OpenAlexSearch(PaperSearch):
     """
     A paper searcher that uses the OpenAlex API.
     """
-    def __init__(self, email: Optional[str] = None):
+    name = "openalex"
+    works_url = "https://api.openalex.org/works"
+    authors_url = "https://api.openalex.org/authors"
+    # Largest number of IDs accepted by an OR filter of the API
+    authors_batch_size = 100
+    max_page_size = 200
+
+    # Fields of the first search phase (see SemanticSearch), authorships and citations are fetched by `enrich`
+    lean_select = "id,title,abstract_inverted_index,publication_date,publication_year,doi,ids,primary_location"
+    enrich_select = "id,authorships,cited_by_count"
+
+    def __init__(self, email: Optional[str] = None, rate_limiter: Optional[TokenBucket] = None, author_cache: Optional[AuthorCache] = None, lean: bool = False):
         # OpenAlex requests an email in the "mailto" parameter to enter their "polite pool" (faster/better limits)
         self.email = email or os.getenv("OPENALEX_EMAIL")
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.name)
+        self.lean = lean
+        self.author_cache = author_cache if author_cache is not None else (get_author_cache() if AUTHOR_CACHE_ENABLED else None)
         if self.email:
             logging.info(f"OpenAlexSearch initialized in the polite pool with email: {self.email}")
         else:
             logging.warning("OpenAlexSearch initialized without email. You are in the 'public' pool.")
 
+    def _authors_params(self, batch: List[str]) -> Dict:
+        clean_batch = [aid.split("/")[-1] for aid in batch]
+        ids_str = "|".join(clean_batch)
+
+        params = {"filter": f"openalex:{ids_str}", "per_page": len(batch)}
+        if self.email:
+            params["mailto"] = self.email
+        return params
+
+    def _parse_authors(self, status_code: int, payload, batch: List[str]) -> Optional[Dict[str, int]]:
+        """Returns the h-indexes of a batch, None if the request failed."""
+        if status_code != 200:
+            logging.error(f"Failed to fetch authors from OpenAlex: {status_code}")
+            return None
+
+        # Authors unknown to OpenAlex are cached with an h-index of 0, so they aren't looked up again
+        h_indexes = {author_id: 0 for author_id in batch}
+        for author in payload().get("results", []):
+            if not author: continue
+            h_indexes[author.get("id")] = author.get("summary_stats", {}).get("h_index", 0)
+        return h_indexes
+
+    def _fetch_authors_batch(self, batch: List[str]) -> Optional[Dict[str, int]]:
+        try:
+            self.rate_limiter.acquire_sync()
+            response = self._http('get', self.authors_url, params=self._authors_params(batch))
+            return self._parse_authors(response.status_code, response.json, batch)
+        except Exception as e:
+            logging.error(f"Error fetching author h-indexes: {e}")
+            return None
+
+    async def _afetch_authors_batch(self, batch: List[str]) -> Optional[Dict[str, int]]:
+        try:
+            await self.rate_limiter.acquire()
+            response = await self._ahttp('get', self.authors_url, params=self._authors_params(batch))
+            return self._parse_authors(response.status_code, response.json, batch)
+        except Exception as e:
+            logging.error(f"Error fetching author h-indexes: {e}")
+            return None
+
+    def _batches(self, author_ids: List[str]) -> List[List[str]]:
+        return [author_ids[i:i + self.authors_batch_size] for i in range(0, len(author_ids), self.authors_batch_size)]
+
+    def _store_fetched(self, h_indexes: Dict[str, int], fetched: List[Optional[Dict[str, int]]]):
+        for batch_h_indexes in fetched:
+            if batch_h_indexes is None:
+                continue
+            h_indexes.update(batch_h_indexes)
+            if self.author_cache is not None:
+                self.author_cache.set_many(batch_h_indexes)
+
+    def _cached_h_indexes(self, author_ids: List[str]) -> Tuple[Dict[str, int], List[str]]:
+        if self.author_cache is None:
+            return {}, list(dict.fromkeys(author_ids))
+        return self.author_cache.get_many(author_ids)
+
     def fetch_author_h_indexes(self, author_ids: List[str]) -> Dict[str, int]:
         """
-        Fetches h-index for a list of OpenAlex author IDs in batches.
+        Fetches h-index for a list of OpenAlex author IDs. Only the authors missing from the
+        author cache are requested, in concurrent batches of `authors_batch_size` IDs.
         """
         if not author_ids:
             return {}
-        
-        h_indexes = {}
-        batch_size = 50
-        for i in range(0, len(author_ids), batch_size):
-            batch = author_ids[i:i + batch_size]
-            clean_batch = [aid.split("/")[-1] for aid in batch]
-            ids_str = "|".join(clean_batch)
-            
-            params = {"filter": f"openalex:{ids_str}"}
-            if self.email:
-                params["mailto"] = self.email
-            
-            try:
-                response = requests.get("https://api.openalex.org/authors", params=params)
-                if response.status_code == 200:
-                    results = response.json().get("results", [])
-                    for author in results:
-                        if not author: continue
-                        h_index = author.get("summary_stats", {}).get("h_index", 0)
-                        h_indexes[author.get("id")] = h_index
-                else:
-                    logging.error(f"Failed to fetch authors from OpenAlex: {response.status_code}")
-            except Exception as e:
-                logging.error(f"Error fetching author h-indexes: {e}")
-        
+
+        h_indexes, misses = self._cached_h_indexes(author_ids)
+        batches = self._batches(misses)
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(len(batches), 4)) as executor:
+                self._store_fetched(h_indexes, list(executor.map(self._fetch_authors_batch, batches)))
         return h_indexes
 
-    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+    async def afetch_author_h_indexes(self, author_ids: List[str]) -> Dict[str, int]:
         """
-        Searches for papers using the OpenAlex API.
+        Async version of `fetch_author_h_indexes`.
         """
+        if not author_ids:
+            return {}
+
+        # The cache may read its SQLite file, so it is not queried on the event loop
+        h_indexes, misses = await asyncio.to_thread(self._cached_h_indexes, author_ids)
+        batches = self._batches(misses)
+        if batches:
+            fetched = await asyncio.gather(*[self._afetch_authors_batch(batch) for batch in batches])
+            await asyncio.to_thread(self._store_fetched, h_indexes, fetched)
+        return h_indexes
+
+    def _build_params(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, cursor: str = "*", page: Optional[int] = None) -> Dict:
         params = {
             "search": query,
             "per_page": nb_papers,
         }
+        if page:
+            params["page"] = page
+        else:
+            params["cursor"] = cursor
+        if self.lean:
+            params["select"] = self.lean_select
 
         filter_parts = [f"from_publication_date:{start_date}"]
         if end_date:
@@ -172,64 +532,244 @@ class OpenAlexSearch(PaperSearch):
         
         if self.email:
             params["mailto"] = self.email
+        return params
 
-        logging.info(f"Searching OpenAlex with query: {query} and filters: {params['filter']}")
-        
-        try:
-            response = requests.get("https://api.openalex.org/works", params=params)
-            if response.status_code == 200:
-                data = response.json().get('results', [])
-                logging.info(f"Successfully retrieved {len(data)} papers from OpenAlex.")
-                
-                # First pass: collect all unique author IDs to fetch h-indexes in one go
-                all_author_ids = set()
-                for work in data:
-                    if not work: continue
-                    for au in work.get("authorships", []):
-                        if not au: continue
-                        author_id = au.get("author", {}).get("id")
-                        if author_id:
-                            all_author_ids.add(author_id)
-                
-                # Fetch h-indexes
-                h_indexes = self.fetch_author_h_indexes(list(all_author_ids))
-                
-                # Transform OpenAlex format to match our internal 'FIELDS' (similar to Semantic Scholar)
-                transformed_results = []
-                for work in data:
-                    if not work: continue
-                    inverted_index = work.get("abstract_inverted_index")
-                    abstract = reconstruct_abstract(inverted_index) if inverted_index else ""
-                    
-                    authors = []
-                    for au in work.get("authorships", []):
-                        if not au: continue
-                        author_info = au.get("author", {})
-                        author_id = author_info.get("id")
-                        authors.append({
-                            "name": author_info.get("display_name"),
-                            "authorId": author_id,
-                            "hIndex": h_indexes.get(author_id, 0)
-                        })
-                    
-                    transformed_results.append({
-                        "paperId": work.get("id"),
-                        "title": work.get("title"),
-                        "abstract": abstract,
-                        "year": work.get("publication_year"),
-                        "url": work.get("doi") or work.get("primary_location", {}).get("landing_page_url"),
-                        "publicationDate": work.get("publication_date"),
-                        "authors": authors,
-                        "citationCount": work.get("cited_by_count", 0),
-                        "venue": work.get("primary_location", {}).get("source", {}).get("display_name")
-                    })
-                return transformed_results
-            else:
-                logging.error(f"OpenAlex API error: {response.status_code} - {response.text}")
-        except Exception as e:
-            logging.error(f"Failed to query OpenAlex: {e}")
+    @staticmethod
+    def _collect_author_ids(data: List[Dict]) -> List[str]:
+        all_author_ids = set()
+        for work in data:
+            if not work: continue
+            for au in work.get("authorships", []):
+                if not au: continue
+                author_id = au.get("author", {}).get("id")
+                if author_id:
+                    all_author_ids.add(author_id)
+        return list(all_author_ids)
+
+    @staticmethod
+    def _transform(data: List[Dict], h_indexes: Dict[str, int]) -> List[Dict]:
+        """Transforms OpenAlex works to match our internal 'FIELDS' (similar to Semantic Scholar)."""
+        transformed_results = []
+        for work in data:
+            if not work: continue
+            inverted_index = work.get("abstract_inverted_index")
+            abstract = reconstruct_abstract(inverted_index) if inverted_index else ""
             
-        return []
+            authors = []
+            for au in work.get("authorships", []):
+                if not au: continue
+                author_info = au.get("author", {})
+                author_id = author_info.get("id")
+                authors.append({
+                    "name": author_info.get("display_name"),
+                    "authorId": author_id,
+                    "hIndex": h_indexes.get(author_id, 0)
+                })
+            
+            transformed_results.append({
+                "paperId": work.get("id"),
+                "title": work.get("title"),
+                "abstract": abstract,
+                "year": work.get("publication_year"),
+                "url": work.get("doi") or work.get("primary_location", {}).get("landing_page_url"),
+                "publicationDate": work.get("publication_date"),
+                "authors": authors,
+                "citationCount": work.get("cited_by_count", 0),
+                "venue": work.get("primary_location", {}).get("source", {}).get("display_name"),
+                "externalIds": OpenAlexSearch._external_ids(work),
+            })
+        return transformed_results
+
+    @staticmethod
+    def _external_ids(work: Dict) -> Dict:
+        """Maps the IDs of a work to the Semantic Scholar `externalIds` names, so papers of both engines can be matched."""
+        ids = work.get("ids") or {}
+        external_ids = {}
+        doi = work.get("doi") or ids.get("doi")
+        if doi:
+            external_ids["DOI"] = doi.replace("https://doi.org/", "")
+        if ids.get("mag"):
+            external_ids["MAG"] = str(ids["mag"])
+        if ids.get("pmid"):
+            external_ids["PubMed"] = ids["pmid"].rstrip("/").split("/")[-1]
+        if ids.get("pmcid"):
+            external_ids["PubMedCentral"] = ids["pmcid"].rstrip("/").split("/")[-1].replace("PMC", "")
+        return external_ids
+
+    def _parse_page(self, response) -> Tuple[List[Dict], Optional[str]]:
+        """Returns the works of a result page and the cursor of the next page (None on the last page). Raises SearchError on an error status."""
+        if response.status_code == 200:
+            body = response.json()
+            data = body.get('results', [])
+            logging.info(f"Successfully retrieved {len(data)} papers from OpenAlex.")
+            return data, (body.get('meta') or {}).get('next_cursor')
+
+        logging.error(f"OpenAlex API error: {response.status_code} - {response.text}")
+        raise SearchError(f"OpenAlex API answered {response.status_code}")
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Searches for papers using the OpenAlex API with cursor paging. The h-indexes of the
+        authors are fetched for each page before its papers are yielded.
+        """
+        return self.iter_search_from(query, start_date, nb_papers, 0, end_date=end_date, filters=filters, page_size=page_size)
+
+    def _paging(self, nb_papers: int, offset: int, page_size: Optional[int]) -> Tuple[int, Optional[int], int]:
+        """
+        (page size, first page number, papers to drop from it) of a search starting at `offset`.
+        Cursors can't start at an offset, so a resumed search numbers its pages instead (None for
+        cursor paging) and only fetches the page holding the offset again.
+        """
+        page_size = min(page_size or nb_papers, self.max_page_size)
+        if not offset:
+            return page_size, None, 0
+        return page_size, offset // page_size + 1, offset % page_size
+
+    def iter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        The papers of `iter_search` after the first `offset`, see `_paging`.
+        """
+        page_size, page, skip = self._paging(nb_papers, offset, page_size)
+        cursor = None if page else "*"
+        remaining = nb_papers - offset
+        while (cursor or page) and remaining > 0:
+            # Numbered pages keep the same size, so their numbers match the offsets
+            params = self._build_params(query, start_date, page_size if page else min(page_size, remaining), end_date=end_date,
+                                        filters=filters, cursor=cursor, page=page)
+            logging.info(f"Searching OpenAlex with query: {query} and filters: {params['filter']}")
+            try:
+                self.rate_limiter.acquire_sync()
+                data, cursor = self._parse_page(self._http('get', self.works_url, params=params))
+            except SearchError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to query OpenAlex: {e}")
+                raise SearchError(str(e)) from e
+            if page:
+                page, cursor = (page + 1 if len(data) == page_size else None), None
+            data, skip = data[skip:][:remaining], 0
+            if not data:
+                return
+            # Collect all unique author IDs of the page to fetch h-indexes in one go
+            h_indexes = self.fetch_author_h_indexes(self._collect_author_ids(data))
+            papers = self._tag(self._transform(data, h_indexes))
+            remaining -= len(data)
+            yield from papers
+
+    def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search`, using the pooled HTTP client.
+        """
+        return self.aiter_search_from(query, start_date, nb_papers, 0, end_date=end_date, filters=filters, page_size=page_size)
+
+    async def aiter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search_from`.
+        """
+        page_size, page, skip = self._paging(nb_papers, offset, page_size)
+        cursor = None if page else "*"
+        remaining = nb_papers - offset
+        while (cursor or page) and remaining > 0:
+            params = self._build_params(query, start_date, page_size if page else min(page_size, remaining), end_date=end_date,
+                                        filters=filters, cursor=cursor, page=page)
+            logging.info(f"Searching OpenAlex with query: {query} and filters: {params['filter']}")
+            try:
+                await self.rate_limiter.acquire()
+                data, cursor = self._parse_page(await self._ahttp('get', self.works_url, params=params))
+            except SearchError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to query OpenAlex: {e}")
+                raise SearchError(str(e)) from e
+            if page:
+                page, cursor = (page + 1 if len(data) == page_size else None), None
+            data, skip = data[skip:][:remaining], 0
+            if not data:
+                return
+            h_indexes = await self.afetch_author_h_indexes(self._collect_author_ids(data))
+            papers = self._tag(self._transform(data, h_indexes))
+            remaining -= len(data)
+            for paper in papers:
+                yield paper
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Searches for papers using the OpenAlex API.
+        """
+        return self._collect(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Async version of `search`, using the pooled HTTP client.
+        """
+        return await self._acollect(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    def _tag(self, papers: List[Dict]) -> List[Dict]:
+        if self.lean:
+            for paper in papers:
+                paper["source"] = self.name
+        return papers
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:lean" if self.lean else self.name
+
+    def _works_params(self, batch: List[Dict]) -> Dict:
+        ids_str = "|".join(p["paperId"].split("/")[-1] for p in batch)
+        params = {"filter": f"openalex:{ids_str}", "select": self.enrich_select, "per_page": len(batch)}
+        if self.email:
+            params["mailto"] = self.email
+        return params
+
+    def _parse_works(self, response) -> List[Dict]:
+        if response.status_code != 200:
+            logging.error(f"Failed to enrich papers from OpenAlex: {response.status_code}")
+            return []
+        return response.json().get("results", [])
+
+    def _merge_works(self, papers: List[Dict], works: List[Dict], h_indexes: Dict[str, int]):
+        details = {paper["paperId"]: paper for paper in self._transform(works, h_indexes)}
+        for paper in papers:
+            enriched = details.get(paper["paperId"])
+            if enriched:
+                paper["authors"] = enriched["authors"]
+                paper["citationCount"] = enriched["citationCount"]
+
+    def _enrichable(self, papers: List[Dict]) -> List[List[Dict]]:
+        papers = [p for p in papers if p.get("paperId")]
+        return [papers[i:i + self.authors_batch_size] for i in range(0, len(papers), self.authors_batch_size)]
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Fetches the authorships and citations of the given works, then the h-indexes of their authors.
+        """
+        works = []
+        for batch in self._enrichable(papers):
+            try:
+                self.rate_limiter.acquire_sync()
+                works.extend(self._parse_works(self._http('get', self.works_url, params=self._works_params(batch))))
+            except Exception as e:
+                logging.error(f"Failed to enrich papers from OpenAlex: {e}")
+        h_indexes = self.fetch_author_h_indexes(self._collect_author_ids(works))
+        self._merge_works(papers, works, h_indexes)
+        return papers
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        """
+        Async version of `enrich`, using the pooled HTTP client.
+        """
+        async def fetch_batch(batch):
+            try:
+                await self.rate_limiter.acquire()
+                return self._parse_works(await self._ahttp('get', self.works_url, params=self._works_params(batch)))
+            except Exception as e:
+                logging.error(f"Failed to enrich papers from OpenAlex: {e}")
+                return []
+
+        works = [work for batch_works in await asyncio.gather(*[fetch_batch(batch) for batch in self._enrichable(papers)]) for work in batch_works]
+        h_indexes = await self.afetch_author_h_indexes(self._collect_author_ids(works))
+        self._merge_works(papers, works, h_indexes)
+        return papers
 
 if __name__ == "__main__":
     searcher = SemanticSearch()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+
+@dataclass
+class PipelineJob:
+    """
+    State carried by one item (a newsletter) through the stages of a pipeline.
+    Stages store their output in `data` and set `outcome` when the job is finished.
+    """
+    item: Any
+    data: Dict[str, Any] = field(default_factory=dict)
+    outcome: Optional[Dict] = None
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage backed by its own pool of `concurrency` workers.
+
+    `handler` receives a job and returns True to forward it to the next stage,
+    or False when the job is finished (its `outcome` must then be set).
+    Jobs waiting in front of a `cancellable` stage are dropped when a stop is requested.
+    """
+    name: str
+    handler: Callable[[PipelineJob], Awaitable[bool]]
+    concurrency: int = 1
+    cancellable: bool = False
+
+
+class StagedPipeline:
+    """
+    Runs items through a sequence of stages. Stages are connected by bounded queues so
+    that a slow stage applies backpressure to the ones before it, while the stages
+    themselves work on different items concurrently.
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = 8,
+                 on_stage_start: Optional[Callable[[PipelineJob, str], None]] = None,
+                 on_done: Optional[Callable[[PipelineJob], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_stage_start = on_stage_start
+        self.on_done = on_done
+        self.should_stop = should_stop or (lambda: False)
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]]) -> List[PipelineJob]:
+        """
+        Feeds the items into the pipeline and returns the finished jobs. With an async iterable,
+        the next item is only requested once the first stage has room for it.
+        """
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        finished: List[PipelineJob] = []
+        workers = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            for _ in range(max(1, stage.concurrency)):
+                workers.append(asyncio.create_task(self._work(stage, queues[i], outbox, finished)))
+
+        try:
+            await self._feed(items, queues[0])
+            # A job is handed over to the next queue before being marked done in the
+            # current one, so joining the queues in order drains the whole pipeline.
+            for queue in queues:
+                await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return finished
+
+    async def _feed(self, items: Union[Iterable[Any], AsyncIterable[Any]], queue: asyncio.Queue):
+        if not hasattr(items, "__aiter__"):
+            for item in items:
+                if self.should_stop():
+                    logging.info("Stop requested. No more items are fed to the pipeline.")
+                    return
+                await queue.put(PipelineJob(item=item))
+            return
+
+        iterator = items.__aiter__()
+        try:
+            while True:
+                # Wait for room first, so a lazy source doesn't hand out an item before it can be taken
+                await queue.put(None)
+                queue.get_nowait()
+                queue.task_done()
+                if self.should_stop():
+                    logging.info("Stop requested. No more items are fed to the pipeline.")
+                    return
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                await queue.put(PipelineJob(item=item))
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    async def _work(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], finished: List[PipelineJob]):
+        while True:
+            job = await inbox.get()
+            try:
+                if stage.cancellable and self.should_stop():
+                    job.outcome = {"outcome": "stopped", "papers_found": 0, "issue_id": None}
+                    forward = False
+                else:
+                    if self.on_stage_start:
+                        self.on_stage_start(job, stage.name)
+                    try:
+                        forward = await stage.handler(job)
+                    except Exception as e:
+                        logging.error(f"Unhandled error in stage '{stage.name}': {e}")
+                        job.outcome = {"outcome": "error", "papers_found": 0, "issue_id": None}
+                        forward = False
+
+                if forward and outbox is not None:
+                    await outbox.put(job)
+                else:
+                    if job.outcome is None:
+                        job.outcome = {"outcome": "error", "papers_found": 0, "issue_id": None}
+                    finished.append(job)
+                    if self.on_done:
+                        self.on_done(job)
+            finally:
+                inbox.task_done()
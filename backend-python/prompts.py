@@ -99,6 +99,40 @@ reasonning: [1-2 sentences analyzing the alignment between the paper's core focu
 is_relevant: [yes/no]
 """
 
+paper_batch_filterer_prompt = """### Role
+You are an expert Research Screener specializing in academic literature classification. Your task is to determine, for each paper of a list, if it is a "Must-Read" for a targeted newsletter.
+
+### Context
+Newsletter Topic: "{topic}"
+Newsletter Description: "{description}"
+
+### Papers
+{papers}
+
+### Strict Relevance Definitions
+* **HIGH (YES):** The paper’s *primary* contribution or core methodology directly advances the newsletter topic. It is a "perfect fit."
+* **MEDIUM (NO):** The paper mentions the topic or uses it as a secondary tool/application, but the main research focus lies elsewhere.
+* **LOW (NO):** The paper is unrelated or only shares broad, high-level keywords (e.g., both are "Machine Learning").
+
+### Filtering Logic
+Judge each paper independently of the others:
+1. **Analyze Focus:** What is the "Main Character" of the paper? (The core problem it solves).
+2. **Analyze Alignment:** Does the paper's "Main Character" match the Newsletter Topic?
+3. **Threshold Check:** If you have to "stretch" the connection to make it fit, classify it as MEDIUM.
+
+### Response Format
+Return exactly one verdict per paper, in the following format:
+
+index: [the number of the paper in the list above]
+reasonning: [1-2 sentences analyzing the alignment between the paper's core focus and the newsletter's scope.]
+is_relevant: [yes/no]
+"""
+
+paper_batch_item = """[{index}]
+Paper Title: "{title}"
+Paper Abstract: "{abstract}"
+"""
+
 query_generator_prompt = """<role>
 You are an expert at generating search queries for Semantic Scholar, a semantic search engine for academic papers.
 </role>
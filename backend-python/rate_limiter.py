@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import RATE_LIMITS, RATE_LIMIT_DB
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `burst` requests.
+
+    Callers reserve a token and then wait until it is available, so concurrent callers are
+    spaced exactly at the configured rate. `acquire` waits without blocking the event loop,
+    `acquire_sync` is meant for code running in worker threads.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(float(self.burst), tokens + (now - updated_at) * self.rate)
+
+    def reserve(self) -> float:
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, self._updated_at, now) - 1
+            self._updated_at = now
+            return max(0.0, -self._tokens / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Takes a token only if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._refill(self._tokens, self._updated_at, now)
+            if tokens < 1:
+                return False
+            self._tokens = tokens - 1
+            self._updated_at = now
+            return True
+
+    def available(self) -> float:
+        """Tokens available right now, without taking any."""
+        with self._lock:
+            return self._refill(self._tokens, self._updated_at, time.monotonic())
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a SQLite database, so that all the processes of a host
+    sharing the database file also share the rate limit.
+    """
+    def __init__(self, name: str, rate: float, burst: int = 1, path: str = RATE_LIMIT_DB):
+        super().__init__(rate, burst)
+        self.name = name
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _update(self, take_if_available: bool) -> Optional[float]:
+        # Wall-clock time since the monotonic clock is not shared between processes
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self._refill(row[0], row[1], now) if row else float(self.burst)
+            if take_if_available and tokens < 1:
+                conn.execute("ROLLBACK")
+                return None
+            tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)", (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return max(0.0, -tokens / self.rate)
+        finally:
+            conn.close()
+
+    def reserve(self) -> float:
+        with self._lock:
+            return self._update(take_if_available=False)
+
+    async def acquire(self):
+        # The database may be locked by another process, so it is not queried on the event loop
+        delay = await asyncio.to_thread(self.reserve)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            return self._update(take_if_available=True) is not None
+
+    def available(self) -> float:
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            finally:
+                conn.close()
+        return self._refill(row[0], row[1], time.time()) if row else float(self.burst)
+
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(engine: str) -> TokenBucket:
+    """
+    Returns the rate limiter of a search engine, shared by the worker and the API endpoints.
+    The limiter is backed by RATE_LIMIT_DB when it is set, to coordinate several processes.
+    """
+    with _rate_limiters_lock:
+        if engine not in _rate_limiters:
+            rate, burst = RATE_LIMITS.get(engine, (1.0, 1))
+            if RATE_LIMIT_DB:
+                _rate_limiters[engine] = SQLiteTokenBucket(engine, rate, burst, path=RATE_LIMIT_DB)
+            else:
+                _rate_limiters[engine] = TokenBucket(rate, burst)
+        return _rate_limiters[engine]
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config import CACHE_DIR, RELEVANCE_CACHE_TTL
+
+
+def definition_key(topic: str, description: str, prompt: str, model: str) -> str:
+    """
+    Hashes everything a relevance verdict depends on besides the paper, so that editing the
+    topic, the description or the filter prompt, or changing the model, invalidates the verdicts.
+    """
+    payload = json.dumps([topic.strip(), (description or "").strip(), prompt, model])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def paper_key(paper: Dict) -> Optional[str]:
+    """Returns the paper ID, or its normalized title for papers without ID."""
+    if paper.get("paperId"):
+        return f"id:{paper['paperId']}"
+    title = re.sub(r'\W+', '', (paper.get("title") or "").lower())
+    return f"title:{title}" if title else None
+
+
+class RelevanceCache:
+    """
+    Persistent cache of the relevance verdicts of the LLM filter, stored in SQLite.
+
+    Verdicts are keyed on the newsletter definition (see `definition_key`) and the paper,
+    and expire after `ttl` seconds.
+    """
+    def __init__(self, path: Optional[str] = None, ttl: int = RELEVANCE_CACHE_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "relevance_cache.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS relevance_verdicts (
+                    definition_key TEXT NOT NULL,
+                    paper_key TEXT NOT NULL,
+                    verdict TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (definition_key, paper_key)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS relevance_similarities (
+                    definition_key TEXT NOT NULL,
+                    embedding_model TEXT NOT NULL,
+                    paper_key TEXT NOT NULL,
+                    similarity REAL NOT NULL,
+                    is_relevant INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (definition_key, embedding_model, paper_key)
+                )
+            """)
+
+    def get_many(self, definition: str, paper_keys: Iterable[str]) -> Dict[str, Dict]:
+        """Returns the cached verdicts of the given papers, as RelevanceOutput dicts keyed by paper key."""
+        paper_keys = list(dict.fromkeys(paper_keys))
+        verdicts = {}
+        with self._lock:
+            # SQLite limits the number of query parameters, so the keys are looked up in chunks
+            for i in range(0, len(paper_keys), 500):
+                chunk = paper_keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, verdict in self._conn.execute(
+                        f"SELECT paper_key, verdict FROM relevance_verdicts WHERE definition_key = ? AND created_at >= ? AND paper_key IN ({placeholders})",
+                        [definition, time.time() - self.ttl, *chunk]):
+                    verdicts[key] = json.loads(verdict)
+            self.stats["hits"] += len(verdicts)
+            self.stats["misses"] += len(paper_keys) - len(verdicts)
+        return verdicts
+
+    def set_many(self, definition: str, verdicts: Dict[str, Dict]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO relevance_verdicts (definition_key, paper_key, verdict, created_at) VALUES (?, ?, ?, ?)",
+                [(definition, key, json.dumps(verdict), now) for key, verdict in verdicts.items()])
+            self._conn.execute("DELETE FROM relevance_verdicts WHERE created_at < ?", (now - self.ttl,))
+
+    def record_similarities(self, definition: str, embedding_model: str, similarities: Dict[str, Tuple[float, bool]]):
+        """Records the embedding similarity of judged papers with their verdict, to calibrate the pre-filter."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO relevance_similarities (definition_key, embedding_model, paper_key, similarity, is_relevant, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(definition, embedding_model, key, similarity, int(is_relevant), now) for key, (similarity, is_relevant) in similarities.items()])
+            self._conn.execute("DELETE FROM relevance_similarities WHERE created_at < ?", (now - self.ttl,))
+
+    def similarity_history(self, definition: str, embedding_model: str) -> List[Tuple[float, bool]]:
+        """Returns the (similarity, is_relevant) pairs recorded for a newsletter definition."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT similarity, is_relevant FROM relevance_similarities WHERE definition_key = ? AND embedding_model = ? AND created_at >= ?",
+                (definition, embedding_model, time.time() - self.ttl)).fetchall()
+        return [(similarity, bool(is_relevant)) for similarity, is_relevant in rows]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM relevance_verdicts")
+            self._conn.execute("DELETE FROM relevance_similarities")
+
+
+def calibrate_floor(history: List[Tuple[float, bool]], recall: float, min_samples: int) -> Optional[float]:
+    """
+    Returns the similarity floor that keeps a `recall` share of the papers the LLM judged
+    relevant, or None while fewer than `min_samples` relevant papers were recorded.
+    """
+    relevant = [similarity for similarity, is_relevant in history if is_relevant]
+    if len(relevant) < max(min_samples, 1):
+        return None
+    return float(np.quantile(relevant, 1 - recall, method="lower"))
+
+
+_relevance_cache: Optional[RelevanceCache] = None
+_relevance_cache_lock = threading.Lock()
+
+
+def get_relevance_cache() -> RelevanceCache:
+    """Returns the relevance cache shared by the worker and the API endpoints."""
+    global _relevance_cache
+    with _relevance_cache_lock:
+        if _relevance_cache is None:
+            _relevance_cache = RelevanceCache()
+        return _relevance_cache
@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+FREQUENCY_DAYS = {'weekly': 7, 'biweekly': 14, 'monthly': 30}
+
+
+def get_frequency_days(newsletter):
+    return FREQUENCY_DAYS.get(newsletter.get('frequency', 'weekly'), 7)
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """Returns the POSIX timestamp of an ISO date (naive dates are local times), or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (ValueError, TypeError) as e:
+        logging.error(f"Error parsing date '{value}': {e}")
+        return None
+
+
+def next_due_at(newsletter: Dict, latest_issue_date: Optional[str] = None) -> float:
+    """
+    Timestamp at which a newsletter is due: its last search (or latest issue, as in
+    `lastIssueDate` of /newsletters/all) plus its frequency. 0 when it never ran.
+    """
+    last_run = parse_timestamp(newsletter.get('lastSearch') or latest_issue_date or newsletter.get('lastIssueDate'))
+    if last_run is None:
+        return 0.0
+    return last_run + get_frequency_days(newsletter) * 24 * 60 * 60
+
+
+class DueScheduler:
+    """
+    Min-heap of the active newsletters keyed by the time they are next due, so the worker sleeps
+    until the earliest one is due and only processes the due ones, earliest deadline first.
+
+    Only the ID and due time of each newsletter are kept, so memory stays small as newsletters
+    grow; their documents are fetched when they are due. Newsletters are updated one at a time as
+    they change (`update`, `defer`, `remove`), entries made stale by an update are skipped when
+    they reach the top of the heap.
+    """
+    def __init__(self):
+        self.due_times: Dict[str, float] = {}
+        self.synced_at: Optional[float] = None
+        self.full_synced_at: Optional[float] = None
+        self._heap: List = []
+        self._entries: Dict[str, int] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.due_times)
+
+    def __contains__(self, newsletter_id: str) -> bool:
+        return newsletter_id in self.due_times
+
+    def _push(self, newsletter_id: str, due_at: float):
+        seq = next(self._counter)
+        self.due_times[newsletter_id] = due_at
+        self._entries[newsletter_id] = seq
+        heapq.heappush(self._heap, (due_at, seq, newsletter_id))
+
+    def update(self, newsletter: Dict):
+        """Adds or updates a newsletter, scheduled from its lastSearch and frequency. Inactive newsletters are removed."""
+        newsletter_id = str(newsletter['_id'])
+        if newsletter.get('status') != 'active':
+            self.remove(newsletter_id)
+            return
+        self._push(newsletter_id, next_due_at(newsletter))
+
+    def replace_all(self, newsletters: Iterable[Dict]):
+        """
+        Schedules the given newsletters in place of the current ones. The current schedule is
+        kept when iterating the newsletters fails midway.
+        """
+        replacement = DueScheduler()
+        for newsletter in newsletters:
+            replacement.update(newsletter)
+        self.due_times, self._heap, self._entries, self._counter = (
+            replacement.due_times, replacement._heap, replacement._entries, replacement._counter)
+
+    def defer(self, newsletter_id: str, due_at: float):
+        """Schedules a known newsletter at `due_at`, whatever its lastSearch says."""
+        if newsletter_id in self.due_times:
+            self._push(newsletter_id, due_at)
+
+    def remove(self, newsletter_id: str):
+        self.due_times.pop(newsletter_id, None)
+        self._entries.pop(newsletter_id, None)
+
+    def _drop_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest scheduled newsletter, or None when none is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[str]:
+        """
+        Unschedules and returns the IDs of the newsletters due at `now`, earliest first. They stay
+        known, and are scheduled again with `update` or `defer` once processed.
+        """
+        due = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, _, newsletter_id = heapq.heappop(self._heap)
+            del self._entries[newsletter_id]
+            due.append(newsletter_id)
+        return due
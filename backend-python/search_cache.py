@@ -0,0 +1,259 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from paper_search import PaperSearch, SearchError, search_key
+from config import CACHE_DIR, SEARCH_CACHE_TTLS, SEARCH_CACHE_MAX_BYTES
+
+
+class SearchCache:
+    """
+    Persistent cache of paper search responses, stored in SQLite.
+
+    Entries are keyed on the normalized request parameters, expire after a per-engine TTL,
+    and are stored as zlib-compressed JSON. When the total payload size exceeds `max_bytes`,
+    the least recently used entries are evicted.
+    """
+    def __init__(self, path: Optional[str] = None, ttls: Optional[Dict[str, int]] = None, max_bytes: int = SEARCH_CACHE_MAX_BYTES, default_ttl: int = 6 * 60 * 60):
+        self.path = path or os.path.join(CACHE_DIR, "search_cache.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ttls = ttls if ttls is not None else SEARCH_CACHE_TTLS
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    engine TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at)")
+
+    @staticmethod
+    def make_key(engine: str, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> str:
+        key = search_key(engine, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+    def _ttl(self, engine: str) -> int:
+        return self.ttls.get(engine, self.default_ttl)
+
+    def get(self, engine: str, key: str) -> Optional[List[Dict]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self._ttl(engine):
+                self.stats["misses"] += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def contains(self, engine: str, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self._ttl(engine)
+
+    def set(self, engine: str, key: str, results: List[Dict]):
+        payload = zlib.compress(json.dumps(results).encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, engine, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, engine, payload, len(payload), now, now))
+            self._evict()
+
+    def _evict(self):
+        """Drops expired entries, then least recently used ones until the cache fits in max_bytes."""
+        for engine, ttl in self.ttls.items():
+            self._conn.execute("DELETE FROM search_cache WHERE engine = ? AND created_at < ?", (engine, time.time() - ttl))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM search_cache ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+            self.stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM search_cache")
+
+
+class CachedSearch(PaperSearch):
+    """
+    A PaperSearch wrapper storing the responses of another engine in a SearchCache.
+    """
+    def __init__(self, searcher: PaperSearch, cache: SearchCache):
+        self.searcher = searcher
+        self.cache = cache
+        self.name = searcher.name
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = self.cache.get(self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            logging.info(f"Using cached {self.name} results for query: {query}")
+            return cached
+
+        # Results are collected from the stream, so those cut short by a failed page are not cached
+        results = []
+        try:
+            for paper in self.searcher.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters):
+                results.append(paper)
+        except SearchError:
+            return results
+        if results:
+            try:
+                self.cache.set(self.name, key, results)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing to the search cache: {e}")
+        return results
+
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = await asyncio.to_thread(self.cache.get, self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            logging.info(f"Using cached {self.name} results for query: {query}")
+            return cached
+
+        results = []
+        try:
+            async for paper in self.searcher.aiter_search(query, start_date, nb_papers, end_date=end_date, filters=filters):
+                results.append(paper)
+        except SearchError:
+            return results
+        if results:
+            try:
+                await asyncio.to_thread(self.cache.set, self.name, key, results)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing to the search cache: {e}")
+        return results
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = self.cache.get(self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            logging.info(f"Using cached {self.name} results for query: {query}")
+            yield from cached
+            return
+
+        # Only complete result lists are cached, nothing is stored when the consumer stops early
+        # or when a page fails (the SearchError goes through to the consumer)
+        results = []
+        for paper in self.searcher.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size):
+            # Copied since the consumer may annotate the papers before the stream ends
+            results.append(copy.deepcopy(paper))
+            yield paper
+        if results:
+            try:
+                self.cache.set(self.name, key, results)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing to the search cache: {e}")
+
+    async def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = await asyncio.to_thread(self.cache.get, self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            logging.info(f"Using cached {self.name} results for query: {query}")
+            for paper in cached:
+                yield paper
+            return
+
+        results = []
+        async for paper in self.searcher.aiter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size):
+            results.append(copy.deepcopy(paper))
+            yield paper
+        if results:
+            try:
+                await asyncio.to_thread(self.cache.set, self.name, key, results)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing to the search cache: {e}")
+
+    def iter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = self.cache.get(self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            yield from cached[offset:]
+            return
+        # The papers before the offset are missing, so the results are not cached
+        yield from self.searcher.iter_search_from(query, start_date, nb_papers, offset, end_date=end_date, filters=filters, page_size=page_size)
+
+    async def aiter_search_from(self, query: str, start_date: str, nb_papers: int, offset: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        try:
+            cached = await asyncio.to_thread(self.cache.get, self.name, key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading the search cache: {e}")
+            cached = None
+        if cached is not None:
+            for paper in cached[offset:]:
+                yield paper
+            return
+        async for paper in self.searcher.aiter_search_from(query, start_date, nb_papers, offset, end_date=end_date, filters=filters, page_size=page_size):
+            yield paper
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.searcher.cache_namespace
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        return self.searcher.enrich(papers)
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        return await self.searcher.aenrich(papers)
+
+    def is_cached(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> bool:
+        key = self.cache.make_key(self.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        return self.cache.contains(self.name, key) or self.searcher.is_cached(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Returns the search cache shared by the worker and the API endpoints."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
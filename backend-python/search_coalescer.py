@@ -0,0 +1,208 @@
+import asyncio
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from paper_search import PaperSearch, SearchError, search_key
+
+
+class _SearchAbandoned(Exception):
+    """Set on an in-flight future when its owner stops before the end, one of the waiters takes over."""
+
+
+class SearchCoalescer:
+    """
+    In-process, per-cycle memo of paper search results shared by all newsletters.
+
+    Identical requests issued while one is in flight wait for its result instead of hitting
+    the API again (single-flight), and completed results are reused for the rest of the cycle.
+    When the owner of a request stops early (its consumer had enough papers, or a page failed),
+    the papers it fetched are kept: the next caller yields them first, and only searches again
+    for the papers after them (from that offset, for the engines paging by offset). Safe to use from several threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[tuple, List[Dict]] = {}
+        self._partial: Dict[tuple, List[Dict]] = {}
+        self._in_flight: Dict[tuple, Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def wrap(self, searcher: PaperSearch) -> "CoalescedSearch":
+        return CoalescedSearch(searcher, self)
+
+    def is_memoized(self, searcher: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> bool:
+        key = search_key(searcher.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        with self._lock:
+            return key in self._results
+
+    def _claim(self, key: tuple):
+        """
+        Returns (memoized results, future of the in-flight request, whether the caller must run
+        the request, papers already fetched by an owner that stopped early).
+        """
+        with self._lock:
+            if key in self._results:
+                self.stats["hits"] += 1
+                return self._results[key], None, False, None
+            future = self._in_flight.get(key)
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats["misses"] += 1
+                return None, future, True, self._partial.get(key, [])
+            self.stats["coalesced"] += 1
+            return None, future, False, None
+
+    def _complete(self, key: tuple, future: Future, results: List[Dict], error: Optional[Exception] = None):
+        with self._lock:
+            # Engines return an empty list on failure, so empty results are not memoized
+            if error is None and results:
+                self._results[key] = results
+                self._partial.pop(key, None)
+            elif len(results) > len(self._partial.get(key, ())):
+                self._partial[key] = results
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(results)
+
+    @staticmethod
+    def _owner_error(e: BaseException) -> Exception:
+        """What the waiters of an owner stopped by `e` get: they take over unless the request itself is broken."""
+        # Also when the consumer closes the stream early (GeneratorExit) or the owner is cancelled
+        return e if isinstance(e, Exception) and not isinstance(e, SearchError) else _SearchAbandoned()
+
+    def search(self, searcher: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        papers = []
+        try:
+            for paper in self.iter_search(searcher, query, start_date, nb_papers, end_date=end_date, filters=filters):
+                papers.append(paper)
+        except SearchError:
+            # The papers found before the failed page, see `PaperSearch._collect`
+            pass
+        return papers
+
+    async def asearch(self, searcher: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        papers = []
+        try:
+            async for paper in self.aiter_search(searcher, query, start_date, nb_papers, end_date=end_date, filters=filters):
+                papers.append(paper)
+        except SearchError:
+            pass
+        return papers
+
+    def iter_search(self, searcher: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Yields the papers of a search as the pages arrive. The results are only memoized when
+        the stream is consumed to the end, the papers of a stream stopped earlier are kept for
+        the next caller.
+        """
+        key = search_key(searcher.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        while True:
+            memoized, future, is_owner, fetched = self._claim(key)
+            # Papers are copied since downstream steps annotate them in place
+            if memoized is not None:
+                yield from copy.deepcopy(memoized)
+                return
+            if is_owner:
+                break
+            logging.info(f"Waiting for in-flight {searcher.name} search: {query}")
+            try:
+                results = future.result()
+            except _SearchAbandoned:
+                continue
+            yield from copy.deepcopy(results)
+            return
+
+        results = []
+        try:
+            for paper in fetched:
+                results.append(paper)
+                yield copy.deepcopy(paper)
+            # The search only starts again once the papers already fetched were consumed, from the
+            # offset after them
+            papers = searcher.iter_search_from(query, start_date, nb_papers, len(fetched), end_date=end_date, filters=filters, page_size=page_size) \
+                if fetched else searcher.iter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size)
+            for paper in papers:
+                results.append(copy.deepcopy(paper))
+                yield paper
+        except BaseException as e:
+            self._complete(key, future, results, error=self._owner_error(e))
+            raise
+        self._complete(key, future, results)
+
+    async def aiter_search(self, searcher: PaperSearch, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async version of `iter_search`.
+        """
+        key = search_key(searcher.cache_namespace, query, start_date, nb_papers, end_date=end_date, filters=filters)
+        while True:
+            memoized, future, is_owner, fetched = self._claim(key)
+            if memoized is not None:
+                for paper in copy.deepcopy(memoized):
+                    yield paper
+                return
+            if is_owner:
+                break
+            logging.info(f"Waiting for in-flight {searcher.name} search: {query}")
+            try:
+                # Shielded, so a waiter being cancelled doesn't cancel the future of the others
+                results = await asyncio.shield(asyncio.wrap_future(future))
+            except _SearchAbandoned:
+                continue
+            for paper in copy.deepcopy(results):
+                yield paper
+            return
+
+        results = []
+        try:
+            for paper in fetched:
+                results.append(paper)
+                yield copy.deepcopy(paper)
+            papers = searcher.aiter_search_from(query, start_date, nb_papers, len(fetched), end_date=end_date, filters=filters, page_size=page_size) \
+                if fetched else searcher.aiter_search(query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size)
+            async for paper in papers:
+                results.append(copy.deepcopy(paper))
+                yield paper
+        except BaseException as e:
+            self._complete(key, future, results, error=self._owner_error(e))
+            raise
+        self._complete(key, future, results)
+
+
+class CoalescedSearch(PaperSearch):
+    """
+    A PaperSearch wrapper routing the searches of another engine through a SearchCoalescer.
+    """
+    def __init__(self, searcher: PaperSearch, coalescer: SearchCoalescer):
+        self.searcher = searcher
+        self.coalescer = coalescer
+        self.name = searcher.name
+
+    def search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        return self.coalescer.search(self.searcher, query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    async def asearch(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        return await self.coalescer.asearch(self.searcher, query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    def iter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        return self.coalescer.iter_search(self.searcher, query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size)
+
+    def aiter_search(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        return self.coalescer.aiter_search(self.searcher, query, start_date, nb_papers, end_date=end_date, filters=filters, page_size=page_size)
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.searcher.cache_namespace
+
+    def enrich(self, papers: List[Dict]) -> List[Dict]:
+        return self.searcher.enrich(papers)
+
+    async def aenrich(self, papers: List[Dict]) -> List[Dict]:
+        return await self.searcher.aenrich(papers)
+
+    def is_cached(self, query: str, start_date: str, nb_papers: int, end_date: Optional[str] = None, filters: Optional[Dict] = None) -> bool:
+        return self.coalescer.is_memoized(self.searcher, query, start_date, nb_papers, end_date=end_date, filters=filters) or \
+            self.searcher.is_cached(query, start_date, nb_papers, end_date=end_date, filters=filters)
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
 from api_client import ApiClient
+from circuit_breaker import CircuitBreaker
 
 class TestApiClient(unittest.TestCase):
 
@@ -101,5 +102,21 @@ class TestApiClient(unittest.TestCase):
         with self.assertRaises(requests.exceptions.RetryError):
             self.api_client.get_newsletters()
 
+class TestApiClientBreakers(unittest.TestCase):
+
+    def test_token_is_fetched_through_the_auth0_breaker(self):
+        breakers = {"auth0": CircuitBreaker("auth0"), "node_api": CircuitBreaker("node_api", failure_threshold=1)}
+        breakers["node_api"].record(False)
+        token_response = MagicMock(status_code=200)
+        token_response.json.return_value = {'access_token': 'T1', 'expires_in': 3600}
+        client = ApiClient(base_url="http://test.com")
+        with patch('api_client.get_circuit_breaker', side_effect=breakers.get), \
+                patch('requests.Session.request', return_value=token_response) as request:
+            self.assertEqual(client._get_access_token(), 'T1')
+            self.assertIsNone(client.get_user_info('123'))
+
+        # The open Node API breaker only stopped the API call
+        self.assertEqual(request.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+import httpx
+from api_client import AsyncApiClient
+from circuit_breaker import CircuitBreaker
+
+
+class TestAsyncApiClient(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.token_requests = 0
+        self.api_responses = []
+
+    async def asyncSetUp(self):
+        async def handler(request):
+            if request.url.path == "/oauth/token":
+                self.token_requests += 1
+                await asyncio.sleep(0.05)
+                return httpx.Response(200, json={"access_token": f"T{self.token_requests}", "expires_in": 3600})
+            self.api_responses.append(request.headers["Authorization"])
+            if request.url.path.endswith("/unavailable"):
+                return httpx.Response(503, headers={"Retry-After": "0.05"})
+            return httpx.Response(200, json={"_id": "U1", "role": "admin"})
+
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.breaker = CircuitBreaker("node_api", failure_threshold=100)
+        for patcher in (patch('api_client.get_api_http_client', return_value=self.http),
+                        patch('api_client.get_circuit_breaker', return_value=self.breaker)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addAsyncCleanup(self.http.aclose)
+        self.client = AsyncApiClient("http://node/api")
+
+    async def test_concurrent_callers_share_one_token_refresh(self):
+        users = await asyncio.gather(*[self.client.get_user_by_auth0_id(f"auth0|{i}") for i in range(10)])
+
+        self.assertEqual(self.token_requests, 1)
+        self.assertEqual([u["_id"] for u in users], ["U1"] * 10)
+        self.assertEqual(set(self.api_responses), {"Bearer T1"})
+
+    async def test_token_is_refreshed_in_the_background_before_expiry(self):
+        self.client.token, self.client.token_expires_at = "OLD", time.time() + 60
+
+        await asyncio.gather(*[self.client.get_user_by_auth0_id("auth0|1") for _ in range(5)])
+        # Callers didn't wait for the refresh
+        self.assertEqual(set(self.api_responses), {"Bearer OLD"})
+        await self.client._refresh
+        await self.client.get_user_by_auth0_id("auth0|1")
+
+        self.assertEqual(self.token_requests, 1)
+        self.assertEqual(self.api_responses[-1], "Bearer T1")
+
+    async def test_retries_stop_at_the_deadline(self):
+        start = time.monotonic()
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.client._request('GET', "/unavailable", deadline=0.5)
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertGreater(self.client.stats["retries"], 1)
+
+    async def test_calls_fail_fast_once_the_breaker_opened(self):
+        self.breaker.failure_threshold = 3
+        with self.assertRaises(httpx.HTTPError):
+            await self.client._request('GET', "/unavailable", deadline=5)
+        calls = len(self.api_responses)
+
+        self.assertEqual(calls, 3)
+        self.assertIsNone(await self.client.get_user_by_auth0_id("auth0|1"))
+        self.assertEqual(len(self.api_responses), calls)
+
+    async def test_auth0_failures_do_not_open_the_node_api_breaker(self):
+        auth0 = CircuitBreaker("auth0", failure_threshold=1)
+        auth0.record(False)
+        with patch('api_client.get_circuit_breaker', side_effect={"auth0": auth0, "node_api": self.breaker}.get):
+            self.assertIsNone(await self.client.get_user_by_auth0_id("auth0|1"))
+
+        self.assertEqual(self.token_requests, 0)
+        self.assertFalse(self.breaker.is_open())
+
+
+if __name__ == '__main__':
+    unittest.main()
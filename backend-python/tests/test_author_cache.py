@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from author_cache import AuthorCache
+
+
+class TestAuthorCache(unittest.TestCase):
+
+    def test_misses_are_reported(self):
+        cache = AuthorCache()
+        cache.set_many({'A1': 10})
+
+        found, misses = cache.get_many(['A1', 'A2', 'A1'])
+
+        self.assertEqual(found, {'A1': 10})
+        self.assertEqual(misses, ['A2'])
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 1, "evictions": 0})
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = AuthorCache(max_entries=2)
+        cache.set_many({'A1': 1, 'A2': 2})
+        cache.get_many(['A1'])
+        cache.set_many({'A3': 3})
+
+        found, misses = cache.get_many(['A1', 'A2', 'A3'])
+
+        self.assertEqual(found, {'A1': 1, 'A3': 3})
+        self.assertEqual(misses, ['A2'])
+
+    def test_expired_entries_are_misses(self):
+        cache = AuthorCache(ttl=60)
+        with patch('author_cache.time.time', return_value=1000):
+            cache.set_many({'A1': 1})
+        with patch('author_cache.time.time', return_value=1061):
+            found, misses = cache.get_many(['A1'])
+
+        self.assertEqual(found, {})
+        self.assertEqual(misses, ['A1'])
+
+    def test_persisted_entries_survive_restart(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "authors.sqlite3")
+            first = AuthorCache(path=path)
+            first.set_many({'A1': 7})
+            first._conn.close()
+
+            second = AuthorCache(path=path)
+            found, misses = second.get_many(['A1', 'A2'])
+            second._conn.close()
+
+        self.assertEqual(found, {'A1': 7})
+        self.assertEqual(misses, ['A2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+from checkpoint_store import CheckpointStore
+from newsletter_creator import NewsletterCreator
+import worker
+
+
+class TestCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(path=os.path.join(self.tmpdir.name, "checkpoints.sqlite3"), ttl=60)
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.tmpdir.cleanup()
+
+    def test_unfinished_run_keeps_its_window(self):
+        run = self.store.start_run("N1", "2026-01-01", "2026-01-08")
+        run.put("searched", [{"title": "A"}])
+        run.put("written", None)
+
+        # The next day, the window computed by the worker moved but the run resumes with its own
+        resumed = self.store.start_run("N1", "2026-01-02", "2026-01-09")
+        self.assertEqual((resumed.start_date, resumed.end_date), ("2026-01-01", "2026-01-08"))
+        self.assertEqual(resumed.key, "N1:2026-01-01:2026-01-08")
+        self.assertEqual(resumed.get("searched"), [{"title": "A"}])
+        self.assertIn("written", resumed)
+        self.assertNotIn("persisted", resumed)
+
+        resumed.finish()
+        self.assertFalse(self.store.has_run("N1"))
+        self.assertEqual(self.store.start_run("N1", "2026-01-02", "2026-01-09").start_date, "2026-01-02")
+
+    def test_stale_runs_are_dropped(self):
+        with patch('checkpoint_store.time.time', return_value=1000):
+            self.store.start_run("N1", "2026-01-01", "2026-01-08").put("searched", [])
+        with patch('checkpoint_store.time.time', return_value=1061):
+            self.assertFalse(self.store.has_run("N1"))
+            run = self.store.start_run("N1", "2026-01-02", "2026-01-09")
+        self.assertEqual(run.start_date, "2026-01-02")
+        self.assertNotIn("searched", self.store.start_run("N1", "2026-01-01", "2026-01-08"))
+
+
+class TestResume(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(path=os.path.join(self.tmpdir.name, "checkpoints.sqlite3"))
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.tmpdir.cleanup()
+
+    async def test_generation_restarts_after_the_last_checkpoint(self):
+        run = self.store.start_run("N1", "2026-01-01", "2026-01-08")
+        papers_with_analysis = [{"paper": {"title": "A"}, "analysis": {"synthesis": "s", "usefulness": "u"}}]
+        run.put("filtered", [{"title": "A"}])
+        run.put("analyzed", papers_with_analysis)
+        creator = NewsletterCreator(client=MagicMock())
+        creator.filter_papers = AsyncMock()
+        creator.analyze_papers = AsyncMock()
+        creator.write_newsletter = AsyncMock(return_value={"title": "Issue"})
+
+        result = await creator.generate_newsletter("topic", [{"title": "A"}, {"title": "B"}], checkpoint=run)
+
+        creator.filter_papers.assert_not_called()
+        creator.analyze_papers.assert_not_called()
+        self.assertEqual(result, {"newsletter": {"title": "Issue"}, "papers": papers_with_analysis})
+        self.assertEqual(run.get("written"), result)
+
+    async def test_interrupted_newsletter_resumes_and_persists_once(self):
+        newsletter = {"_id": "N1", "topic": "topic", "status": "active", "userId": "U1", "lastSearch": None}
+        api_client = MagicMock()
+        api_client.create_issue.return_value = {"_id": "I1"}
+        searches, generations = [], []
+
+        class FakeCreator:
+            def __init__(self, **kwargs):
+                pass
+
+            async def search(self, *args, **kwargs):
+                searches.append(kwargs)
+                return [{"title": "A"}]
+
+            async def generate_newsletter(self, topic, papers, checkpoint=None, **kwargs):
+                generations.append(checkpoint.key)
+                if len(generations) == 1:
+                    raise RuntimeError("worker restarted")
+                return {"newsletter": {"title": "T", "summary": "", "introduction": "", "conclusion": "", "content_markdown": ""},
+                        "papers": [{"paper": {"title": "A"}, "analysis": {"synthesis": "", "usefulness": ""}}]}
+
+        with patch('worker.NewsletterCreator', FakeCreator), \
+                patch('worker.is_newsletter_due', side_effect=[True, False]), \
+                patch('worker.get_user_contact', return_value=(None, "user")), \
+                patch('worker.check_newsletter_inactivity', AsyncMock()):
+            first = await worker.build_pipeline(api_client, checkpoints=self.store).run([newsletter])
+            # lastSearch was not updated, but the newsletter is no longer due
+            second = await worker.build_pipeline(api_client, checkpoints=self.store).run([newsletter])
+
+        self.assertEqual(first[0].outcome["outcome"], "error")
+        self.assertEqual(second[0].outcome["outcome"], "success")
+        self.assertEqual(len(searches), 1)
+        self.assertEqual(generations[0], generations[1])
+        issue = api_client.create_issue.call_args[0][1]
+        self.assertTrue(issue["idempotencyKey"].startswith("N1:"))
+        self.assertFalse(self.store.has_run("N1"))
+
+
+    async def test_newsletter_stays_due_until_its_issue_is_delivered(self):
+        newsletter = {"_id": "N1", "topic": "topic", "status": "active", "userId": "U1", "lastSearch": None}
+        api_client = MagicMock()
+        # The first attempt fails to persist the generated issue
+        api_client.create_issue.side_effect = [None, {"_id": "I1"}]
+        generations = []
+
+        class FakeCreator:
+            def __init__(self, **kwargs):
+                pass
+
+            async def search(self, *args, **kwargs):
+                return [{"title": "A"}]
+
+            async def generate_newsletter(self, topic, papers, checkpoint=None, **kwargs):
+                if "written" in checkpoint:
+                    return checkpoint.get("written")
+                generations.append(checkpoint.key)
+                result = {"newsletter": {"title": "T", "summary": "", "introduction": "", "conclusion": "", "content_markdown": ""},
+                          "papers": [{"paper": {"title": "A"}, "analysis": {"synthesis": "", "usefulness": ""}}]}
+                checkpoint.put("written", result)
+                return result
+
+        with patch('worker.NewsletterCreator', FakeCreator), \
+                patch('worker.is_newsletter_due', return_value=True), \
+                patch('worker.get_user_contact', return_value=(None, "user")), \
+                patch('worker.check_newsletter_inactivity', AsyncMock()):
+            first = await worker.build_pipeline(api_client, checkpoints=self.store).run([newsletter])
+            api_client.update_newsletter.assert_not_called()
+            second = await worker.build_pipeline(api_client, checkpoints=self.store).run([newsletter])
+
+        self.assertEqual((first[0].outcome["outcome"], second[0].outcome["outcome"]), ("error", "success"))
+        self.assertEqual(len(generations), 1)
+        api_client.update_newsletter.assert_called_once()
+        self.assertIn("lastSearch", api_client.update_newsletter.call_args[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
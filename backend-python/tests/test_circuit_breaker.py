@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import httpx
+from circuit_breaker import CircuitBreaker
+from newsletter_creator import select_engines
+from paper_search import SemanticSearch
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures_and_probes_after_the_reset_timeout(self):
+        breaker = CircuitBreaker("engine", failure_threshold=3, reset_timeout=60)
+        for ok in (False, False, True, False, False):
+            breaker.record(ok)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow())
+        with patch('circuit_breaker.time.monotonic', return_value=breaker.opened_at + 61):
+            # A single probe goes through
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record(True)
+            self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.snapshot(), {"state": "closed", "failures": 5, "slow_calls": 0, "rejected": 2, "opened": 1})
+
+    def test_failed_probe_reopens_and_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("engine", failure_threshold=2, reset_timeout=60, latency_slo=1)
+        breaker.record(True, latency=5)
+        breaker.record(True, latency=5)
+        self.assertTrue(breaker.is_open())
+
+        with patch('circuit_breaker.time.monotonic', return_value=breaker.opened_at + 61):
+            self.assertTrue(breaker.allow())
+            breaker.record(False)
+            self.assertFalse(breaker.allow())
+        self.assertEqual((breaker.state, breaker.stats["slow_calls"], breaker.stats["opened"]), ("open", 2, 2))
+
+    def test_disabled_breaker_lets_everything_through(self):
+        breaker = CircuitBreaker("engine", failure_threshold=1, enabled=False)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.is_open())
+
+
+class TestFallbacks(unittest.IsolatedAsyncioTestCase):
+
+    def breakers(self, *open_engines):
+        breakers = {}
+        for name in ("semantic_scholar", "openalex"):
+            breakers[name] = CircuitBreaker(name, failure_threshold=1)
+            if name in open_engines:
+                breakers[name].record(False)
+        return patch('newsletter_creator.get_circuit_breaker', side_effect=breakers.get)
+
+    def test_open_engine_is_replaced_by_its_fallback(self):
+        with self.breakers("semantic_scholar"):
+            self.assertEqual(select_engines("semantic_scholar"), ["openalex"])
+            self.assertEqual(select_engines("all"), ["openalex"])
+        with self.breakers("semantic_scholar", "openalex"):
+            # Nothing healthy to fall back to, cached results may still be served
+            self.assertEqual(select_engines("semantic_scholar"), ["semantic_scholar"])
+        with self.breakers():
+            self.assertEqual(select_engines("all"), ["semantic_scholar", "openalex"])
+
+    async def test_searches_fail_fast_while_the_breaker_is_open(self):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append(request)
+            return httpx.Response(503)
+
+        breaker = CircuitBreaker("semantic_scholar", failure_threshold=2, reset_timeout=60)
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        searcher = SemanticSearch(api_key="key")
+        searcher.rate_limiter = AsyncMock()
+        with patch('paper_search.get_async_http_client', return_value=http), \
+                patch('paper_search.get_circuit_breaker', return_value=breaker):
+            for _ in range(5):
+                self.assertEqual(await searcher.asearch("query", "2026-01-01", 10), [])
+        await http.aclose()
+
+        self.assertEqual(len(requests_sent), 2)
+        self.assertEqual(breaker.stats["rejected"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, AsyncMock, patch
+from cycle_cache import CycleCache
+import worker
+
+
+def newsletter(i, user="U1", **fields):
+    return {"_id": f"N{i}", "userId": user, "status": "active", "topic": f"topic {i}", **fields}
+
+
+class TestCycleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.api_client = MagicMock()
+        self.api_client.get_users_info.return_value = {"U1": {"email": "a@x.org", "name": "Ada"}}
+        self.api_client.get_consecutive_unread_counts.side_effect = lambda pairs: {n: 2 for n, _ in pairs if n != "N1"}
+        self.api_client.get_latest_issue_dates.return_value = {"N2": "2026-01-01T00:00:00.000Z"}
+
+    def test_prefetch_uses_bulk_requests(self):
+        newsletters = [newsletter(0, lastSearch="2026-01-05"), newsletter(1, lastIssueDate=None),
+                       newsletter(2), newsletter(3, user="GONE")]
+        cache = CycleCache(self.api_client, bulk_size=2)
+        cache.prefetch(newsletters)
+
+        self.assertEqual(cache.user_contact("U1"), ("a@x.org", "Ada"))
+        # Deleted users are cached too
+        self.assertEqual(cache.user_contact("GONE"), (None, "user"))
+        self.assertEqual([cache.unread_count(n) for n in newsletters], [2, 0, 2, 2])
+        self.assertIsNone(cache.latest_issue_date(newsletters[1]))
+        self.assertEqual(cache.latest_issue_date(newsletters[2]), "2026-01-01T00:00:00.000Z")
+        self.assertEqual(cache.stats, {"bulk_requests": 4, "single_requests": 0})
+        self.api_client.get_latest_issue_dates.assert_called_once_with(["N2", "N3"])
+        self.api_client.get_user_info.assert_not_called()
+
+    def test_missing_entries_are_fetched_once(self):
+        self.api_client.get_users_info.return_value = None
+        self.api_client.get_user_info.return_value = {"email": "a@x.org", "name": "Ada"}
+        cache = CycleCache(self.api_client)
+        cache.prefetch([newsletter(0)])
+
+        for _ in range(3):
+            self.assertEqual(cache.user_contact("U1"), ("a@x.org", "Ada"))
+        self.api_client.get_user_info.assert_called_once_with("U1")
+
+    def test_concurrent_misses_are_fetched_once(self):
+        def slow_count(newsletter_id, user_id):
+            time.sleep(0.05)
+            return 4
+
+        self.api_client.get_consecutive_unread_count.side_effect = slow_count
+        self.api_client.get_latest_issue.side_effect = lambda newsletter_id: time.sleep(0.05)
+        cache = CycleCache(self.api_client)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            counts = list(pool.map(lambda _: cache.unread_count(newsletter(0)), range(4)))
+            dates = list(pool.map(lambda _: cache.latest_issue_date(newsletter(0)), range(4)))
+
+        self.assertEqual((counts, dates), ([4] * 4, [None] * 4))
+        self.assertEqual(cache.stats["single_requests"], 2)
+
+    def test_misses_of_other_keys_are_not_blocked(self):
+        def slow_user(user_id):
+            time.sleep(0.2)
+            return {"email": f"{user_id}@x.org", "name": user_id}
+
+        self.api_client.get_user_info.side_effect = slow_user
+        cache = CycleCache(self.api_client)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            contacts = list(pool.map(cache.user_contact, ["U1", "U2", "U3", "U1"]))
+
+        self.assertLess(time.monotonic() - start, 0.35)
+        self.assertEqual([email for email, _ in contacts], ["U1@x.org", "U2@x.org", "U3@x.org", "U1@x.org"])
+        self.assertEqual(self.api_client.get_user_info.call_count, 3)
+
+
+class TestCheckStage(unittest.IsolatedAsyncioTestCase):
+
+    async def test_not_due_newsletters_cost_no_request(self):
+        api_client = MagicMock()
+        cache = CycleCache(api_client)
+        newsletters = [newsletter(0, lastSearch="2999-01-01T00:00:00"), newsletter(1, lastSearch=None, lastIssueDate="2999-01-01T00:00:00")]
+
+        with patch('worker.check_newsletter_inactivity', AsyncMock()) as inactivity:
+            jobs = await worker.build_pipeline(api_client, cache=cache).run(newsletters)
+
+        self.assertEqual([job.outcome["outcome"] for job in jobs], ["skipped", "skipped"])
+        self.assertTrue(all(job.data["due_at"] > 0 for job in jobs))
+        inactivity.assert_not_called()
+        api_client.get_latest_issue.assert_not_called()
+
+    async def test_single_newsletters_go_through_the_pipeline(self):
+        api_client = MagicMock()
+
+        outcome = await worker.process_newsletter(api_client, newsletter(0, lastSearch="2999-01-01T00:00:00"))
+
+        self.assertEqual(outcome["outcome"], "skipped")
+        api_client.update_newsletter.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+import deadline
+import worker
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+
+    def test_nested_budgets_cannot_extend_the_outer_one(self):
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.timeout(30), 30)
+        with deadline.budget(10):
+            with deadline.budget(60):
+                self.assertLessEqual(deadline.remaining(), 10)
+            with deadline.budget(1):
+                self.assertLessEqual(deadline.timeout(30), 1)
+        self.assertIsNone(deadline.remaining())
+
+    def test_spent_budget_refuses_new_calls(self):
+        with deadline.budget(0.01):
+            time.sleep(0.02)
+            with self.assertRaises(deadline.DeadlineExceeded):
+                deadline.timeout(30)
+
+    async def test_budget_follows_tasks_and_threads(self):
+        with deadline.budget(5):
+            in_thread = await asyncio.to_thread(deadline.remaining)
+            in_task = await asyncio.create_task(asyncio.sleep(0, result=deadline.remaining()))
+        self.assertLessEqual(in_thread, 5)
+        self.assertLessEqual(in_task, 5)
+
+
+class TestNewsletterBudget(unittest.IsolatedAsyncioTestCase):
+
+    async def test_newsletter_over_budget_is_dropped(self):
+        newsletters = [{"_id": "slow", "topic": "slow", "status": "active", "userId": "U1"},
+                       {"_id": "fast", "topic": "fast", "status": "active", "userId": "U1"}]
+        budgets = []
+
+        class FakeCreator:
+            def __init__(self, **kwargs):
+                pass
+
+            async def search(self, topic, **kwargs):
+                budgets.append(deadline.remaining())
+                # A sick dependency
+                await asyncio.sleep(5 if topic == "slow" else 0)
+                return []
+
+            async def generate_newsletter(self, *args, **kwargs):
+                return None
+
+        with patch('worker.NEWSLETTER_BUDGET_SECONDS', 0.2), \
+                patch('worker.NewsletterCreator', FakeCreator), \
+                patch('worker.is_newsletter_due', return_value=True), \
+                patch('worker.get_user_contact', return_value=(None, "user")), \
+                patch('worker.check_newsletter_inactivity', AsyncMock()):
+            start = time.monotonic()
+            jobs = await worker.build_pipeline(MagicMock()).run(newsletters)
+
+        self.assertLess(time.monotonic() - start, 1)
+        outcomes = {job.item["_id"]: job.outcome["outcome"] for job in jobs}
+        self.assertEqual(outcomes, {"slow": "timeout", "fast": "no_papers"})
+        self.assertTrue(all(0 < b <= 0.2 for b in budgets))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import unittest
+from benchmark_dedup import DEFAULT_FIXTURE, evaluate, index_clusters, title_key_clusters
+from dedup import DedupIndex, PublishedIndex, normalize_arxiv_id, normalize_doi, paper_doi, paper_identifiers
+from paper_search import OpenAlexSearch
+
+
+class TestIdentifiers(unittest.TestCase):
+
+    def test_dois_and_arxiv_ids_are_normalized(self):
+        self.assertEqual(normalize_doi("https://doi.org/10.1145/ABC.123"), "10.1145/abc.123")
+        self.assertEqual(normalize_doi("doi:10.1/X"), "10.1/x")
+        self.assertEqual(normalize_arxiv_id("arXiv:2301.00001v3"), "2301.00001")
+
+    def test_arxiv_dois_and_urls_give_the_arxiv_id(self):
+        self.assertEqual(paper_identifiers({"externalIds": {"DOI": "10.48550/arXiv.2305.18290"}}), {"arxiv:2305.18290"})
+        self.assertEqual(paper_identifiers({"url": "https://arxiv.org/abs/2312.00752v2"}), {"arxiv:2312.00752"})
+
+    def test_openalex_ids_use_the_semantic_scholar_names(self):
+        work = {"doi": "https://doi.org/10.1038/s41586-021-03819-2",
+                "ids": {"mag": 3177828909, "pmid": "https://pubmed.ncbi.nlm.nih.gov/34265844"}}
+        self.assertEqual(OpenAlexSearch._external_ids(work), {"DOI": "10.1038/s41586-021-03819-2", "MAG": "3177828909", "PubMed": "34265844"})
+
+
+class TestDedupIndex(unittest.TestCase):
+
+    def test_papers_sharing_an_identifier_are_duplicates(self):
+        index = DedupIndex()
+        index.add({"paperId": "S1", "title": "Deep Residual Learning for Image Recognition", "externalIds": {"MAG": "2194775991", "ArXiv": "1512.03385"}})
+        # Another engine, another title and a DOI, but the same MAG ID
+        position = index.add({"paperId": "W1", "title": "Residual learning", "externalIds": {"MAG": "2194775991", "DOI": "10.1109/cvpr.2016.90"}})
+        # Matched through the DOI brought by the previous copy
+        index.add({"paperId": "W2", "title": "ResNet", "externalIds": {"DOI": "10.1109/CVPR.2016.90"}})
+
+        self.assertEqual(position, 0)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.stats["id_duplicates"], 2)
+
+    def test_similar_titles_are_duplicates_unless_their_versions_differ(self):
+        index = DedupIndex()
+        index.add({"title": "Optimising Retrieval-Augmented Generation for Long Documents", "externalIds": {"ArXiv": "2405.11111"}})
+        index.add({"title": "Optimizing Retrieval Augmented Generation for Long Documents", "externalIds": {"DOI": "10.1145/1"}})
+        # Same title as the published version, but another DOI
+        index.add({"title": "Optimizing Retrieval Augmented Generation for Long Documents", "externalIds": {"DOI": "10.1145/2"}})
+        # Only the numbers differ
+        index.add({"title": "Qwen2 Technical Report"})
+        index.add({"title": "Qwen3 Technical Report"})
+
+        self.assertEqual([p["title"] for p in index.papers], [
+            "Optimising Retrieval-Augmented Generation for Long Documents",
+            "Optimizing Retrieval Augmented Generation for Long Documents",
+            "Qwen2 Technical Report",
+            "Qwen3 Technical Report",
+        ])
+        self.assertEqual(index.stats["title_duplicates"], 1)
+
+    def test_index_beats_the_title_key_on_the_labelled_fixture(self):
+        with open(DEFAULT_FIXTURE) as f:
+            papers = json.load(f)
+
+        baseline = evaluate(papers, title_key_clusters, repeat=1)
+        scores = evaluate(papers, index_clusters(0.8), repeat=1)
+
+        self.assertEqual(scores["precision"], 1.0)
+        self.assertGreater(scores["recall"], baseline["recall"])
+
+
+class TestPublishedIndex(unittest.TestCase):
+
+    def test_papers_match_on_their_id_or_doi(self):
+        published = PublishedIndex(paper_ids=["S1"], dois=["https://doi.org/10.1145/X", "10.48550/arxiv.2305.18290"])
+
+        self.assertIn({"paperId": "S1", "title": "Old paper"}, published)
+        self.assertIn({"paperId": "W9", "externalIds": {"DOI": "10.1145/x"}}, published)
+        # arXiv DOIs match the arXiv IDs of Semantic Scholar
+        self.assertIn({"paperId": "S2", "externalIds": {"ArXiv": "2305.18290"}}, published)
+        self.assertNotIn({"paperId": "S3", "externalIds": {"DOI": "10.1145/y"}}, published)
+
+    def test_stored_doi_falls_back_to_the_arxiv_doi(self):
+        self.assertEqual(paper_doi({"externalIds": {"DOI": "10.1145/X", "ArXiv": "2301.00001"}}), "10.1145/x")
+        self.assertEqual(paper_doi({"externalIds": {"ArXiv": "2301.00001v2"}}), "10.48550/arxiv.2301.00001")
+        self.assertIsNone(paper_doi({"title": "No identifier"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+import numpy as np
+from embedding_store import EmbeddingStore, embed_texts, top_k
+
+
+class TestEmbeddingStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.requests = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def embed_fn(self, chunk):
+        self.requests.append(list(chunk))
+        return [[float(len(text)), 1.0, 0.0] for text in chunk]
+
+    async def test_only_misses_are_embedded_in_chunks(self):
+        store = EmbeddingStore("model", directory=self.tmpdir.name)
+
+        first = await embed_texts(["a", "bb", "ccc"], "model", self.embed_fn, store=store, chunk_size=2)
+        second = await embed_texts(["bb", "dddd", "a", "bb"], "model", self.embed_fn, store=store, chunk_size=2)
+
+        self.assertEqual(sorted(map(len, self.requests)), [1, 1, 2])
+        self.assertEqual(self.requests[-1], ["dddd"])
+        np.testing.assert_allclose(second[0], first[1], rtol=1e-6)
+        np.testing.assert_allclose(np.linalg.norm(second, axis=1), 1, rtol=1e-6)
+
+    async def test_store_survives_restart(self):
+        store = EmbeddingStore("model", directory=self.tmpdir.name)
+        await embed_texts(["a", "bb"], "model", self.embed_fn, store=store)
+        store._conn.close()
+
+        reopened = EmbeddingStore("model", directory=self.tmpdir.name)
+        vectors = await embed_texts(["bb", "a"], "model", self.embed_fn, store=reopened)
+        reopened._conn.close()
+
+        self.assertEqual(len(self.requests), 1)
+        np.testing.assert_allclose(vectors[0], np.array([2, 1, 0]) / np.sqrt(5), rtol=1e-6)
+
+    def test_vectors_stored_twice_are_ignored(self):
+        store = EmbeddingStore("model", directory=self.tmpdir.name)
+        vectors = {f"h{i}": np.array([float(i), 1.0, 0.0], dtype=np.float32) for i in range(600)}
+
+        store.put_many(vectors)
+        # Another newsletter embedded the same texts concurrently
+        store.put_many(vectors)
+        store.put_many({"h0": vectors["h0"], "new": np.array([0.0, 0.0, 1.0], dtype=np.float32)})
+
+        found = store.get_many(["h599", "new"])
+        store._conn.close()
+        np.testing.assert_allclose(found["h599"], np.array([599, 1, 0]) / np.linalg.norm([599, 1, 0]), rtol=1e-6)
+        np.testing.assert_allclose(found["new"], [0, 0, 1])
+
+    def test_partly_written_row_is_overwritten(self):
+        store = EmbeddingStore("model", directory=self.tmpdir.name)
+        store.put_many({"a": np.array([1.0, 0.0, 0.0], dtype=np.float32)})
+        # A process crashed in the middle of appending a row
+        with open(store.vectors_path, "ab") as f:
+            f.write(b"\0" * 6)
+
+        store.put_many({"b": np.array([0.0, 1.0, 0.0], dtype=np.float32)})
+
+        found = store.get_many(["a", "b"])
+        store._conn.close()
+        np.testing.assert_allclose(found["a"], [1, 0, 0])
+        np.testing.assert_allclose(found["b"], [0, 1, 0])
+
+    async def test_models_do_not_share_embeddings(self):
+        store = EmbeddingStore("model", directory=self.tmpdir.name)
+        await embed_texts(["a"], "model", self.embed_fn, store=store)
+        other = EmbeddingStore("other-model", directory=self.tmpdir.name)
+        await embed_texts(["a"], "other-model", self.embed_fn, store=other)
+
+        self.assertEqual(len(self.requests), 2)
+
+    def test_top_k(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        self.assertEqual(list(top_k(scores, 3)), [1, 3, 2])
+        self.assertEqual(list(top_k(scores, 10)), [1, 3, 2, 4, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
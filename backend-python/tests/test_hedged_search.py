@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+from paper_search import PaperSearch
+from hedged_search import LatencyTracker, SearchHedger
+
+
+class FakeSearch(PaperSearch):
+
+    def __init__(self, name, delay=0.0, papers=None):
+        self.name = name
+        self.delay = delay
+        self.papers = [{'title': f'{name} paper'}] if papers is None else papers
+        self.calls = 0
+        self.completed = 0
+
+    def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+        return self.papers
+
+    async def asearch(self, query, start_date, nb_papers, end_date=None, filters=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        self.completed += 1
+        return self.papers
+
+
+def trained_tracker(latency, samples=20):
+    tracker = LatencyTracker(window=100)
+    for _ in range(samples):
+        tracker.record(latency)
+    return tracker
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_percentile_needs_enough_samples(self):
+        tracker = LatencyTracker(window=100)
+        for latency in range(1, 101):
+            tracker.record(latency / 100)
+
+        self.assertEqual(tracker.percentile(95), 0.95)
+        self.assertEqual(tracker.percentile(50), 0.5)
+        self.assertIsNone(tracker.percentile(95, min_samples=101))
+
+    def test_only_the_last_latencies_are_kept(self):
+        tracker = LatencyTracker(window=3)
+        for latency in (10, 10, 1, 1, 1):
+            tracker.record(latency)
+        self.assertEqual(tracker.percentile(95), 1)
+
+
+class TestSearchHedger(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.limiter = MagicMock()
+        self.limiter.available.return_value = 5
+        self.breaker = MagicMock()
+        self.breaker.is_open.return_value = False
+        self.trackers = {}
+        for target, value in (('get_rate_limiter', self.limiter), ('get_circuit_breaker', self.breaker)):
+            patcher = patch(f'hedged_search.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('hedged_search.get_latency_tracker', side_effect=lambda engine: self.trackers.setdefault(engine, LatencyTracker()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_slow_primary_is_hedged_and_the_hedge_wins(self):
+        primary, secondary = FakeSearch("primary", delay=0.3), FakeSearch("secondary")
+        self.trackers["primary"] = trained_tracker(0.05)
+        hedger = SearchHedger(min_samples=20)
+
+        papers = await hedger.wrap(primary, secondary).asearch('q', '2026-01-01', 10)
+
+        self.assertEqual(papers, secondary.papers)
+        # The primary query completes in the background and its latency is recorded
+        await asyncio.sleep(0.4)
+        self.assertEqual(primary.completed, 1)
+        self.assertEqual(len(self.trackers["primary"]._samples), 21)
+        self.assertEqual((hedger.stats["queries"], hedger.stats["hedged"], hedger.stats["hedge_wins"], hedger.stats["hedge_rate"]), (1, 1, 1, 1.0))
+        self.assertGreater(hedger.stats["saved_seconds"], 0.1)
+
+    async def test_fast_primary_is_not_hedged(self):
+        primary, secondary = FakeSearch("primary", delay=0.01), FakeSearch("secondary")
+        self.trackers["primary"] = trained_tracker(0.2)
+        hedger = SearchHedger(min_samples=20)
+
+        papers = await hedger.wrap(primary, secondary).asearch('q', '2026-01-01', 10)
+
+        self.assertEqual(papers, primary.papers)
+        self.assertEqual(secondary.calls, 0)
+        self.assertEqual(hedger.stats["hedge_rate"], 0)
+
+    async def test_no_hedge_before_enough_latencies_were_measured(self):
+        primary, secondary = FakeSearch("primary", delay=0.1), FakeSearch("secondary")
+        self.trackers["primary"] = trained_tracker(0.01, samples=5)
+
+        papers = await SearchHedger(min_samples=20).wrap(primary, secondary).asearch('q', '2026-01-01', 10)
+
+        self.assertEqual(papers, primary.papers)
+        self.assertEqual(secondary.calls, 0)
+
+    async def test_no_hedge_without_rate_limiter_budget(self):
+        self.limiter.available.return_value = 0.5
+        primary, secondary = FakeSearch("primary", delay=0.2), FakeSearch("secondary")
+        self.trackers["primary"] = trained_tracker(0.01)
+        hedger = SearchHedger(min_samples=20)
+
+        papers = await hedger.wrap(primary, secondary).asearch('q', '2026-01-01', 10)
+
+        self.assertEqual(papers, primary.papers)
+        self.assertEqual(secondary.calls, 0)
+        self.assertEqual((hedger.stats["hedged"], hedger.stats["no_budget"]), (0, 1))
+
+    async def test_empty_hedge_does_not_win(self):
+        primary, secondary = FakeSearch("primary", delay=0.2), FakeSearch("secondary", papers=[])
+        self.trackers["primary"] = trained_tracker(0.01)
+        hedger = SearchHedger(min_samples=20)
+
+        papers = await hedger.wrap(primary, secondary).asearch('q', '2026-01-01', 10)
+
+        self.assertEqual(papers, primary.papers)
+        self.assertEqual((hedger.stats["hedged"], hedger.stats["hedge_wins"]), (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
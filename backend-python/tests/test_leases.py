@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from leases import LocalLeaseBackend, ShardCoordinator, aggregate_shards
+from pipeline import StagedPipeline, Stage
+
+
+def newsletters(n):
+    return [{"_id": f"N{i}", "topic": f"topic {i}", "status": "active"} for i in range(n)]
+
+
+class TestLocalLeaseBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "leases.sqlite3")
+        self.backend = LocalLeaseBackend(self.path)
+        self.backend.register(newsletters(3) + [{"_id": "OFF", "status": "inactive"}])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_workers_claim_disjoint_newsletters(self):
+        other = LocalLeaseBackend(self.path)
+        first = self.backend.claim("A", 2, 60)
+        second = other.claim("B", 2, 60)
+
+        self.assertEqual([n["_id"] for n in first["newsletters"]], ["N0", "N1"])
+        self.assertEqual([n["_id"] for n in second["newsletters"]], ["N2"])
+        self.assertEqual(second["pending"], 2)
+        self.assertEqual(self.backend.renew("A", ["N0", "N2"], 60), ["N0"])
+
+    def test_done_newsletters_are_not_claimed_again_but_expired_ones_are(self):
+        self.backend.claim("A", 2, 0.01)
+        self.backend.release("A", ["N0"], done_ttl=60)
+        time.sleep(0.02)
+
+        claimed = self.backend.claim("B", 10, 60)
+        # N1 was held by A, whose lease expired
+        self.assertEqual([n["_id"] for n in claimed["newsletters"]], ["N1", "N2"])
+        self.assertEqual(self.backend.claim("C", 10, 60), {"newsletters": [], "pending": 2})
+        self.assertEqual(self.backend.renew("A", ["N1"], 60), [])
+
+    def test_heartbeats_give_the_progress_of_the_live_workers(self):
+        self.backend.heartbeat("A", {"status": "running", "processed_count": 2, "in_progress": 1, "claimed": 3}, 60)
+        shards = self.backend.heartbeat("B", {"status": "idle", "processed_count": 1, "in_progress": 0, "claimed": 1}, 60)
+
+        self.assertEqual([s["workerId"] for s in shards], ["A", "B"])
+        self.assertEqual(aggregate_shards(shards),
+                         {"workers": 2, "running": 1, "processed_count": 3, "in_progress": 1, "claimed": 4})
+
+
+class TestShardCoordinator(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "leases.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def run_worker(self, worker_id, items, processed, ttl=60):
+        coordinator = ShardCoordinator(LocalLeaseBackend(self.path), worker_id=worker_id, ttl=ttl, claim_batch=1)
+
+        async def work(job):
+            await asyncio.sleep(0.05)
+            processed.append((worker_id, job.item["_id"]))
+            job.outcome = {"outcome": "success"}
+            return False
+
+        pipeline = StagedPipeline([Stage("work", work)], queue_size=1,
+                                  on_done=lambda job: coordinator.finish(job.item["_id"]))
+        await coordinator.start(items)
+        try:
+            await pipeline.run(coordinator.claimed())
+        finally:
+            await coordinator.stop()
+        return coordinator
+
+    async def test_workers_share_the_newsletters(self):
+        items = newsletters(12)
+        processed = []
+        start = time.perf_counter()
+        await asyncio.gather(*[self.run_worker(w, items, processed, ttl=0.3) for w in ("A", "B", "C")])
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(sorted(n for _, n in processed), sorted(n["_id"] for n in items))
+        self.assertEqual({w for w, _ in processed}, {"A", "B", "C"})
+        # A single worker would take 12 x 50 ms
+        self.assertLess(elapsed, 0.5)
+
+    async def test_newsletters_of_a_dead_worker_are_taken_over(self):
+        items = newsletters(4)
+        backend = LocalLeaseBackend(self.path)
+        backend.register(items)
+        # Worker A claims two newsletters and dies without renewing its leases
+        backend.claim("A", 2, 0.3)
+
+        processed = []
+        coordinator = await self.run_worker("B", items, processed, ttl=0.3)
+
+        self.assertEqual(sorted(n for _, n in processed), ["N0", "N1", "N2", "N3"])
+        self.assertEqual(coordinator.stats["claimed"], 4)
+        self.assertEqual(backend.claim("C", 10, 60), {"newsletters": [], "pending": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
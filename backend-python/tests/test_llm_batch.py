@@ -0,0 +1,139 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock
+from pydantic import ValidationError
+from data_models import BatchRelevanceOutput, RelevanceOutput, PaperAnalyzerOutput
+from llm_batch import BatchCollector, BatchRequestError, LocalBatchBackend, json_schema_format, placeholder_handler
+from newsletter_creator import NewsletterCreator
+
+
+def relevance_handler(endpoint, body):
+    """Answers the relevance filter prompts: papers with "Relevant" in their title are relevant."""
+    response = placeholder_handler(endpoint, body)
+    if endpoint == "/v1/responses" and body["text"]["format"]["name"] == "RelevanceOutput":
+        is_relevant = "yes" if "Relevant" in body["input"] else "no"
+        response["output"][0]["content"][0]["text"] = json.dumps({"reasonning": "", "is_relevant": is_relevant})
+    return response
+
+
+class TestBatchCollector(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_calls_share_one_batch(self):
+        backend = LocalBatchBackend(relevance_handler)
+        collector = BatchCollector(backend=backend, collect_seconds=0.05, poll_seconds=0.01)
+        client = collector.client()
+
+        responses = await asyncio.gather(*[
+            client.responses.parse(model="gpt-5-mini", input=f"{title} paper", text_format=RelevanceOutput)
+            for title in ["Relevant", "Other", "Relevant"]
+        ])
+
+        self.assertEqual([r.output_parsed.is_relevant for r in responses], ["yes", "no", "yes"])
+        self.assertEqual(len(backend.submitted), 1)
+        self.assertEqual(collector.stats["requests"], 3)
+        self.assertEqual(collector.stats["succeeded"], 3)
+
+    async def test_requests_of_different_endpoints_go_to_different_batches(self):
+        backend = LocalBatchBackend()
+        collector = BatchCollector(backend=backend, collect_seconds=0.01, poll_seconds=0.01)
+        client = collector.client()
+
+        analysis, embeddings = await asyncio.gather(
+            client.responses.parse(model="gpt-5-mini", input="paper", text_format=PaperAnalyzerOutput),
+            client.embeddings.create(model="text-embedding-3-large", input=["a", "b"]),
+        )
+
+        self.assertIsInstance(analysis.output_parsed, PaperAnalyzerOutput)
+        self.assertEqual(len(embeddings.data), 2)
+        self.assertEqual(sorted(batch.endpoint for batch, _ in backend.submitted.values()), ["/v1/embeddings", "/v1/responses"])
+
+    async def test_callers_resume_without_waiting_for_later_batches(self):
+        backend = LocalBatchBackend(delay=0.3)
+        collector = BatchCollector(backend=backend, collect_seconds=0.01, poll_seconds=0.01)
+        client = collector.client()
+        finished = []
+
+        async def call(name, wait):
+            await asyncio.sleep(wait)
+            await client.responses.create(model="gpt-5-mini", input=name)
+            finished.append(name)
+
+        first = asyncio.create_task(call("first", 0))
+        second = asyncio.create_task(call("second", 0.2))
+        await first
+        self.assertEqual(finished, ["first"])
+        await second
+        self.assertEqual(len(backend.submitted), 2)
+
+    async def test_failed_requests_raise_and_missing_results_are_resubmitted(self):
+        def handler(endpoint, body):
+            if body["input"] == "broken":
+                raise ValueError("invalid request")
+            return placeholder_handler(endpoint, body)
+
+        backend = LocalBatchBackend(handler)
+        collector = BatchCollector(backend=backend, collect_seconds=0.01, poll_seconds=0.01, max_attempts=2)
+        client = collector.client()
+        original_complete = backend.complete
+        expired = []
+
+        def complete(batch):
+            # The first batch expires without any result
+            if not expired:
+                expired.append(batch.id)
+                return batch.model_copy(update={"status": "expired"})
+            return original_complete(batch)
+
+        backend.complete = complete
+        ok, broken = await asyncio.gather(
+            client.responses.create(model="gpt-5-mini", input="fine"),
+            client.responses.create(model="gpt-5-mini", input="broken"),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(ok.output_text, "")
+        self.assertIsInstance(broken, BatchRequestError)
+        self.assertIn("invalid request", str(broken))
+        self.assertEqual(collector.stats["resubmitted"], 2)
+        self.assertEqual(len(backend.submitted), 2)
+
+    async def test_structured_outputs_are_validated_by_their_model(self):
+        def handler(endpoint, body):
+            response = placeholder_handler(endpoint, body)
+            response["output"][0]["content"][0]["text"] = json.dumps({"verdicts": [{"index": 0, "reasonning": ""}]})
+            return response
+
+        collector = BatchCollector(backend=LocalBatchBackend(handler), collect_seconds=0.01, poll_seconds=0.01)
+        schema = json_schema_format(BatchRelevanceOutput)["schema"]
+
+        # Nested models are strict too
+        self.assertFalse(schema["$defs"]["PaperVerdict"]["additionalProperties"])
+        self.assertEqual(schema["$defs"]["PaperVerdict"]["required"], ["index", "reasonning", "is_relevant"])
+        with self.assertRaises(ValidationError):
+            await collector.client().responses.parse(model="gpt-5-mini", input="papers", text_format=BatchRelevanceOutput)
+
+
+class TestBatchedNewsletterCreator(unittest.IsolatedAsyncioTestCase):
+
+    async def test_filter_stage_of_several_newsletters_runs_as_one_batch(self):
+        backend = LocalBatchBackend(relevance_handler)
+        collector = BatchCollector(backend=backend, collect_seconds=0.05, poll_seconds=0.01)
+        creators = [NewsletterCreator(client=collector.client(), llm_scheduler=collector, relevance_cache=MagicMock(), prefilter=False)
+                    for _ in range(2)]
+        for creator in creators:
+            creator.relevance_cache.get_many.return_value = {}
+        papers = [
+            {'paperId': 'P1', 'title': 'Relevant paper', 'abstract': 'abstract'},
+            {'paperId': 'P2', 'title': 'Other paper', 'abstract': 'abstract'},
+        ]
+
+        results = await asyncio.gather(*[creator.filter_papers(topic, papers) for creator, topic in zip(creators, ["agents", "robotics"])])
+
+        self.assertEqual([[p['paperId'] for p in result] for result in results], [['P1'], ['P1']])
+        self.assertEqual(len(backend.submitted), 1)
+        self.assertEqual(collector.stats["requests"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
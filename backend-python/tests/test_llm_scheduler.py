@@ -0,0 +1,104 @@
+import asyncio
+import time
+import unittest
+import httpx
+import openai
+from unittest.mock import patch
+from llm_scheduler import LLMScheduler, PRIORITY_FILTER, PRIORITY_WRITE, parse_reset, get_openai_client, close_openai_client
+
+
+def api_error(status_code, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status_code == 429 else openai.InternalServerError
+    if status_code < 500 and status_code != 429:
+        error_class = openai.BadRequestError
+    return error_class("error", response=response, body=None)
+
+
+class TestLLMScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_rate_limited_calls_are_retried_after_retry_after(self):
+        scheduler = LLMScheduler(base_delay=0.001)
+        attempts = []
+
+        async def call():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise api_error(429, {"retry-after": "0.2"})
+            if len(attempts) == 2:
+                raise api_error(503)
+            return "ok"
+
+        self.assertEqual(await scheduler.run(call), "ok")
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.2)
+        self.assertEqual(scheduler.stats["retries"], 2)
+        self.assertEqual(scheduler.stats["rate_limited"], 1)
+
+    async def test_other_errors_are_not_retried(self):
+        scheduler = LLMScheduler()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise api_error(400)
+
+        with self.assertRaises(openai.BadRequestError):
+            await scheduler.run(call)
+        self.assertEqual(len(calls), 1)
+
+    async def test_concurrency_is_bounded_and_filter_calls_go_first(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        order = []
+
+        async def blocking():
+            await release.wait()
+            order.append("first")
+
+        def call(name):
+            async def append():
+                order.append(name)
+            return append
+
+        first = asyncio.create_task(scheduler.run(blocking))
+        await asyncio.sleep(0.05)
+        writer = asyncio.create_task(scheduler.run(call("writer"), priority=PRIORITY_WRITE))
+        await asyncio.sleep(0.01)
+        filterer = asyncio.create_task(scheduler.run(call("filter"), priority=PRIORITY_FILTER))
+        await asyncio.sleep(0.05)
+        self.assertEqual(order, [])
+
+        release.set()
+        await asyncio.gather(first, writer, filterer)
+        self.assertEqual(order, ["first", "filter", "writer"])
+
+    async def test_calls_wait_when_the_remaining_requests_run_low(self):
+        scheduler = LLMScheduler(min_remaining_requests=2)
+        scheduler.record_headers({"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "200ms"})
+
+        start = time.monotonic()
+        await scheduler.run(asyncio.sleep, 0)
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertEqual(scheduler.limits["remaining_requests"], 1)
+
+    @patch.dict('os.environ', {'OPENAI_API_KEY': 'test'})
+    async def test_openai_client_is_shared_until_closed(self):
+        client = get_openai_client()
+        self.assertIs(get_openai_client(), client)
+
+        await close_openai_client()
+        self.assertTrue(client.is_closed())
+        self.assertIsNot(get_openai_client(), client)
+        await close_openai_client()
+
+    def test_parse_reset(self):
+        self.assertEqual(parse_reset("20ms"), 0.02)
+        self.assertEqual(parse_reset("6m0s"), 360)
+        self.assertEqual(parse_reset("1h2m3.5s"), 3723.5)
+        self.assertIsNone(parse_reset(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
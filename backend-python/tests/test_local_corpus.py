@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from local_corpus import LocalCorpus, LocalCorpusSearch, match_expression
+from newsletter_creator import select_engines
+
+
+def openalex_work(work_id, title, abstract, date, venue="NeurIPS", cited_by=0, updated="2026-01-01T00:00:00", work_type="article", is_oa=False):
+    return {
+        "id": f"https://openalex.org/{work_id}",
+        "title": title,
+        "abstract_inverted_index": {word: [i] for i, word in enumerate(abstract.split())},
+        "publication_date": date,
+        "publication_year": int(date[:4]),
+        "doi": f"https://doi.org/10.1/{work_id.lower()}",
+        "type": work_type,
+        "cited_by_count": cited_by,
+        "open_access": {"is_oa": is_oa},
+        "primary_location": {"source": {"display_name": venue, "type": "conference"}},
+        "authorships": [{"author": {"id": "https://openalex.org/A1", "display_name": "Ada Lovelace"}}],
+        "updated_date": updated,
+    }
+
+
+class TestLocalCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.corpus = LocalCorpus(path=os.path.join(self.tmpdir.name, "corpus.sqlite3"))
+
+    def tearDown(self):
+        self.corpus._conn.close()
+        self.tmpdir.cleanup()
+
+    def write(self, name, records):
+        path = os.path.join(self.tmpdir.name, name)
+        with (gzip.open if name.endswith(".gz") else open)(path, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+        return path
+
+    def test_gzipped_dump_is_ingested_and_searched(self):
+        path = self.write("works.jsonl.gz", [
+            openalex_work("W1", "Planning with LLM agents", "agents plan tasks with language models", "2026-01-10", cited_by=12),
+            openalex_work("W2", "Protein folding at scale", "structure prediction of proteins", "2026-01-11"),
+            openalex_work("W3", "Tool use of LLM agents", "agents calling tools", "2025-06-01"),
+            "not json",
+            {"title": "No ID"},
+        ])
+
+        stats = self.corpus.ingest(path, "openalex", batch_size=2)
+
+        self.assertEqual(stats, {"stored": 3, "skipped": 0, "invalid": 1})
+        papers = self.corpus.search("LLM agents", "2026-01-01", 10)
+        self.assertEqual([p["paperId"] for p in papers], ["https://openalex.org/W1"])
+        paper = papers[0]
+        self.assertEqual(paper["abstract"], "agents plan tasks with language models")
+        self.assertEqual(paper["publicationVenue"], {"name": "NeurIPS"})
+        self.assertEqual(paper["externalIds"], {"DOI": "10.1/w1"})
+        self.assertEqual(paper["authors"], [{"name": "Ada Lovelace", "authorId": "https://openalex.org/A1"}])
+        self.assertEqual(paper["publicationTypes"], ["JournalArticle", "Conference"])
+
+    def test_filters(self):
+        self.corpus.upsert_many([
+            openalex_work("W1", "LLM agents", "a", "2026-01-10", venue="NeurIPS", cited_by=12, is_oa=True),
+            openalex_work("W2", "LLM agents survey", "b", "2026-01-11", venue="ICML", cited_by=2, work_type="review"),
+            openalex_work("W3", "LLM agents benchmark", "c", "2026-02-20", venue="neurips", cited_by=30),
+        ], "openalex")
+
+        def ids(**kwargs):
+            return sorted(p["paperId"][-2:] for p in self.corpus.search("agents", "2026-01-01", 10, **kwargs))
+
+        self.assertEqual(ids(end_date="2026-01-31"), ["W1", "W2"])
+        self.assertEqual(ids(filters={"venues": ["NeurIPS"]}), ["W1", "W3"])
+        self.assertEqual(ids(filters={"publicationTypes": ["Review"]}), ["W2"])
+        self.assertEqual(ids(filters={"minCitationCount": 10}), ["W1", "W3"])
+        self.assertEqual(ids(filters={"openAccessPdf": True}), ["W1"])
+
+    def test_deltas_update_and_delete_papers(self):
+        self.corpus.upsert_many([
+            openalex_work("W1", "LLM agents", "old abstract", "2026-01-10", updated="2026-01-05T00:00:00"),
+            openalex_work("W2", "LLM agents survey", "b", "2026-01-11"),
+        ], "openalex")
+
+        stats = self.corpus.ingest(self.write("delta.jsonl", [
+            openalex_work("W1", "Multi-agent LLM planning", "new abstract", "2026-01-10", updated="2026-01-06T00:00:00"),
+            openalex_work("W2", "Stale title", "b", "2026-01-11", updated="2025-12-01T00:00:00"),
+        ]), "openalex")
+        deleted = self.corpus.delete(self.write("deleted.jsonl", [{"id": "https://openalex.org/W2"}]), "openalex")
+
+        self.assertEqual((stats["stored"], stats["skipped"], deleted), (1, 1, 1))
+        self.assertEqual(len(self.corpus), 1)
+        # The full-text index follows the updates
+        self.assertEqual([p["title"] for p in self.corpus.search("planning", "2026-01-01", 10)], ["Multi-agent LLM planning"])
+        self.assertEqual(self.corpus.search("old", "2026-01-01", 10), [])
+
+    def test_semantic_scholar_abstracts_complete_the_papers(self):
+        self.corpus.upsert_many([
+            {"corpusid": 42, "title": "Sparse attention", "publicationdate": "2026-01-12", "venue": "ICLR",
+             "externalids": {"ArXiv": "2601.00001"}, "authors": [{"authorId": "1", "name": "Alan Turing"}],
+             "citationcount": 3, "publicationtypes": ["Conference"], "isopenaccess": True},
+            {"corpusid": 43, "abstract": "A paper whose metadata is not there yet"},
+        ], "semantic_scholar")
+        self.corpus.upsert_many([{"corpusid": 42, "abstract": "Transformers with linear attention"}], "semantic_scholar")
+
+        papers = self.corpus.search("linear transformers", "2026-01-01", 10)
+
+        self.assertEqual([p["paperId"] for p in papers], ["CorpusId:42"])
+        self.assertEqual(papers[0]["externalIds"], {"ArXiv": "2601.00001", "CorpusId": "42"})
+        self.assertEqual((papers[0]["citationCount"], papers[0]["isOpenAccess"]), (3, True))
+
+    def test_engine_pages_through_the_corpus(self):
+        self.corpus.upsert_many([openalex_work(f"W{i}", f"LLM agents {i}", "a", "2026-01-10") for i in range(7)], "openalex")
+        searcher = LocalCorpusSearch(self.corpus)
+
+        self.assertEqual(len(list(searcher.iter_search("agents", "2026-01-01", 5, page_size=2))), 5)
+        self.assertEqual(len({p["paperId"] for p in searcher.iter_search("agents", "2026-01-01", 10, page_size=3)}), 7)
+        self.assertEqual(searcher.search('"; DROP TABLE papers; --', "2026-01-01", 10), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(match_expression('LLM AND agents NEAR "tools" llm'), '"llm" OR "and" OR "agents" OR "near" OR "tools"')
+        self.assertEqual(match_expression("-- *"), "")
+
+    @patch('newsletter_creator.get_circuit_breaker')
+    def test_local_engine_is_selectable(self, get_breaker):
+        get_breaker.return_value.is_open.return_value = True
+        self.assertEqual(select_engines("local"), ["local"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+from paper_search import PaperSearch
+from newsletter_creator import NewsletterCreator
+from data_models import RelevanceOutput, BatchRelevanceOutput, PaperVerdict
+
+
+def make_engine(name, delay, papers):
+    class FakeEngine(PaperSearch):
+        def __init__(self, lean=False):
+            self.lean = lean
+
+        def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+            raise AssertionError("The creator must use the async search")
+
+        async def asearch(self, query, start_date, nb_papers, end_date=None, filters=None):
+            await asyncio.sleep(delay)
+            return [dict(p) for p in papers]
+
+    FakeEngine.name = name
+    return FakeEngine
+
+
+@patch('newsletter_creator.SEARCH_CACHE_ENABLED', False)
+class TestNewsletterCreatorSearch(unittest.IsolatedAsyncioTestCase):
+
+    async def test_all_mode_queries_engines_concurrently(self):
+        semantic = make_engine("semantic_scholar", 0.2, [{'title': 'Shared Paper'}, {'title': 'S2 Paper'}])
+        openalex = make_engine("openalex", 0.2, [{'title': 'shared paper!'}, {'title': 'OpenAlex Paper'}])
+
+        with patch('newsletter_creator.SemanticSearch', semantic), patch('newsletter_creator.OpenAlexSearch', openalex):
+            creator = NewsletterCreator()
+            start = time.monotonic()
+            papers = await creator.search('topic', '', '2026-01-01', queries=['q1', 'q2'], search_engine='all')
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual([p['title'] for p in papers], ['Shared Paper', 'S2 Paper', 'OpenAlex Paper'])
+
+    async def test_streams_stop_once_enough_candidates_are_found(self):
+        pages_pulled = []
+
+        class PagedEngine(PaperSearch):
+            name = "semantic_scholar"
+
+            def __init__(self, lean=False):
+                pass
+
+            def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+                raise AssertionError("The creator must use the async search")
+
+            async def aiter_search(self, query, start_date, nb_papers, end_date=None, filters=None, page_size=None):
+                for page in range(10):
+                    pages_pulled.append(page)
+                    for i in range(5):
+                        yield {'title': f'{query} paper {page}-{i}'}
+
+        with patch('newsletter_creator.SemanticSearch', PagedEngine):
+            papers = await NewsletterCreator().search('topic', '', '2026-01-01', queries=['q1'], max_papers=50, max_candidates=7)
+
+        self.assertEqual(len(papers), 7)
+        self.assertEqual(pages_pulled, [0, 1])
+
+    async def test_papers_already_published_are_dropped_before_counting_as_candidates(self):
+        semantic = make_engine("semantic_scholar", 0, [
+            {'paperId': 'S1', 'title': 'Published paper'},
+            {'paperId': 'S2', 'title': 'Published preprint', 'externalIds': {'ArXiv': '2301.00001'}},
+            {'paperId': 'S3', 'title': 'New paper'},
+        ])
+        api_client = MagicMock()
+        api_client.get_published_papers.return_value = {'paperIds': ['S1'], 'dois': ['10.48550/arxiv.2301.00001']}
+
+        with patch('newsletter_creator.SemanticSearch', semantic):
+            papers = await NewsletterCreator(api_client=api_client).search(
+                'topic', '', '2026-01-01', queries=['q1'], newsletter_id='N1', max_candidates=1)
+
+        api_client.get_published_papers.assert_called_once_with('N1')
+        self.assertEqual([p['paperId'] for p in papers], ['S3'])
+
+    async def test_enrich_papers_groups_lean_papers_by_source(self):
+        enriched = {}
+
+        def make_enricher(name):
+            class Enricher:
+                def __init__(self, lean=False):
+                    pass
+
+                async def aenrich(self, papers):
+                    enriched[name] = [p['title'] for p in papers]
+                    return papers
+            return Enricher
+
+        papers = [
+            {'title': 'S2 Paper', 'source': 'semantic_scholar'},
+            {'title': 'OpenAlex Paper', 'source': 'openalex'},
+            {'title': 'Full Paper'},
+        ]
+        with patch('newsletter_creator.SemanticSearch', make_enricher('semantic_scholar')), \
+                patch('newsletter_creator.OpenAlexSearch', make_enricher('openalex')):
+            result = await NewsletterCreator().enrich_papers(papers)
+
+        self.assertEqual(enriched, {'semantic_scholar': ['S2 Paper'], 'openalex': ['OpenAlex Paper']})
+        self.assertEqual([p['title'] for p in result], ['S2 Paper', 'OpenAlex Paper', 'Full Paper'])
+        self.assertFalse(any('source' in p for p in result))
+
+
+class TestJudgeRelevance(unittest.IsolatedAsyncioTestCase):
+
+    async def test_batch_mode_falls_back_to_single_calls_for_missing_verdicts(self):
+        creator = NewsletterCreator(relevance_batch_size=3, client=MagicMock())
+        single_calls = []
+
+        def parse(model, input, text_format):
+            if text_format is BatchRelevanceOutput:
+                # Paper 2 is missing and index 7 doesn't exist
+                return MagicMock(output_parsed=BatchRelevanceOutput(verdicts=[
+                    PaperVerdict(index=1, reasonning="", is_relevant="yes"),
+                    PaperVerdict(index=3, reasonning="", is_relevant="no"),
+                    PaperVerdict(index=7, reasonning="", is_relevant="yes"),
+                ]))
+            single_calls.append(input)
+            return MagicMock(output_parsed=RelevanceOutput(reasonning="", is_relevant="yes"))
+
+        creator.client.responses.parse = AsyncMock(side_effect=parse)
+        papers = [{'title': f'Paper {i}', 'abstract': 'abstract'} for i in range(1, 5)]
+
+        verdicts = await creator.judge_relevance('topic', papers)
+
+        # Batches are [1, 2, 3] and [4], only paper 2 is judged again on its own
+        self.assertEqual([v['is_relevant'] for v in verdicts], ['yes', 'yes', 'no', 'yes'])
+        self.assertEqual(len(single_calls), 1)
+        self.assertIn('Paper 2', single_calls[0])
+        self.assertEqual(creator.filter_stats, {"calls": 3, "fallbacks": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
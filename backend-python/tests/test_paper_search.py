@@ -1,6 +1,13 @@
+import json
 import unittest
+import httpx
 from unittest.mock import patch, MagicMock
-from paper_search import SemanticSearch
+import requests
+from paper_search import SemanticSearch, OpenAlexSearch, SearchError
+from circuit_breaker import CircuitBreaker
+from rate_limiter import TokenBucket
+from author_cache import AuthorCache
+from config import LEAN_FIELDS
 
 class TestSemanticSearch(unittest.TestCase):
 
@@ -26,5 +33,184 @@ class TestSemanticSearch(unittest.TestCase):
         papers = self.searcher.search('test', '2022-01-01', 10)
         self.assertEqual(papers, [])
 
+    @patch('paper_search.get_circuit_breaker', return_value=CircuitBreaker("test", enabled=False))
+    @patch('requests.get')
+    def test_failed_page_ends_the_search(self, mock_get, _):
+        first_page = MagicMock(status_code=200)
+        first_page.json.return_value = {'data': [{'title': 'A'}, {'title': 'B'}], 'next': 2}
+        mock_get.side_effect = [first_page, requests.ConnectionError("reset"), first_page, requests.ConnectionError("reset")]
+
+        searcher = SemanticSearch(rate_limiter=TokenBucket(rate=100, burst=10))
+        # The papers found before the failure are returned, and the stream tells the failure apart
+        self.assertEqual(searcher.search('test', '2022-01-01', 4), [{'title': 'A'}, {'title': 'B'}])
+        stream = searcher.iter_search('test', '2022-01-01', 4, page_size=2)
+        self.assertEqual([next(stream), next(stream)], [{'title': 'A'}, {'title': 'B'}])
+        with self.assertRaises(SearchError):
+            next(stream)
+
+class TestAsyncSearch(unittest.IsolatedAsyncioTestCase):
+
+    def mock_client(self, handler):
+        return patch('paper_search.get_async_http_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def test_semantic_asearch_success(self):
+        def handler(request):
+            self.assertEqual(request.url.params['query'], 'test')
+            return httpx.Response(200, json={'data': [{'title': 'Test Paper'}]})
+
+        with self.mock_client(handler):
+            papers = await SemanticSearch().asearch('test', '2022-01-01', 10)
+        self.assertEqual(papers, [{'title': 'Test Paper'}])
+
+    async def test_semantic_asearch_failure(self):
+        with self.mock_client(lambda request: httpx.Response(500)):
+            papers = await SemanticSearch().asearch('test', '2022-01-01', 10)
+        self.assertEqual(papers, [])
+
+    async def test_semantic_aiter_search_follows_next_offsets(self):
+        offsets = []
+
+        def handler(request):
+            offset = int(request.url.params['offset'])
+            offsets.append((offset, request.url.params['limit']))
+            return httpx.Response(200, json={'data': [{'title': f'Paper {offset}'}, {'title': f'Paper {offset + 1}'}], 'next': offset + 2})
+
+        with self.mock_client(handler):
+            papers = [p async for p in SemanticSearch().aiter_search('test', '2022-01-01', 5, page_size=2)]
+        self.assertEqual([p['title'] for p in papers], [f'Paper {i}' for i in range(5)])
+        self.assertEqual(offsets, [(0, '2'), (2, '2'), (4, '1')])
+
+    async def test_semantic_aiter_search_stops_pulling_pages(self):
+        requests_made = []
+
+        def handler(request):
+            requests_made.append(request)
+            return httpx.Response(200, json={'data': [{'title': 'A'}, {'title': 'B'}], 'next': 2})
+
+        with self.mock_client(handler):
+            stream = SemanticSearch().aiter_search('test', '2022-01-01', 100, page_size=2)
+            await stream.__anext__()
+            await stream.aclose()
+        self.assertEqual(len(requests_made), 1)
+
+    async def test_openalex_aiter_search_uses_cursor_paging(self):
+        cursors = []
+
+        def handler(request):
+            if request.url.path == '/authors':
+                return httpx.Response(200, json={'results': []})
+            cursor = request.url.params['cursor']
+            cursors.append(cursor)
+            next_cursor = 'page2' if cursor == '*' else None
+            return httpx.Response(200, json={'meta': {'next_cursor': next_cursor}, 'results': [{'id': f'W-{cursor}', 'title': f'Work {cursor}'}]})
+
+        with self.mock_client(handler):
+            papers = [p async for p in OpenAlexSearch(author_cache=AuthorCache()).aiter_search('test', '2022-01-01', 10, page_size=1)]
+        self.assertEqual([p['title'] for p in papers], ['Work *', 'Work page2'])
+        self.assertEqual(cursors, ['*', 'page2'])
+
+    async def test_semantic_aiter_search_from_starts_at_the_offset(self):
+        offsets = []
+
+        def handler(request):
+            offset = int(request.url.params['offset'])
+            offsets.append((offset, request.url.params['limit']))
+            return httpx.Response(200, json={'data': [{'title': f'Paper {offset}'}, {'title': f'Paper {offset + 1}'}], 'next': offset + 2})
+
+        with self.mock_client(handler):
+            papers = [p async for p in SemanticSearch().aiter_search_from('test', '2022-01-01', 6, 3, page_size=2)]
+        self.assertEqual([p['title'] for p in papers], ['Paper 3', 'Paper 4', 'Paper 5'])
+        self.assertEqual(offsets, [(3, '2'), (5, '1')])
+
+    async def test_openalex_aiter_search_from_numbers_its_pages(self):
+        pages = []
+
+        def handler(request):
+            if request.url.path == '/authors':
+                return httpx.Response(200, json={'results': []})
+            self.assertNotIn('cursor', request.url.params)
+            page, per_page = int(request.url.params['page']), int(request.url.params['per_page'])
+            pages.append(page)
+            start = (page - 1) * per_page
+            return httpx.Response(200, json={'meta': {}, 'results': [{'id': f'W{i}', 'title': f'Work {i}'} for i in range(start, start + per_page)]})
+
+        with self.mock_client(handler):
+            papers = [p async for p in OpenAlexSearch(author_cache=AuthorCache()).aiter_search_from('test', '2022-01-01', 5, 3, page_size=2)]
+        # Only the page holding the offset is fetched again
+        self.assertEqual([p['title'] for p in papers], ['Work 3', 'Work 4'])
+        self.assertEqual(pages, [2, 3])
+
+    async def test_openalex_asearch_fetches_h_indexes(self):
+        def handler(request):
+            if request.url.path == '/works':
+                return httpx.Response(200, json={'results': [{
+                    'id': 'W1', 'title': 'Test Paper', 'abstract_inverted_index': {'Hello': [0], 'world': [1]},
+                    'authorships': [{'author': {'id': 'https://openalex.org/A1', 'display_name': 'Ada'}}],
+                    'primary_location': {'source': {'display_name': 'Venue'}},
+                }]})
+            return httpx.Response(200, json={'results': [{'id': 'https://openalex.org/A1', 'summary_stats': {'h_index': 12}}]})
+
+        with self.mock_client(handler):
+            papers = await OpenAlexSearch(author_cache=AuthorCache()).asearch('test', '2022-01-01', 10)
+        self.assertEqual(papers[0]['abstract'], 'Hello world')
+        self.assertEqual(papers[0]['authors'][0]['hIndex'], 12)
+
+    async def test_semantic_lean_search_and_enrich(self):
+        def handler(request):
+            if request.url.path.endswith('/paper/search'):
+                self.assertEqual(request.url.params['fields'], LEAN_FIELDS)
+                return httpx.Response(200, json={'data': [{'paperId': 'P1', 'title': 'Kept'}, {'paperId': 'P2', 'title': 'Other'}]})
+            self.assertEqual(request.method, 'POST')
+            self.assertEqual(json.loads(request.content), {'ids': ['P1']})
+            return httpx.Response(200, json=[{'paperId': 'P1', 'authors': [{'name': 'Ada', 'hIndex': 30}], 'citationCount': 4}])
+
+        searcher = SemanticSearch(lean=True)
+        with self.mock_client(handler):
+            papers = await searcher.asearch('test', '2022-01-01', 10)
+            self.assertEqual(papers[0]['source'], 'semantic_scholar')
+            await searcher.aenrich(papers[:1])
+
+        self.assertEqual(papers[0]['authors'][0]['hIndex'], 30)
+        self.assertNotIn('authors', papers[1])
+        self.assertEqual(searcher.cache_namespace, 'semantic_scholar:lean')
+
+    async def test_openalex_enrich_fetches_authorships_and_h_indexes(self):
+        def handler(request):
+            if request.url.path == '/works':
+                self.assertEqual(request.url.params['filter'], 'openalex:W1')
+                return httpx.Response(200, json={'results': [{
+                    'id': 'https://openalex.org/W1', 'cited_by_count': 9,
+                    'authorships': [{'author': {'id': 'https://openalex.org/A1', 'display_name': 'Ada'}}],
+                }]})
+            return httpx.Response(200, json={'results': [{'id': 'https://openalex.org/A1', 'summary_stats': {'h_index': 12}}]})
+
+        papers = [{'paperId': 'https://openalex.org/W1', 'title': 'Kept', 'authors': [], 'citationCount': 0}]
+        with self.mock_client(handler):
+            await OpenAlexSearch(author_cache=AuthorCache(), lean=True).aenrich(papers)
+
+        self.assertEqual(papers[0]['authors'], [{'name': 'Ada', 'authorId': 'https://openalex.org/A1', 'hIndex': 12}])
+        self.assertEqual(papers[0]['citationCount'], 9)
+
+    async def test_openalex_only_fetches_uncached_authors(self):
+        cache = AuthorCache()
+        cache.set_many({f'https://openalex.org/A{i}': i for i in range(150)})
+        requested = []
+
+        def handler(request):
+            ids = request.url.params['filter'].removeprefix('openalex:').split('|')
+            requested.append(ids)
+            return httpx.Response(200, json={'results': [{'id': f'https://openalex.org/{aid}', 'summary_stats': {'h_index': 1}} for aid in ids]})
+
+        author_ids = [f'https://openalex.org/A{i}' for i in range(400)]
+        with self.mock_client(handler):
+            h_indexes = await OpenAlexSearch(author_cache=cache).afetch_author_h_indexes(author_ids)
+
+        self.assertEqual(len(h_indexes), 400)
+        self.assertEqual(h_indexes['https://openalex.org/A42'], 42)
+        self.assertEqual(sorted(len(ids) for ids in requested), [50, 100, 100])
+        self.assertNotIn('A42', [aid for ids in requested for aid in ids])
+        self.assertEqual(cache.stats['hits'], 150)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
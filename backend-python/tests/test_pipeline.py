@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from pipeline import StagedPipeline, Stage
+
+
+class TestStagedPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_all_items_go_through_all_stages(self):
+        seen = []
+
+        async def first(job):
+            job.data['first'] = True
+            return True
+
+        async def second(job):
+            seen.append(job.item)
+            job.outcome = {"outcome": "success"}
+            return False
+
+        pipeline = StagedPipeline([Stage("first", first, concurrency=2), Stage("second", second, concurrency=2)])
+        finished = await pipeline.run(range(10))
+
+        self.assertEqual(sorted(seen), list(range(10)))
+        self.assertEqual(len(finished), 10)
+        self.assertTrue(all(job.data['first'] for job in finished))
+
+    async def test_stages_overlap(self):
+        events = []
+
+        async def slow_search(job):
+            events.append(("search_start", job.item))
+            await asyncio.sleep(0.05)
+            events.append(("search_end", job.item))
+            return True
+
+        async def slow_llm(job):
+            events.append(("llm_start", job.item))
+            await asyncio.sleep(0.05)
+            events.append(("llm_end", job.item))
+            job.outcome = {"outcome": "success"}
+            return False
+
+        pipeline = StagedPipeline([Stage("search", slow_search), Stage("llm", slow_llm)])
+        await pipeline.run([0, 1])
+
+        # The search of item 1 starts before the LLM work of item 0 is over
+        self.assertLess(events.index(("search_start", 1)), events.index(("llm_end", 0)))
+
+    async def test_bounded_queue_applies_backpressure(self):
+        started = []
+        release = asyncio.Event()
+
+        async def fast(job):
+            started.append(job.item)
+            return True
+
+        async def blocked(job):
+            await release.wait()
+            job.outcome = {"outcome": "success"}
+            return False
+
+        pipeline = StagedPipeline([Stage("fast", fast), Stage("blocked", blocked)], queue_size=1)
+        task = asyncio.create_task(pipeline.run(range(20)))
+        await asyncio.sleep(0.05)
+        # 1 job in the blocked stage, 1 in its queue, 1 waiting to be handed over
+        self.assertLessEqual(len(started), 3)
+        release.set()
+        finished = await task
+        self.assertEqual(len(finished), 20)
+
+    async def test_should_stop_drops_cancellable_jobs(self):
+        stop = {"value": False}
+
+        async def check(job):
+            stop["value"] = True
+            return True
+
+        async def search(job):
+            job.outcome = {"outcome": "success"}
+            return False
+
+        pipeline = StagedPipeline(
+            [Stage("check", check), Stage("search", search, cancellable=True)],
+            should_stop=lambda: stop["value"],
+        )
+        finished = await pipeline.run(range(5))
+
+        self.assertTrue(all(job.outcome["outcome"] == "stopped" for job in finished))
+
+    async def test_handler_error_finishes_job_with_error(self):
+        async def failing(job):
+            raise RuntimeError("boom")
+
+        done = []
+        pipeline = StagedPipeline([Stage("failing", failing)], on_done=done.append)
+        await pipeline.run([1])
+
+        self.assertEqual(done[0].outcome["outcome"], "error")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from rate_limiter import TokenBucket, SQLiteTokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_is_served_immediately(self):
+        bucket = TokenBucket(rate=1, burst=3)
+
+        delays = [bucket.reserve() for _ in range(3)]
+
+        self.assertEqual(delays, [0.0, 0.0, 0.0])
+
+    def test_requests_beyond_burst_are_spaced_at_rate(self):
+        bucket = TokenBucket(rate=10, burst=1)
+
+        delays = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(delays[0], 0.0)
+        for expected, delay in zip([0.1, 0.2, 0.3], delays[1:]):
+            self.assertAlmostEqual(delay, expected, delta=0.01)
+
+    def test_try_acquire_does_not_wait(self):
+        bucket = TokenBucket(rate=1, burst=1)
+
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_available_does_not_take_tokens(self):
+        bucket = TokenBucket(rate=1, burst=2)
+
+        self.assertEqual(bucket.available(), 2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertAlmostEqual(bucket.available(), 1, delta=0.01)
+        self.assertAlmostEqual(bucket.available(), 1, delta=0.01)
+
+    def test_async_acquire_does_not_block_the_loop(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            start = time.monotonic()
+            await asyncio.gather(ticker(), *[bucket.acquire() for _ in range(3)])
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(main())
+
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertEqual(len(ticks), 5)
+
+
+class TestSQLiteTokenBucket(unittest.TestCase):
+
+    def test_buckets_sharing_a_database_share_the_limit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "rate_limits.sqlite3")
+            first = SQLiteTokenBucket("engine", rate=1, burst=2, path=path)
+            second = SQLiteTokenBucket("engine", rate=1, burst=2, path=path)
+
+            self.assertTrue(first.try_acquire())
+            self.assertTrue(second.try_acquire())
+            self.assertFalse(first.try_acquire())
+            self.assertGreater(second.reserve(), 0.9)
+            self.assertLess(first.available(), 0)
+
+    def test_different_engines_have_separate_buckets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "rate_limits.sqlite3")
+            first = SQLiteTokenBucket("semantic_scholar", rate=1, burst=1, path=path)
+            second = SQLiteTokenBucket("openalex", rate=1, burst=1, path=path)
+
+            self.assertTrue(first.try_acquire())
+            self.assertTrue(second.try_acquire())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+from data_models import RelevanceOutput
+from newsletter_creator import NewsletterCreator
+import numpy as np
+from relevance_cache import RelevanceCache, calibrate_floor, definition_key, paper_key
+
+
+class TestRelevanceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = RelevanceCache(path=os.path.join(self.tmpdir.name, "relevance.sqlite3"), ttl=60)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.tmpdir.cleanup()
+
+    def test_verdicts_are_scoped_to_the_definition(self):
+        first = definition_key('LLM agents', '', 'prompt v1', 'gpt-5-mini')
+        self.cache.set_many(first, {'id:P1': {'reasonning': '', 'is_relevant': 'yes'}})
+
+        self.assertEqual(self.cache.get_many(first, ['id:P1', 'id:P2']), {'id:P1': {'reasonning': '', 'is_relevant': 'yes'}})
+        for changed in [definition_key('LLM agents', 'tool use', 'prompt v1', 'gpt-5-mini'),
+                        definition_key('LLM agents', '', 'prompt v2', 'gpt-5-mini'),
+                        definition_key('LLM agents', '', 'prompt v1', 'gpt-5')]:
+            self.assertEqual(self.cache.get_many(changed, ['id:P1']), {})
+
+    def test_expired_verdicts_are_ignored(self):
+        with patch('relevance_cache.time.time', return_value=1000):
+            self.cache.set_many('definition', {'id:P1': {'reasonning': '', 'is_relevant': 'no'}})
+        with patch('relevance_cache.time.time', return_value=1061):
+            self.assertEqual(self.cache.get_many('definition', ['id:P1']), {})
+
+    def test_similarity_history_is_scoped_to_the_definition_and_model(self):
+        self.cache.record_similarities('definition', 'small', {'id:P1': (0.5, True), 'id:P2': (0.1, False)})
+        self.cache.record_similarities('other', 'small', {'id:P3': (0.9, True)})
+
+        self.assertEqual(sorted(self.cache.similarity_history('definition', 'small')), [(0.1, False), (0.5, True)])
+        self.assertEqual(self.cache.similarity_history('definition', 'large'), [])
+
+    def test_floor_keeps_the_requested_share_of_relevant_papers(self):
+        history = [(s / 100, True) for s in range(30, 80)] + [(0.05, False), (0.9, False)]
+
+        self.assertIsNone(calibrate_floor(history, recall=0.9, min_samples=100))
+        floor = calibrate_floor(history, recall=0.9, min_samples=10)
+        kept = [s for s, is_relevant in history if is_relevant and s >= floor]
+        self.assertGreaterEqual(len(kept) / 50, 0.9)
+        self.assertGreater(floor, 0.3)
+
+    def test_paper_key_falls_back_to_the_title(self):
+        self.assertEqual(paper_key({'paperId': 'P1', 'title': 'A'}), 'id:P1')
+        self.assertEqual(paper_key({'title': 'Deep  Learning!'}), 'title:deeplearning')
+
+
+class TestFilterPapers(unittest.IsolatedAsyncioTestCase):
+
+    async def test_only_cache_misses_go_to_the_model(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = RelevanceCache(path=os.path.join(tmpdir, "relevance.sqlite3"))
+            creator = NewsletterCreator(relevance_cache=cache, client=MagicMock())
+            judged = []
+
+            def parse(model, input, text_format):
+                judged.append(input)
+                is_relevant = "yes" if "Relevant" in input else "no"
+                return MagicMock(output_parsed=RelevanceOutput(reasonning="", is_relevant=is_relevant))
+
+            creator.client.responses.parse = AsyncMock(side_effect=parse)
+            papers = [
+                {'paperId': 'P1', 'title': 'Relevant paper', 'abstract': 'abstract'},
+                {'paperId': 'P2', 'title': 'Other paper', 'abstract': 'abstract'},
+                {'paperId': 'P3', 'title': 'No abstract', 'abstract': None},
+            ]
+
+            first = await creator.filter_papers('topic', papers)
+            second = await creator.filter_papers('topic', papers + [{'paperId': 'P4', 'title': 'Relevant too', 'abstract': 'abstract'}])
+            cache._conn.close()
+
+        self.assertEqual([p['paperId'] for p in first], ['P1'])
+        self.assertEqual([p['paperId'] for p in second], ['P1', 'P4'])
+        self.assertEqual(len(judged), 3)
+
+    async def test_prefilter_drops_papers_below_the_calibrated_floor(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = RelevanceCache(path=os.path.join(tmpdir, "relevance.sqlite3"))
+            creator = NewsletterCreator(relevance_cache=cache, client=MagicMock(), prefilter=True)
+            judged = []
+
+            def parse(model, input, text_format):
+                judged.append(input)
+                return MagicMock(output_parsed=RelevanceOutput(reasonning="", is_relevant="yes"))
+
+            creator.client.responses.parse = AsyncMock(side_effect=parse)
+            papers = [
+                {'paperId': 'P1', 'title': 'Close paper', 'abstract': 'abstract'},
+                {'paperId': 'P2', 'title': 'Far paper', 'abstract': 'abstract'},
+            ]
+            # Topic vector first, then one vector per paper
+            creator.embed = AsyncMock(return_value=np.array([[1, 0], [0.8, 0.6], [0.1, 0.995]]))
+            definition = definition_key('topic', '', creator._filter_prompt(), creator.model)
+
+            with patch('newsletter_creator.RELEVANCE_PREFILTER_MIN_SAMPLES', 3), patch('newsletter_creator.RELEVANCE_PREFILTER_EXPLORE_RATE', 0):
+                # Not calibrated yet: every paper is judged and its similarity recorded
+                first = await creator.filter_papers('topic', papers)
+                cache.clear()
+                cache.record_similarities(definition, creator.embedding_model, {f'id:H{i}': (0.7 + i / 100, True) for i in range(3)})
+                second = await creator.filter_papers('topic', papers)
+            history = cache.similarity_history(definition, creator.embedding_model)
+            cache._conn.close()
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual([p['paperId'] for p in second], ['P1'])
+        self.assertEqual(len(judged), 3)
+        self.assertEqual(creator.prefilter_stats, {'kept': 1, 'dropped': 1})
+        # The dropped paper has no verdict, so it isn't recorded in the calibration history
+        self.assertEqual(len(history), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+import requests
+from scheduler import DueScheduler, next_due_at
+from api_client import ApiClient
+from circuit_breaker import CircuitBreaker
+from pipeline import PipelineJob
+import worker
+
+DAY = 24 * 60 * 60
+
+
+def iso(days_ago):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+
+
+class TestDueScheduler(unittest.TestCase):
+
+    def test_due_time_comes_from_the_last_search_or_the_latest_issue(self):
+        last_search = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(next_due_at({"lastSearch": last_search.isoformat(), "frequency": "biweekly"}),
+                         last_search.timestamp() + 14 * DAY)
+        self.assertEqual(next_due_at({"lastIssueDate": "2026-01-01T00:00:00.000Z"}), last_search.timestamp() + 7 * DAY)
+        self.assertEqual(next_due_at({"lastSearch": None}), 0.0)
+
+    def test_due_newsletters_pop_earliest_first(self):
+        scheduler = DueScheduler()
+        scheduler.replace_all([
+            {"_id": "weekly", "status": "active", "lastSearch": iso(8)},
+            {"_id": "new", "status": "active"},
+            {"_id": "monthly", "status": "active", "frequency": "monthly", "lastSearch": iso(8)},
+            {"_id": "off", "status": "inactive"},
+        ])
+        now = datetime.now(timezone.utc).timestamp()
+
+        self.assertEqual(len(scheduler), 3)
+        self.assertEqual(scheduler.pop_due(now), ["new", "weekly"])
+        self.assertAlmostEqual(scheduler.next_due(), now + 22 * DAY, delta=5)
+
+    def test_updates_replace_the_previous_due_time(self):
+        scheduler = DueScheduler()
+        scheduler.update({"_id": "A", "status": "active"})
+        scheduler.update({"_id": "B", "status": "active", "lastSearch": iso(1)})
+        now = datetime.now(timezone.utc).timestamp()
+        # A was processed, B's frequency changed, then B is deactivated
+        scheduler.update({"_id": "A", "status": "active", "lastSearch": iso(0)})
+        scheduler.defer("B", now - 1)
+        self.assertEqual(scheduler.pop_due(now), ["B"])
+        scheduler.update({"_id": "B", "status": "inactive"})
+
+        self.assertEqual(len(scheduler), 1)
+        self.assertNotIn("B", scheduler)
+        self.assertAlmostEqual(scheduler.next_due(), now + 7 * DAY, delta=5)
+
+
+class TestSchedule(unittest.IsolatedAsyncioTestCase):
+
+    async def test_syncs_are_incremental_between_full_syncs(self):
+        api_client = MagicMock()
+        api_client.iter_newsletters.side_effect = [
+            iter([{"_id": "A", "status": "active", "lastSearch": iso(1)}, {"_id": "B", "status": "active", "lastSearch": iso(2)}]),
+            iter([{"_id": "B", "status": "inactive"}, {"_id": "C", "status": "active"}]),
+        ]
+        scheduler = DueScheduler()
+
+        await worker.sync_schedule(api_client, scheduler)
+        await worker.sync_schedule(api_client, scheduler)
+
+        full, incremental = api_client.iter_newsletters.call_args_list
+        self.assertEqual(full.kwargs, {"status": "active", "fields": worker.SCHEDULE_FIELDS})
+        self.assertIn("updated_since", incremental.kwargs)
+        self.assertNotIn("status", incremental.kwargs)
+        self.assertEqual(sorted(scheduler.due_times), ["A", "C"])
+
+    async def test_failed_full_sync_keeps_the_schedule(self):
+        def failing():
+            yield {"_id": "B", "status": "active"}
+            raise requests.exceptions.ConnectionError("down")
+
+        api_client = MagicMock()
+        api_client.iter_newsletters.side_effect = [iter([{"_id": "A", "status": "active"}]), failing()]
+        scheduler = DueScheduler()
+        await worker.sync_schedule(api_client, scheduler)
+
+        self.assertFalse(await worker.sync_schedule(api_client, scheduler, full=True))
+        self.assertEqual(list(scheduler.due_times), ["A"])
+        self.assertEqual(scheduler.pop_due(0), ["A"])
+
+    async def test_due_newsletters_are_streamed_in_the_scheduler_order(self):
+        pages = {
+            ("B", "A"): [{"_id": "A", "status": "active", "userId": "U"}, {"_id": "B", "status": "active", "userId": "U", "lastSearch": iso(9)}],
+            # C was processed by another worker in the meantime
+            ("D", "C"): [{"_id": "D", "status": "active", "userId": "U", "lastSearch": iso(8)}],
+        }
+        api_client = MagicMock()
+        api_client.iter_newsletter_pages.side_effect = lambda ids, **kwargs: iter([pages[tuple(ids)]])
+        cache = MagicMock()
+
+        with patch('worker.NEWSLETTER_PAGE_SIZE', 2):
+            streamed = [n["_id"] async for n in worker.stream_due_newsletters(api_client, ["B", "A", "D", "C"], 1000.0, cache)]
+
+        self.assertEqual(streamed, ["B", "A", "D"])
+        self.assertEqual([c.args[0] for c in cache.prefetch.call_args_list], list(pages.values()))
+        kwargs = api_client.iter_newsletter_pages.call_args.kwargs
+        self.assertEqual((kwargs["status"], kwargs["fields"]), ("active", worker.CYCLE_FIELDS))
+        self.assertEqual(datetime.fromisoformat(kwargs["due_before"]).timestamp(), 1000.0)
+
+    def test_newsletters_are_rescheduled_from_their_outcome(self):
+        scheduler = DueScheduler()
+        newsletters = [{"_id": name, "status": "active"} for name in ("done", "failed", "skipped", "paused", "elsewhere")]
+        scheduler.replace_all(newsletters)
+        now = datetime.now(timezone.utc).timestamp()
+        due = scheduler.pop_due(now)
+        self.assertEqual(len(due), 5)
+        jobs = [
+            PipelineJob(item=newsletters[0], outcome={"outcome": "success"}),
+            PipelineJob(item=newsletters[1], outcome={"outcome": "error"}),
+            PipelineJob(item=newsletters[2], data={"due_at": now + 3 * DAY}, outcome={"outcome": "skipped"}),
+            PipelineJob(item=newsletters[3], outcome={"outcome": "inactive"}),
+        ]
+
+        worker.reschedule(scheduler, due, jobs)
+
+        self.assertEqual(len(scheduler), 4)
+        self.assertEqual(scheduler.pop_due(now + 2 * 60 * 60), ["failed", "elsewhere"])
+        self.assertEqual(scheduler.pop_due(now + 3 * DAY), ["skipped"])
+        self.assertEqual(scheduler.pop_due(now + 7 * DAY + 60), ["done"])
+
+
+class TestNewsletterListing(unittest.TestCase):
+
+    def setUp(self):
+        self.api_client = ApiClient(base_url="http://test.com")
+        self.api_client._get_access_token = MagicMock(return_value="token")
+        self.api_client.session = MagicMock()
+        patcher = patch('api_client.get_circuit_breaker', return_value=CircuitBreaker("node_api"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pages_follow_the_cursor(self):
+        responses = [MagicMock(status_code=200), MagicMock(status_code=200)]
+        responses[0].json.return_value = {"newsletters": [{"_id": "A"}, {"_id": "B"}], "nextCursor": "B"}
+        responses[1].json.return_value = {"newsletters": [{"_id": "C"}], "nextCursor": None}
+        self.api_client.session.request.side_effect = responses
+
+        newsletters = list(self.api_client.iter_newsletters(status="active", fields=["topic", "status"], page_size=2))
+
+        self.assertEqual([n["_id"] for n in newsletters], ["A", "B", "C"])
+        first, second = [c.kwargs["params"] for c in self.api_client.session.request.call_args_list]
+        self.assertEqual(first, {"limit": 2, "status": "active", "fields": "topic,status"})
+        self.assertEqual(second["after"], "B")
+
+    def test_failed_page_raises(self):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"newsletters": [{"_id": "A"}], "nextCursor": "A"}
+        self.api_client.session.request.side_effect = [response, requests.exceptions.ConnectionError("down")]
+
+        self.api_client.deadline = 0.1
+        pages = self.api_client.iter_newsletter_pages(page_size=1)
+        self.assertEqual(next(pages), [{"_id": "A"}])
+        with self.assertRaises(requests.exceptions.RequestException):
+            next(pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
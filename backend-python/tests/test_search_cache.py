@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from paper_search import PaperSearch, SearchError
+from search_cache import SearchCache, CachedSearch
+
+
+class FakeSearch(PaperSearch):
+    name = "fake"
+
+    def __init__(self, results=None):
+        self.results = results if results is not None else [{'title': 'Test Paper'}]
+        self.calls = 0
+
+    def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+        self.calls += 1
+        return self.results
+
+
+class FailingSearch(FakeSearch):
+    """Yields its results, then fails on the next page."""
+
+    def iter_search(self, query, start_date, nb_papers, end_date=None, filters=None, page_size=None):
+        self.calls += 1
+        yield from self.results
+        raise SearchError("page failed")
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+        self.cache = SearchCache(path=self.path, ttls={"fake": 60})
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.tmpdir.cleanup()
+
+    def test_cached_results_are_replayed(self):
+        engine = FakeSearch()
+        searcher = CachedSearch(engine, self.cache)
+
+        first = searcher.search('test', '2026-01-01', 10)
+        second = searcher.search('TEST ', '2026-01-01', 10)
+
+        self.assertEqual(first, second)
+        self.assertEqual(engine.calls, 1)
+        self.assertTrue(searcher.is_cached('test', '2026-01-01', 10))
+
+    def test_cache_survives_restart(self):
+        CachedSearch(FakeSearch(), self.cache).search('test', '2026-01-01', 10)
+        self.cache._conn.close()
+
+        self.cache = SearchCache(path=self.path, ttls={"fake": 60})
+        engine = FakeSearch()
+        CachedSearch(engine, self.cache).search('test', '2026-01-01', 10)
+
+        self.assertEqual(engine.calls, 0)
+
+    def test_expired_entries_are_refetched(self):
+        engine = FakeSearch()
+        searcher = CachedSearch(engine, self.cache)
+        searcher.search('test', '2026-01-01', 10)
+
+        with patch('search_cache.time.time', return_value=10 ** 12):
+            searcher.search('test', '2026-01-01', 10)
+
+        self.assertEqual(engine.calls, 2)
+
+    def test_empty_results_are_not_cached(self):
+        engine = FakeSearch(results=[])
+        searcher = CachedSearch(engine, self.cache)
+
+        searcher.search('test', '2026-01-01', 10)
+        searcher.search('test', '2026-01-01', 10)
+
+        self.assertEqual(engine.calls, 2)
+
+    def test_only_drained_streams_are_cached(self):
+        engine = FakeSearch(results=[{'title': 'Paper 1'}, {'title': 'Paper 2'}])
+        searcher = CachedSearch(engine, self.cache)
+
+        stream = searcher.iter_search('test', '2026-01-01', 10)
+        next(stream)
+        stream.close()
+        self.assertFalse(searcher.is_cached('test', '2026-01-01', 10))
+
+        streamed = list(searcher.iter_search('test', '2026-01-01', 10))
+        self.assertEqual(searcher.search('test', '2026-01-01', 10), streamed)
+        self.assertEqual(engine.calls, 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        searcher = CachedSearch(FakeSearch(results=[{'title': 'x' * 2000, 'abstract': os.urandom(512).hex()}]), self.cache)
+        searcher.search('first', '2026-01-01', 10)
+        entry_size = self.cache._conn.execute("SELECT size FROM search_cache").fetchone()[0]
+        self.cache.max_bytes = 2 * entry_size
+
+        searcher.search('second', '2026-01-01', 10)
+        searcher.search('first', '2026-01-01', 10)  # refresh 'first'
+        searcher.search('third', '2026-01-01', 10)
+
+        self.assertTrue(searcher.is_cached('first', '2026-01-01', 10))
+        self.assertFalse(searcher.is_cached('second', '2026-01-01', 10))
+        self.assertEqual(self.cache.stats["evictions"], 1)
+
+
+    def test_results_cut_short_by_a_failed_page_are_not_cached(self):
+        engine = FailingSearch()
+        searcher = CachedSearch(engine, self.cache)
+
+        self.assertEqual(searcher.search('test', '2026-01-01', 10), [{'title': 'Test Paper'}])
+        self.assertEqual(searcher.search('test', '2026-01-01', 10), [{'title': 'Test Paper'}])
+        with self.assertRaises(SearchError):
+            list(searcher.iter_search('test', '2026-01-01', 10))
+
+        self.assertEqual(engine.calls, 3)
+        self.assertFalse(searcher.is_cached('test', '2026-01-01', 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import threading
+import time
+import unittest
+from paper_search import PaperSearch
+from search_coalescer import SearchCoalescer
+
+
+class FakeSearch(PaperSearch):
+    name = "fake"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [{'title': f'{query} paper'}]
+
+
+class PagedSearch(PaperSearch):
+    name = "paged"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pages = 0
+
+    def search(self, query, start_date, nb_papers, end_date=None, filters=None):
+        return self._collect(query, start_date, nb_papers, end_date=end_date, filters=filters)
+
+    def iter_search(self, query, start_date, nb_papers, end_date=None, filters=None, page_size=None):
+        return self.iter_search_from(query, start_date, nb_papers, 0)
+
+    def iter_search_from(self, query, start_date, nb_papers, offset, end_date=None, filters=None, page_size=None):
+        for start in range(offset, nb_papers, 2):
+            self.pages += 1
+            time.sleep(self.delay)
+            yield from [{'paperId': f'P{i}'} for i in range(start, min(start + 2, nb_papers))]
+
+
+class TestSearchCoalescer(unittest.TestCase):
+
+    def test_completed_results_are_memoized(self):
+        engine = FakeSearch()
+        searcher = SearchCoalescer().wrap(engine)
+
+        first = searcher.search('LLM agents', '2026-01-01', 10)
+        second = searcher.search('  llm   AGENTS ', '2026-01-01', 10)
+
+        self.assertEqual(first, second)
+        self.assertEqual(engine.calls, 1)
+        self.assertEqual(searcher.coalescer.stats, {"hits": 1, "misses": 1, "coalesced": 0})
+
+    def test_different_parameters_are_not_shared(self):
+        engine = FakeSearch()
+        searcher = SearchCoalescer().wrap(engine)
+
+        searcher.search('LLM agents', '2026-01-01', 10)
+        searcher.search('LLM agents', '2026-01-08', 10)
+        searcher.search('LLM agents', '2026-01-01', 10, filters={'venues': ['NeurIPS']})
+
+        self.assertEqual(engine.calls, 3)
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        engine = FakeSearch(delay=0.1)
+        searcher = SearchCoalescer().wrap(engine)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(searcher.search('q', '2026-01-01', 10))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(engine.calls, 1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(searcher.coalescer.stats["coalesced"], 4)
+
+    def test_drained_streams_are_memoized(self):
+        engine = FakeSearch()
+        searcher = SearchCoalescer().wrap(engine)
+
+        streamed = list(searcher.iter_search('LLM agents', '2026-01-01', 10))
+
+        self.assertEqual(searcher.search('LLM agents', '2026-01-01', 10), streamed)
+        self.assertEqual(engine.calls, 1)
+
+    def test_abandoned_streams_are_not_memoized(self):
+        engine = FakeSearch()
+        searcher = SearchCoalescer().wrap(engine)
+
+        stream = searcher.iter_search('LLM agents', '2026-01-01', 10)
+        next(stream)
+        stream.close()
+
+        self.assertFalse(searcher.is_cached('LLM agents', '2026-01-01', 10))
+        searcher.search('LLM agents', '2026-01-01', 10)
+        self.assertEqual(engine.calls, 2)
+
+    def test_streams_continue_from_the_papers_of_an_abandoned_stream(self):
+        engine = PagedSearch()
+        searcher = SearchCoalescer().wrap(engine)
+
+        stream = searcher.iter_search('q', '2026-01-01', 6)
+        self.assertEqual([next(stream)['paperId'] for _ in range(3)], ['P0', 'P1', 'P2'])
+        stream.close()
+        # The papers already fetched are served without searching again
+        stream = searcher.iter_search('q', '2026-01-01', 6)
+        self.assertEqual([next(stream)['paperId'] for _ in range(3)], ['P0', 'P1', 'P2'])
+        stream.close()
+        self.assertEqual(engine.pages, 2)
+
+        self.assertEqual([p['paperId'] for p in searcher.search('q', '2026-01-01', 6)], ['P0', 'P1', 'P2', 'P3', 'P4', 'P5'])
+        self.assertTrue(searcher.is_cached('q', '2026-01-01', 6))
+        # The search went on from the offset after the papers already fetched
+        self.assertEqual(engine.pages, 4)
+
+    def test_waiters_take_over_from_an_abandoned_owner(self):
+        engine = PagedSearch(delay=0.05)
+        searcher = SearchCoalescer().wrap(engine)
+        owner_started = threading.Event()
+        results = []
+
+        def owner():
+            stream = searcher.iter_search('q', '2026-01-01', 6)
+            next(stream), next(stream)
+            owner_started.set()
+            time.sleep(0.1)
+            stream.close()
+
+        threads = [threading.Thread(target=owner)]
+        threads[0].start()
+        owner_started.wait()
+        threads += [threading.Thread(target=lambda: results.append(searcher.search('q', '2026-01-01', 6))) for _ in range(3)]
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([[p['paperId'] for p in r] for r in results], [['P0', 'P1', 'P2', 'P3', 'P4', 'P5']] * 3)
+        # One waiter finished the search from the offset the owner stopped at, the others got its results
+        self.assertEqual(engine.pages, 1 + 2)
+
+    def test_returned_papers_are_copies(self):
+        searcher = SearchCoalescer().wrap(FakeSearch())
+
+        searcher.search('q', '2026-01-01', 10)[0]['score'] = 42
+
+        self.assertNotIn('score', searcher.search('q', '2026-01-01', 10)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,13 +6,28 @@ from send_email import send_email
 import asyncio
 import logging
 from newsletter_creator import NewsletterCreator
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import time
 import requests
 import hmac
 import hashlib
 import markdown as md_lib
 from worker_state import worker_state
+from pipeline import StagedPipeline, Stage
+from search_coalescer import SearchCoalescer
+from hedged_search import SearchHedger
+from author_cache import get_author_cache
+from dedup import paper_doi
+from checkpoint_store import get_checkpoint_store, idempotency_key
+from llm_batch import BatchCollector, LocalBatchBackend
+from leases import ShardCoordinator, get_lease_backend
+from scheduler import DueScheduler, get_frequency_days, next_due_at
+from cycle_cache import CycleCache
+from deadline import DeadlineExceeded, budget
+from config import WORKER_CONCURRENCY, WORKER_QUEUE_SIZE, SEARCH_MAX_PAPERS_PER_QUERY, SEARCH_MAX_CANDIDATES, \
+    LLM_BATCH_MODE, LLM_BATCH_BACKEND, LLM_BATCH_MAX_NEWSLETTERS, CHECKPOINT_ENABLED, WORKER_SHARDING, WORKER_LEASE_BACKEND, \
+    SCHEDULER_SYNC_SECONDS, SCHEDULER_FULL_SYNC_SECONDS, SCHEDULER_RETRY_SECONDS, NEWSLETTER_BUDGET_SECONDS, \
+    SEARCH_HEDGING_ENABLED, NEWSLETTER_PAGE_SIZE
 
 URL_SIGNATURE_SECRET = os.getenv('URL_SIGNATURE_SECRET')
 
@@ -22,7 +37,11 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def create_issue_and_papers(api_client, newsletter, newsletter_data, papers):
+def create_issue_and_papers(api_client, newsletter, newsletter_data, papers, idempotency_key=None):
+    """
+    Creates the issue and its papers. With an `idempotency_key`, a retried or resumed call returns
+    the issue created by the first one, and papers already stored for the issue are not added twice.
+    """
     issue_to_create = {
         "title": newsletter_data['title'],
         "publicationDate": datetime.now().isoformat(),
@@ -31,6 +50,8 @@ def create_issue_and_papers(api_client, newsletter, newsletter_data, papers):
         "conclusion": newsletter_data['conclusion'],
         "contentMarkdown": newsletter_data['content_markdown'],
     }
+    if idempotency_key:
+        issue_to_create["idempotencyKey"] = idempotency_key
 
     created_issue = api_client.create_issue(newsletter['_id'], issue_to_create)
     if not created_issue:
@@ -44,6 +65,10 @@ def create_issue_and_papers(api_client, newsletter, newsletter_data, papers):
     for p in papers:
         paper_data = p['paper']
         analysis_data = p['analysis']
+        # The backend keys papers by (issueId, paperId)
+        if not paper_data.get('paperId'):
+            logging.warning(f"Skipping paper without ID: {paper_data.get('title', 'N/A')}")
+            continue
 
         # Extract author names
         author_names = [author['name']
@@ -51,6 +76,7 @@ def create_issue_and_papers(api_client, newsletter, newsletter_data, papers):
 
         papers_to_create.append({
             'paperId': paper_data.get('paperId'),
+            'doi': paper_doi(paper_data),
             'title': paper_data.get('title'),
             'authors': author_names,
             'publicationDate': paper_data.get('publicationDate'),
@@ -67,8 +93,8 @@ def create_issue_and_papers(api_client, newsletter, newsletter_data, papers):
     return created_issue
 
 
-async def check_newsletter_inactivity(api_client, newsletter):
-    """Warn or disable a newsletter based on consecutive unread issues."""
+async def check_newsletter_inactivity(api_client, newsletter, cache=None):
+    """Warn or disable a newsletter based on consecutive unread issues. Users and counts come from `cache` (a CycleCache) when given."""
     newsletter_id = newsletter['_id']
     user_id = newsletter.get('userId')
     topic = newsletter.get('topic', 'N/A')
@@ -76,7 +102,10 @@ async def check_newsletter_inactivity(api_client, newsletter):
     if not user_id:
         return
 
-    unread_count = api_client.get_consecutive_unread_count(newsletter_id, user_id)
+    if cache:
+        unread_count = await asyncio.to_thread(cache.unread_count, newsletter)
+    else:
+        unread_count = await asyncio.to_thread(api_client.get_consecutive_unread_count, newsletter_id, user_id)
     if unread_count is None:
         return
 
@@ -84,16 +113,14 @@ async def check_newsletter_inactivity(api_client, newsletter):
 
     # Re-engagement: user read something after a warning was sent
     if unread_count < 4 and warning_sent:
-        api_client.update_newsletter(newsletter_id, {'inactivityWarningSentAt': None})
+        await asyncio.to_thread(api_client.update_newsletter, newsletter_id, {'inactivityWarningSentAt': None})
         return
 
-    user_info = api_client.get_user_info(user_id)
-    user_email = user_info.get('email') if user_info else None
-    user_name = user_info.get('name', 'user') if user_info else 'user'
+    user_email, user_name = await asyncio.to_thread(get_user_contact, api_client, user_id, cache)
 
     if unread_count >= 5:
         logging.info(f"Disabling newsletter '{topic}' due to 5 consecutive unread issues.")
-        api_client.update_newsletter(newsletter_id, {'status': 'inactive', 'inactivityWarningSentAt': None})
+        await asyncio.to_thread(api_client.update_newsletter, newsletter_id, {'status': 'inactive', 'inactivityWarningSentAt': None})
         if user_email:
             newsletter_id_str = str(newsletter_id)
             user_id_str = str(user_id)
@@ -125,11 +152,11 @@ async def check_newsletter_inactivity(api_client, newsletter):
                     <p>Best regards,<br>The My Research Digest Team</p>
                 </div>
             """
-            send_email(subject, body, user_email, is_html=True)
+            await asyncio.to_thread(send_email, subject, body, user_email, is_html=True)
 
     elif unread_count == 4 and not warning_sent:
         logging.info(f"Sending inactivity warning for newsletter '{topic}'.")
-        api_client.update_newsletter(newsletter_id, {'inactivityWarningSentAt': datetime.now().isoformat()})
+        await asyncio.to_thread(api_client.update_newsletter, newsletter_id, {'inactivityWarningSentAt': datetime.now().isoformat()})
         if user_email:
             subject = f"Your newsletter on \"{topic}\" will be paused soon"
             body = f"""
@@ -141,29 +168,24 @@ async def check_newsletter_inactivity(api_client, newsletter):
                     <p>Best regards,<br>The My Research Digest Team</p>
                 </div>
             """
-            send_email(subject, body, user_email, is_html=True)
+            await asyncio.to_thread(send_email, subject, body, user_email, is_html=True)
 
 
-async def process_newsletter(api_client, newsletter, state=None):
+def is_newsletter_due(api_client, newsletter, cache=None):
+    """Returns False if the newsletter was processed within its frequency window."""
     topic = newsletter.get('topic', 'N/A')
-    logging.info(f"Processing newsletter: {topic}")
-
-    if state:
-        state.current_step = "checking"
-
-    if newsletter.get('status') == 'inactive':
-        logging.info(f"Newsletter '{topic}' is inactive. Skipping.")
-        return {"outcome": "inactive", "papers_found": 0, "issue_id": None}
-
-    frequency_days = {'weekly': 7, 'biweekly': 14, 'monthly': 30}.get(newsletter.get('frequency', 'weekly'), 7)
+    frequency_days = get_frequency_days(newsletter)
 
     last_search = newsletter.get('lastSearch')
 
     # If lastSearch is missing, try to get the date from the latest issue
     if not last_search:
-        latest_issue = api_client.get_latest_issue(newsletter['_id'])
-        if latest_issue:
-            last_search = latest_issue.get('publicationDate') or latest_issue.get('createdAt')
+        if cache:
+            last_search = cache.latest_issue_date(newsletter)
+        else:
+            latest_issue = api_client.get_latest_issue(newsletter['_id'])
+            last_search = (latest_issue.get('publicationDate') or latest_issue.get('createdAt')) if latest_issue else None
+        if last_search:
             logging.info(f"Using latest issue date as last search date: {last_search}")
         else:
             logging.info(f"No previous search or issues found for newsletter '{topic}'. Proceeding to search.")
@@ -176,22 +198,26 @@ async def process_newsletter(api_client, newsletter, state=None):
             if datetime.now(last_search_date.tzinfo) - last_search_date < timedelta(days=frequency_days):
                 logging.info(
                     f"Newsletter '{topic}' was processed recently (based on last search or latest issue). Skipping.")
-                return {"outcome": "skipped", "papers_found": 0, "issue_id": None}
+                return False
         except (ValueError, TypeError) as e:
             logging.error(f"Error parsing date '{last_search}' for newsletter {topic}: {e}")
             # If date is unparseable, we continue processing to be safe
 
-    logging.info(f"Searching for new papers for newsletter '{topic}'...")
+    return True
 
-    if state:
-        state.current_step = "searching"
 
+def get_search_window(newsletter):
+    """Returns the (start_date, end_date) search window for a newsletter, as YYYY-MM-DD strings."""
     now = datetime.now()
-    start_date = (now - timedelta(days=frequency_days)).strftime("%Y-%m-%d")
+    start_date = (now - timedelta(days=get_frequency_days(newsletter))).strftime("%Y-%m-%d")
     end_date = now.strftime("%Y-%m-%d")
+    return start_date, end_date
 
-    # Get user info for emails
-    user_id = newsletter.get('userId')
+
+def get_user_contact(api_client, user_id, cache=None):
+    """Returns the (email, name) of a user, used to send emails."""
+    if cache:
+        return cache.user_contact(user_id)
     user_email = None
     user_name = 'user'
     if user_id:
@@ -199,262 +225,602 @@ async def process_newsletter(api_client, newsletter, state=None):
         if user_info:
             user_email = user_info.get('email')
             user_name = user_info.get('name', 'user')
+    return user_email, user_name
 
-    queries = newsletter.get('queries', [])
-    ranking_strategy = newsletter.get('rankingStrategy', 'author_based')
-    filters = newsletter.get('filters', {})
+
+def get_creation_params(newsletter):
+    """Returns the keyword arguments given to NewsletterCreator for a newsletter."""
     issue_format = newsletter.get('issueFormat', 'classic')
-    nb_papers = 10 if issue_format == 'state_of_the_art' else 5
-
-    result = await NewsletterCreator(api_client=api_client).create_newsletter(
-        newsletter['topic'],
-        start_date,
-        description=newsletter.get('description', ""),
-        end_date=end_date,
-        nb_papers=nb_papers,
-        queries=queries,
-        ranking_strategy=ranking_strategy,
-        filters=filters,
-        newsletter_id=newsletter['_id'],
-        issue_format=issue_format,
-    )
+    return {
+        'description': newsletter.get('description', ""),
+        'nb_papers': 10 if issue_format == 'state_of_the_art' else 5,
+        'queries': newsletter.get('queries', []),
+        'ranking_strategy': newsletter.get('rankingStrategy', 'author_based'),
+        'filters': newsletter.get('filters', {}),
+        'issue_format': issue_format,
+        'search_engine': newsletter.get('searchEngine', 'semantic_scholar'),
+        'max_papers': SEARCH_MAX_PAPERS_PER_QUERY,
+        'max_candidates': SEARCH_MAX_CANDIDATES or None,
+    }
 
-    # Update lastSearch date
-    api_client.update_newsletter(
-        newsletter['_id'], {'lastSearch': datetime.now().isoformat()})
 
-    if not result or len(result.get('papers', [])) == 0:
-        logging.warning(f"No papers found for topic '{topic}'.")
-        if user_email:
-            subject = f"Update: No new papers for {newsletter.get('topic')}"
-            body = f"""
-                <p>Dear {user_name},</p>
-                <p>We searched for new research papers for your newsletter on <strong>{newsletter.get('topic')}</strong>, but didn't find any new relevant publications in the past week.</p>
-                <p>This can happen if the topic is very specific or if there hasn't been much new research in that niche recently.</p>
+def send_no_papers_email(newsletter, user_email, user_name):
+    subject = f"Update: No new papers for {newsletter.get('topic')}"
+    body = f"""
+        <p>Dear {user_name},</p>
+        <p>We searched for new research papers for your newsletter on <strong>{newsletter.get('topic')}</strong>, but didn't find any new relevant publications in the past week.</p>
+        <p>This can happen if the topic is very specific or if there hasn't been much new research in that niche recently.</p>
 
-                <p><strong>What you can try:</strong></p>
-                <ul>
-                    <li>Consider creating a new newsletter with a broader topic to capture more results.</li>
-                    <li>No action is needed if you'd like to wait. We'll continue to search for you weekly!</li>
-                </ul>
+        <p><strong>What you can try:</strong></p>
+        <ul>
+            <li>Consider creating a new newsletter with a broader topic to capture more results.</li>
+            <li>No action is needed if you'd like to wait. We'll continue to search for you weekly!</li>
+        </ul>
 
-                <p>You can create a new newsletter from your dashboard:</p>
-                <p><a href="{os.getenv('APP_DOMAIN')}">Go to Dashboard</a></p>
+        <p>You can create a new newsletter from your dashboard:</p>
+        <p><a href="{os.getenv('APP_DOMAIN')}">Go to Dashboard</a></p>
 
-                <p>Best regards,</p>
-                <p>The My Research Digest Team</p>
-            """
-            send_email(subject, body, user_email, is_html=True)
-        return {"outcome": "no_papers", "papers_found": 0, "issue_id": None}
+        <p>Best regards,</p>
+        <p>The My Research Digest Team</p>
+    """
+    send_email(subject, body, user_email, is_html=True)
 
-    newsletter_data = result['newsletter']
-    papers = result['papers']
 
-    logging.info(f"Creating a new issue for newsletter '{topic}'...")
-    if state:
-        state.current_step = "persisting"
-    created_issue = create_issue_and_papers(
-        api_client, newsletter, newsletter_data, papers)
+def send_issue_email(newsletter, newsletter_data, created_issue, papers, user_id, user_email, user_name):
+    subject = f"New Issue Available: {newsletter.get('topic')} - {created_issue.get('title')}"
+    issue_link = f"{os.getenv('APP_DOMAIN')}/issues/{created_issue['_id']}"
 
-    if not created_issue:
-        return {"outcome": "error", "papers_found": len(papers), "issue_id": None}
-
-    # Send email to the newsletter creator with full content
-    if state:
-        state.current_step = "emailing"
-    if user_email:
-        subject = f"New Issue Available: {newsletter.get('topic')} - {created_issue.get('title')}"
-        issue_link = f"{os.getenv('APP_DOMAIN')}/issues/{created_issue['_id']}"
-        
-        # Generate signed URL for "Mark as Read"
-        issue_id_str = str(created_issue['_id'])
-        user_id_str = str(user_id)
-        
-        if not URL_SIGNATURE_SECRET:
-            logging.error("URL_SIGNATURE_SECRET environment variable not set. Cannot generate signed URLs.")
-            mark_as_read_section = ""
-            feedback_section = ""
-        else:
-            data_to_sign = f"{issue_id_str}{user_id_str}"
-            signature = hmac.new(
-                URL_SIGNATURE_SECRET.encode('utf-8'),
-                data_to_sign.encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
-
-            mark_as_read_link = f"{os.getenv('APP_DOMAIN')}/api/public/issues/{issue_id_str}/mark-as-read?userId={user_id_str}&signature={signature}"
-            mark_as_read_section = f"""
-                <p style="text-align: center; margin-top: 20px;">
-                    <a href="{mark_as_read_link}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px; font-weight: bold;">
-                        Mark as Read (helps us track active issues)
-                    </a>
-                </p>
-            """
+    # Generate signed URL for "Mark as Read"
+    issue_id_str = str(created_issue['_id'])
+    user_id_str = str(user_id)
 
-            sig_useful = hmac.new(
-                URL_SIGNATURE_SECRET.encode('utf-8'),
-                f"{issue_id_str}{user_id_str}useful".encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
-            sig_not_useful = hmac.new(
-                URL_SIGNATURE_SECRET.encode('utf-8'),
-                f"{issue_id_str}{user_id_str}not_useful".encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
-
-            base = f"{os.getenv('APP_DOMAIN')}/api/public/issues/{issue_id_str}/feedback?userId={user_id_str}"
-            feedback_section = f"""
-                <div style="text-align: center; margin-top: 24px; border-top: 1px solid #eee; padding-top: 20px;">
-                    <p style="margin-bottom: 12px; color: #555; font-size: 0.95em;">Was this issue useful?</p>
-                    <a href="{base}&rating=useful&signature={sig_useful}" style="background-color: #4f46e5; color: white; padding: 10px 22px; text-decoration: none; border-radius: 5px; font-weight: bold; margin-right: 10px;">
-                        Yes, it was
-                    </a>
-                    <a href="{base}&rating=not_useful&signature={sig_not_useful}" style="background-color: #e5e7eb; color: #374151; padding: 10px 22px; text-decoration: none; border-radius: 5px; font-weight: bold;">
-                        Not really
-                    </a>
+    if not URL_SIGNATURE_SECRET:
+        logging.error("URL_SIGNATURE_SECRET environment variable not set. Cannot generate signed URLs.")
+        mark_as_read_section = ""
+        feedback_section = ""
+    else:
+        data_to_sign = f"{issue_id_str}{user_id_str}"
+        signature = hmac.new(
+            URL_SIGNATURE_SECRET.encode('utf-8'),
+            data_to_sign.encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+
+        mark_as_read_link = f"{os.getenv('APP_DOMAIN')}/api/public/issues/{issue_id_str}/mark-as-read?userId={user_id_str}&signature={signature}"
+        mark_as_read_section = f"""
+            <p style="text-align: center; margin-top: 20px;">
+                <a href="{mark_as_read_link}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px; font-weight: bold;">
+                    Mark as Read (helps us track active issues)
+                </a>
+            </p>
+        """
+
+        sig_useful = hmac.new(
+            URL_SIGNATURE_SECRET.encode('utf-8'),
+            f"{issue_id_str}{user_id_str}useful".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        sig_not_useful = hmac.new(
+            URL_SIGNATURE_SECRET.encode('utf-8'),
+            f"{issue_id_str}{user_id_str}not_useful".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+
+        base = f"{os.getenv('APP_DOMAIN')}/api/public/issues/{issue_id_str}/feedback?userId={user_id_str}"
+        feedback_section = f"""
+            <div style="text-align: center; margin-top: 24px; border-top: 1px solid #eee; padding-top: 20px;">
+                <p style="margin-bottom: 12px; color: #555; font-size: 0.95em;">Was this issue useful?</p>
+                <a href="{base}&rating=useful&signature={sig_useful}" style="background-color: #4f46e5; color: white; padding: 10px 22px; text-decoration: none; border-radius: 5px; font-weight: bold; margin-right: 10px;">
+                    Yes, it was
+                </a>
+                <a href="{base}&rating=not_useful&signature={sig_not_useful}" style="background-color: #e5e7eb; color: #374151; padding: 10px 22px; text-decoration: none; border-radius: 5px; font-weight: bold;">
+                    Not really
+                </a>
+            </div>
+        """
+
+    # Construct the full issue body in HTML
+    if newsletter_data.get('is_sota'):
+        content_html = md_lib.markdown(created_issue.get('contentMarkdown', ''), extensions=['extra'])
+        body = f"""
+            <p>Dear {user_name},</p>
+            <p>Your latest research digest on <strong>{newsletter.get('topic')}</strong> is ready.</p>
+            <hr>
+            <h1>{created_issue.get('title')}</h1>
+            <div style="line-height:1.8">{content_html}</div>
+            <hr>
+            <p>View the full issue on your dashboard: <a href="{issue_link}">{issue_link}</a></p>
+            {mark_as_read_section}
+            {feedback_section}
+            <p>Best regards,<br>The My Research Digest Team</p>
+        """
+    else:
+        papers_html = ""
+        for i, p in enumerate(papers):
+            paper_data = p['paper']
+            analysis = p['analysis']
+            authors = ", ".join([author.get('name', 'N/A') for author in paper_data.get('authors', [])])
+            venue = (paper_data.get('publicationVenue') or {}).get('name')
+            author_line = f"by {authors}"
+            if venue:
+                author_line += f" ({venue})"
+
+            papers_html += f"""
+                <div style="border: 1px solid #eee; padding: 15px; margin-bottom: 20px; border-radius: 5px;">
+                    <h3 style="font-size: 1.1em; margin-bottom: 5px;">{i+1}. {paper_data.get('title')}</h3>
+                    <p style="font-style: italic; color: #555; margin-top: 0;">{author_line}</p>
+
+                    <h4 style="font-weight: bold; margin-bottom: 5px;">Synthesis</h4>
+                    <p>{analysis.get('synthesis')}</p>
+
+                    <h4 style="font-weight: bold; margin-bottom: 5px;">Why it matters?</h4>
+                    <p>{analysis.get('usefulness')}</p>
+
+                    <a href="{paper_data.get('url')}" style="font-weight: bold; text-decoration: none;">Read the full paper &rarr;</a>
                 </div>
             """
 
-        # Construct the full issue body in HTML
-        if newsletter_data.get('is_sota'):
-            content_html = md_lib.markdown(created_issue.get('contentMarkdown', ''), extensions=['extra'])
-            body = f"""
-                <p>Dear {user_name},</p>
-                <p>Your latest research digest on <strong>{newsletter.get('topic')}</strong> is ready.</p>
-                <hr>
-                <h1>{created_issue.get('title')}</h1>
-                <div style="line-height:1.8">{content_html}</div>
-                <hr>
-                <p>View the full issue on your dashboard: <a href="{issue_link}">{issue_link}</a></p>
-                {mark_as_read_section}
-                {feedback_section}
-                <p>Best regards,<br>The My Research Digest Team</p>
-            """
-        else:
-            papers_html = ""
-            for i, p in enumerate(papers):
-                paper_data = p['paper']
-                analysis = p['analysis']
-                authors = ", ".join([author.get('name', 'N/A') for author in paper_data.get('authors', [])])
-                venue = (paper_data.get('publicationVenue') or {}).get('name')
-                author_line = f"by {authors}"
-                if venue:
-                    author_line += f" ({venue})"
-
-                papers_html += f"""
-                    <div style="border: 1px solid #eee; padding: 15px; margin-bottom: 20px; border-radius: 5px;">
-                        <h3 style="font-size: 1.1em; margin-bottom: 5px;">{i+1}. {paper_data.get('title')}</h3>
-                        <p style="font-style: italic; color: #555; margin-top: 0;">{author_line}</p>
-
-                        <h4 style="font-weight: bold; margin-bottom: 5px;">Synthesis</h4>
-                        <p>{analysis.get('synthesis')}</p>
-
-                        <h4 style="font-weight: bold; margin-bottom: 5px;">Why it matters?</h4>
-                        <p>{analysis.get('usefulness')}</p>
-
-                        <a href="{paper_data.get('url')}" style="font-weight: bold; text-decoration: none;">Read the full paper &rarr;</a>
-                    </div>
-                """
+        body = f"""
+            <p>Dear {user_name},</p>
+            <p>Your latest My Research Digest issue on topic <strong>{newsletter.get('topic')}</strong> is ready! We've summarized the latest papers for you below.</p>
+            <hr>
+            <h1>{created_issue.get('title')}</h1>
 
-            body = f"""
-                <p>Dear {user_name},</p>
-                <p>Your latest My Research Digest issue on topic <strong>{newsletter.get('topic')}</strong> is ready! We've summarized the latest papers for you below.</p>
-                <hr>
-                <h1>{created_issue.get('title')}</h1>
-
-                <h2>Introduction</h2>
-                <div>{created_issue.get('introduction', '').replace(chr(10), '<br>')}</div>
-
-                <h2>Featured Research Papers</h2>
-                {papers_html}
-
-                <h2>Conclusion</h2>
-                <div>{created_issue.get('conclusion', '').replace(chr(10), '<br>')}</div>
-
-                <hr>
-                <p>You can also view the full issue on your dashboard: <a href="{issue_link}">{issue_link}</a></p>
-                {mark_as_read_section}
-                {feedback_section}
-                <p>Best regards,</p>
-                <p>The My Research Digest Team</p>
-            """
-        send_email(subject, body, user_email, is_html=True)
-    else:
-        logging.warning(f"No email found for user {user_id} of newsletter {topic}")
+            <h2>Introduction</h2>
+            <div>{created_issue.get('introduction', '').replace(chr(10), '<br>')}</div>
 
-    return {"outcome": "success", "papers_found": len(papers), "issue_id": str(created_issue['_id'])}
+            <h2>Featured Research Papers</h2>
+            {papers_html}
 
+            <h2>Conclusion</h2>
+            <div>{created_issue.get('conclusion', '').replace(chr(10), '<br>')}</div>
 
-async def main():
-    """Main function to run the newsletter generation cycle."""
-    api_client = ApiClient(os.getenv('NODE_API_BASE_URL'))
-    while True:
-        logging.info("Starting daily newsletter generation cycle...")
+            <hr>
+            <p>You can also view the full issue on your dashboard: <a href="{issue_link}">{issue_link}</a></p>
+            {mark_as_read_section}
+            {feedback_section}
+            <p>Best regards,</p>
+            <p>The My Research Digest Team</p>
+        """
+    send_email(subject, body, user_email, is_html=True)
 
-        newsletters = api_client.get_newsletters()
-        if not newsletters:
-            logging.warning("No newsletters found. Retrying in 24 hours.")
-            worker_state.next_cycle_at = (datetime.now() + timedelta(hours=24)).isoformat()
-            await _interruptible_sleep(24 * 60 * 60)
-            continue
 
-        active_newsletters = [n for n in newsletters if n.get('status') == 'active']
-        worker_state.status = "running"
-        worker_state.cycle_started_at = datetime.now().isoformat()
-        worker_state.cycle_completed_at = None
-        worker_state.next_cycle_at = None
-        worker_state.cycle_log = []
-        worker_state.should_stop = False
-        worker_state.total_newsletters = len(active_newsletters)
-        worker_state.processed_count = 0
+async def process_newsletter(api_client, newsletter, state=None):
+    """Processes a single newsletter end to end, through the pipeline of the daily cycle. Returns the outcome of its job."""
+    jobs = await build_pipeline(api_client, state=state).run([newsletter])
+    return jobs[0].outcome
+
+
+def build_pipeline(api_client, state=None, search_coalescer=None, hedger=None, batch_collector=None, checkpoints=None, leases=None, cache=None):
+    """
+    Builds the staged pipeline used by the daily cycle. Each stage has its own pool of
+    workers (see config.WORKER_CONCURRENCY), so that the search for one newsletter
+    overlaps with the LLM work and the persistence of the others.
+    Searches go through `search_coalescer` when given, so newsletters sharing queries share results.
+    With a `hedger` (a SearchHedger), slow search queries are also sent to the fallback engine.
+    With a `batch_collector`, the LLM calls of the generating stage go through the Batch API: up to
+    LLM_BATCH_MAX_NEWSLETTERS newsletters wait for their batches together, and each one moves on
+    to the persisting stage as soon as its last batch completes.
+    With `checkpoints` (a CheckpointStore), the output of each stage is saved, and newsletters whose
+    run was interrupted by a restart or a stop resume after their last completed stage.
+    With `leases` (a ShardCoordinator), the lease of each newsletter is released once it is finished.
+    With `cache` (a CycleCache), users, unread counts and latest issue dates come from its bulk requests.
+    Each newsletter has NEWSLETTER_BUDGET_SECONDS for its checks, search and generation (not counting
+    the time spent waiting between stages, nor the Batch API): the calls it makes are capped by what
+    is left, and it is dropped with a "timeout" outcome once the budget is spent.
+    """
+
+    def budgeted(handler):
+        if not NEWSLETTER_BUDGET_SECONDS:
+            return handler
+
+        async def run(job):
+            left = job.data.setdefault('budget_left', NEWSLETTER_BUDGET_SECONDS)
+            started = time.monotonic()
+            try:
+                if left <= 0:
+                    raise DeadlineExceeded("The time budget is spent")
+                with budget(left):
+                    return await asyncio.wait_for(handler(job), left)
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                logging.warning(f"Newsletter '{job.item.get('topic', 'N/A')}' ran out of its {NEWSLETTER_BUDGET_SECONDS:.0f}s time budget.")
+                job.outcome = {"outcome": "timeout", "papers_found": 0, "issue_id": None}
+                return False
+            finally:
+                job.data['budget_left'] = left - (time.monotonic() - started)
+        return run
+
+    async def check(job):
+        newsletter = job.item
+        topic = newsletter.get('topic', 'N/A')
+        logging.info(f"Processing newsletter: {topic}")
+
+        if newsletter.get('status') == 'inactive':
+            logging.info(f"Newsletter '{topic}' is inactive. Skipping.")
+            job.outcome = {"outcome": "inactive", "papers_found": 0, "issue_id": None}
+            return False
+
+        # An interrupted run is resumed even if the newsletter is no longer due (e.g. its frequency changed)
+        resuming = checkpoints is not None and await asyncio.to_thread(checkpoints.has_run, str(newsletter['_id']))
+        if not resuming and not await asyncio.to_thread(is_newsletter_due, api_client, newsletter, cache):
+            latest_issue_date = None
+            if cache and not newsletter.get('lastSearch'):
+                latest_issue_date = await asyncio.to_thread(cache.latest_issue_date, newsletter)
+            job.data['due_at'] = next_due_at(newsletter, latest_issue_date)
+            job.outcome = {"outcome": "skipped", "papers_found": 0, "issue_id": None}
+            return False
+
+        # Unread issues only matter for the newsletters about to get a new one
+        if newsletter.get('status') == 'active':
+            await check_newsletter_inactivity(api_client, newsletter, cache)
+        return True
+
+    async def search(job):
+        newsletter = job.item
+        start_date, end_date = get_search_window(newsletter)
+        params = get_creation_params(newsletter)
+        creator = NewsletterCreator(api_client=api_client, search_coalescer=search_coalescer, hedger=hedger)
+        run = None
+        if checkpoints is not None:
+            run = await asyncio.to_thread(checkpoints.start_run, str(newsletter['_id']), start_date, end_date)
+            start_date, end_date = run.start_date, run.end_date
+        job.data['run'] = run
+        job.data['idempotency_key'] = idempotency_key(str(newsletter['_id']), start_date, end_date)
+
+        job.data['user_email'], job.data['user_name'] = await asyncio.to_thread(
+            get_user_contact, api_client, newsletter.get('userId'), cache)
+        job.data['creator'] = creator
+        if run is not None and await asyncio.to_thread(run.__contains__, "searched"):
+            logging.info(f"Resuming newsletter '{newsletter.get('topic', 'N/A')}' from its checkpoints ({start_date} to {end_date}).")
+            job.data['papers'] = await asyncio.to_thread(run.get, "searched")
+            return True
+
+        logging.info(f"Searching for new papers for newsletter '{newsletter.get('topic', 'N/A')}'...")
+        job.data['papers'] = await creator.search(
+            newsletter['topic'],
+            description=params['description'],
+            start_date=start_date,
+            end_date=end_date,
+            queries=params['queries'],
+            filters=params['filters'],
+            newsletter_id=newsletter['_id'],
+            search_engine=params['search_engine'],
+            max_papers=params['max_papers'],
+            max_candidates=params['max_candidates'],
+        )
+        if run is not None:
+            await asyncio.to_thread(run.put, "searched", job.data['papers'])
+        return True
+
+    async def generate(job):
+        newsletter = job.item
+        params = get_creation_params(newsletter)
+        creator = job.data['creator']
+        if batch_collector:
+            creator = NewsletterCreator(api_client=api_client, client=batch_collector.client(), llm_scheduler=batch_collector)
+        job.data['result'] = await creator.generate_newsletter(
+            newsletter['topic'],
+            job.data['papers'],
+            description=params['description'],
+            nb_papers=params['nb_papers'],
+            ranking_strategy=params['ranking_strategy'],
+            issue_format=params['issue_format'],
+            checkpoint=job.data['run'],
+        )
+        return True
+
+    async def persist(job):
+        newsletter = job.item
+        result = job.data['result']
+        if not result or len(result.get('papers', [])) == 0:
+            # Nothing to persist, the emailing stage notifies the user
+            return True
+
+        run = job.data['run']
+        if run is not None and await asyncio.to_thread(run.__contains__, "persisted"):
+            job.data['created_issue'] = await asyncio.to_thread(run.get, "persisted")
+            return True
+
+        logging.info(f"Creating a new issue for newsletter '{newsletter.get('topic', 'N/A')}'...")
+        created_issue = await asyncio.to_thread(
+            create_issue_and_papers, api_client, newsletter, result['newsletter'], result['papers'], job.data['idempotency_key'])
+        if not created_issue:
+            job.outcome = {"outcome": "error", "papers_found": len(result['papers']), "issue_id": None}
+            return False
+        if run is not None:
+            await asyncio.to_thread(run.put, "persisted", created_issue)
+        job.data['created_issue'] = created_issue
+        return True
+
+    async def email(job):
+        newsletter = job.item
+        topic = newsletter.get('topic', 'N/A')
+        result = job.data['result']
+        user_email, user_name = job.data['user_email'], job.data['user_name']
+
+        if not result or len(result.get('papers', [])) == 0:
+            logging.warning(f"No papers found for topic '{topic}'.")
+            if user_email:
+                await asyncio.to_thread(send_no_papers_email, newsletter, user_email, user_name)
+            await finish_run(job)
+            job.outcome = {"outcome": "no_papers", "papers_found": 0, "issue_id": None}
+            return False
+
+        created_issue = job.data['created_issue']
+        papers = result['papers']
+        if user_email:
+            await asyncio.to_thread(
+                send_issue_email, newsletter, result['newsletter'], created_issue, papers,
+                newsletter.get('userId'), user_email, user_name)
+        else:
+            logging.warning(f"No email found for user {newsletter.get('userId')} of newsletter {topic}")
+        await finish_run(job)
+        job.outcome = {"outcome": "success", "papers_found": len(papers), "issue_id": str(created_issue['_id'])}
+        return False
+
+    async def finish_run(job):
+        # lastSearch is only updated once the newsletter is delivered: until then it stays due,
+        # so a run interrupted after its generation is resumed from its checkpoints
+        await asyncio.to_thread(
+            api_client.update_newsletter, job.item['_id'], {'lastSearch': datetime.now().isoformat()})
+        # The newsletter is delivered, the next cycle starts a new run
+        if job.data['run'] is not None:
+            await asyncio.to_thread(job.data['run'].finish)
+
+    def on_stage_start(job, step):
+        if state:
+            newsletter = job.item
+            state.in_progress[str(newsletter['_id'])] = {"topic": newsletter.get('topic', 'N/A'), "step": step}
+            state.current_newsletter_topic = newsletter.get('topic', 'N/A')
+            state.current_step = step
+
+    def on_done(job):
+        newsletter = job.item
+        if leases is not None:
+            # A newsletter dropped by a stop is left to the next cycle, of this worker or another one,
+            # and a newsletter that isn't due is left alone until it is
+            due_at = job.data.get('due_at')
+            leases.finish(str(newsletter['_id']), done=job.outcome.get("outcome") != "stopped",
+                          done_ttl=max(due_at - time.time(), 60) if due_at else None)
+        if not state:
+            return
+        state.in_progress.pop(str(newsletter['_id']), None)
+        if job.outcome.get("outcome") == "stopped":
+            return
+        state.cycle_log.append({
+            "topic": newsletter.get('topic', 'N/A'),
+            "newsletter_id": str(newsletter['_id']),
+            "status": job.outcome.get("outcome", "error"),
+            "papers_found": job.outcome.get("papers_found", 0),
+            "issue_id": job.outcome.get("issue_id"),
+        })
+        if newsletter.get('status') == 'active':
+            state.processed_count += 1
+
+    return StagedPipeline(
+        [
+            Stage("checking", budgeted(check), concurrency=WORKER_CONCURRENCY["checking"], cancellable=True),
+            Stage("searching", budgeted(search), concurrency=WORKER_CONCURRENCY["searching"], cancellable=True),
+            # Batch API generations wait for their batches for up to a day
+            Stage("generating", generate if batch_collector else budgeted(generate),
+                  concurrency=LLM_BATCH_MAX_NEWSLETTERS if batch_collector else WORKER_CONCURRENCY["generating"]),
+            Stage("persisting", persist, concurrency=WORKER_CONCURRENCY["persisting"]),
+            Stage("emailing", email, concurrency=WORKER_CONCURRENCY["emailing"]),
+        ],
+        queue_size=WORKER_QUEUE_SIZE,
+        on_stage_start=on_stage_start,
+        on_done=on_done,
+        should_stop=lambda: bool(state and state.should_stop),
+    )
 
-        for newsletter in newsletters:
-            if worker_state.should_stop:
-                logging.info("Stop requested. Halting cycle.")
-                break
 
-            worker_state.current_newsletter_topic = newsletter.get('topic', 'N/A')
+# Fields of the newsletters the scheduler needs, and those a cycle needs
+SCHEDULE_FIELDS = ['status', 'frequency', 'lastSearch', 'lastIssueDate']
+CYCLE_FIELDS = SCHEDULE_FIELDS + ['userId', 'topic', 'description', 'queries', 'filters', 'rankingStrategy',
+                                  'issueFormat', 'searchEngine', 'inactivityWarningSentAt']
+
+
+async def sync_schedule(api_client, scheduler, full=False):
+    """
+    Loads the due times of the newsletters into the scheduler: all active ones on the first call,
+    every SCHEDULER_FULL_SYNC_SECONDS or when `full`, otherwise only those updated since the last
+    sync. Newsletters are streamed page by page. Returns False when they could not be fetched.
+    """
+    started_at = time.time()
+    incremental = (not full and scheduler.synced_at is not None
+                   and started_at - scheduler.full_synced_at < SCHEDULER_FULL_SYNC_SECONDS)
+
+    def load():
+        if incremental:
+            # A minute of overlap covers the clock skew with the Node API, updates are idempotent.
+            # Deactivated newsletters are listed too, so they are unscheduled
+            since = datetime.fromtimestamp(scheduler.synced_at - 60, timezone.utc).isoformat()
+            for newsletter in api_client.iter_newsletters(updated_since=since, fields=SCHEDULE_FIELDS):
+                scheduler.update(newsletter)
+        else:
+            scheduler.replace_all(api_client.iter_newsletters(status='active', fields=SCHEDULE_FIELDS))
+            scheduler.full_synced_at = started_at
+
+    try:
+        await asyncio.to_thread(load)
+    except requests.exceptions.RequestException:
+        return False
+    scheduler.synced_at = started_at
+    return True
+
+
+async def stream_due_newsletters(api_client, due_ids, due_before, cache=None):
+    """
+    Yields the active newsletters of `due_ids` (IDs popped from the scheduler, earliest deadline
+    first) in that order, with the fields of CYCLE_FIELDS. They are fetched NEWSLETTER_PAGE_SIZE IDs
+    at a time, and those no longer due before `due_before` (a timestamp), e.g. processed by another
+    worker in the meantime, are left out. The users, unread counts and latest issue dates of each
+    page are prefetched into the `cache`.
+    """
+    due_before = datetime.fromtimestamp(due_before, timezone.utc).isoformat()
+    for i in range(0, len(due_ids), NEWSLETTER_PAGE_SIZE):
+        chunk = due_ids[i:i + NEWSLETTER_PAGE_SIZE]
+        pages = api_client.iter_newsletter_pages(
+            status='active', due_before=due_before, ids=chunk, fields=CYCLE_FIELDS, page_size=len(chunk))
+        try:
+            page = [newsletter for fetched in await asyncio.to_thread(list, pages) for newsletter in fetched]
+        except requests.exceptions.RequestException:
+            logging.warning("Could not fetch the next page of due newsletters, it is left to the next cycle.")
+            return
+        if cache:
+            await asyncio.to_thread(cache.prefetch, page)
+        order = {newsletter_id: position for position, newsletter_id in enumerate(chunk)}
+        for newsletter in sorted(page, key=lambda n: order.get(str(n['_id']), len(order))):
+            yield newsletter
+
+
+def reschedule(scheduler, due_ids, jobs):
+    """Schedules the newsletters of a cycle again, from the outcome of their jobs."""
+    now = time.time()
+    finished = set()
+    for job in jobs:
+        newsletter = job.item
+        newsletter_id = str(newsletter['_id'])
+        finished.add(newsletter_id)
+        outcome = job.outcome.get("outcome")
+        if outcome in ("success", "no_papers"):
+            scheduler.update({**newsletter, 'lastSearch': datetime.now().isoformat()})
+        elif outcome == "inactive":
+            scheduler.remove(newsletter_id)
+        elif outcome == "skipped" and job.data.get('due_at'):
+            scheduler.defer(newsletter_id, job.data['due_at'])
+        else:
+            scheduler.defer(newsletter_id, now + SCHEDULER_RETRY_SECONDS)
+    # Due newsletters processed by another worker, or not fed before a stop: the next sync
+    # brings the new lastSearch of the former
+    for newsletter_id in due_ids:
+        if newsletter_id not in finished:
+            scheduler.defer(newsletter_id, now + SCHEDULER_RETRY_SECONDS)
+
+
+async def run_cycle(api_client, newsletters=None, due_ids=None, coordinator=None, registered=None, total=0):
+    """
+    Runs the newsletters through the pipeline: the given ones, or those of `due_ids` (in that order)
+    still due now, streamed from the API. With a `coordinator`, newsletters are instead claimed among the `registered` ones, in
+    competition with the other workers. `total` is the number of newsletters of the cycle, for
+    the worker state.
+    """
+    worker_state.status = "running"
+    worker_state.cycle_started_at = datetime.now().isoformat()
+    worker_state.cycle_completed_at = None
+    worker_state.next_cycle_at = None
+    worker_state.cycle_log = []
+    worker_state.should_stop = False
+    worker_state.total_newsletters = len(newsletters) if newsletters is not None else total
+    worker_state.processed_count = 0
+    worker_state.in_progress = {}
+
+    # Search results are shared between newsletters for the duration of the cycle
+    search_coalescer = SearchCoalescer()
+    worker_state.search_stats = search_coalescer.stats
+    hedger = SearchHedger() if SEARCH_HEDGING_ENABLED else None
+    worker_state.hedge_stats = hedger.stats if hedger else {}
+
+    # Users, unread counts and latest issue dates of the due newsletters, in a few requests
+    cache = CycleCache(api_client)
+    worker_state.api_stats = cache.stats
+    if newsletters is not None:
+        await asyncio.to_thread(cache.prefetch, newsletters)
+    elif not coordinator:
+        newsletters = stream_due_newsletters(api_client, due_ids or [], time.time(), cache)
+
+    batch_collector = None
+    if LLM_BATCH_MODE:
+        batch_collector = BatchCollector(backend=LocalBatchBackend() if LLM_BATCH_BACKEND == "local" else None)
+        worker_state.llm_batch_stats = batch_collector.stats
+
+    checkpoints = get_checkpoint_store() if CHECKPOINT_ENABLED else None
+    pipeline = build_pipeline(api_client, state=worker_state, search_coalescer=search_coalescer, hedger=hedger, batch_collector=batch_collector,
+                              checkpoints=checkpoints, leases=coordinator, cache=cache)
+    if coordinator:
+        # Newsletters are claimed as the pipeline takes them, in competition with the other workers
+        await coordinator.start(registered, state=worker_state)
+        try:
+            jobs = await pipeline.run(coordinator.claimed(should_stop=lambda: worker_state.should_stop))
+        finally:
+            await coordinator.stop()
+    else:
+        jobs = await pipeline.run(newsletters)
+
+    author_cache = get_author_cache()
+    logging.info(f"Author h-index cache hit rate: {author_cache.hit_rate():.0%} ({author_cache.stats})")
+    logging.info(f"Newsletter generation cycle finished ({cache.stats['bulk_requests']} bulk and "
+                 f"{cache.stats['single_requests']} single control-plane requests).")
+    if hedger:
+        logging.info(f"Hedged {hedger.stats['hedge_rate']:.0%} of the search queries, the hedges won "
+                     f"{hedger.stats['hedge_wins']} times and saved {hedger.stats['saved_seconds']:.1f}s.")
+    worker_state.status = "idle"
+    worker_state.cycle_completed_at = datetime.now().isoformat()
+    worker_state.current_newsletter_topic = None
+    worker_state.current_step = None
+    worker_state.in_progress = {}
+    if coordinator:
+        await coordinator.report()
+    return jobs
 
-            try:
-                if newsletter.get('status') == 'active':
-                    await check_newsletter_inactivity(api_client, newsletter)
-                outcome = await process_newsletter(api_client, newsletter, state=worker_state)
-            except Exception as e:
-                logging.error(f"Unhandled error processing newsletter '{newsletter.get('topic')}': {e}")
-                outcome = {"outcome": "error", "papers_found": 0, "issue_id": None}
-
-            if outcome:
-                worker_state.cycle_log.append({
-                    "topic": newsletter.get('topic', 'N/A'),
-                    "newsletter_id": str(newsletter['_id']),
-                    "status": outcome.get("outcome", "error"),
-                    "papers_found": outcome.get("papers_found", 0),
-                    "issue_id": outcome.get("issue_id"),
-                })
-            if newsletter.get('status') == 'active':
-                worker_state.processed_count += 1
-
-        logging.info("Daily newsletter generation cycle finished.")
-        worker_state.status = "idle"
-        worker_state.cycle_completed_at = datetime.now().isoformat()
-        worker_state.next_cycle_at = (datetime.now() + timedelta(hours=24)).isoformat()
-        worker_state.current_newsletter_topic = None
-        worker_state.current_step = None
-
-        await _interruptible_sleep(24 * 60 * 60)
-
-
-async def _interruptible_sleep(total_seconds: int):
-    """Sleep in 30-second chunks, breaking early if manual_trigger is set."""
+
+async def main():
+    """
+    Main function of the worker. Newsletters are kept in a due-time scheduler: the worker sleeps
+    until the earliest one is due (or the next sync of the updated newsletters), then processes
+    the due ones, earliest deadline first.
+    """
+    # The blocking client, called through asyncio.to_thread: the scheduler sync, the cycle cache, the
+    # leases and the persistence of the issues all run in threads (see AsyncApiClient)
+    api_client = ApiClient(os.getenv('NODE_API_BASE_URL'))
+    coordinator = None
+    if WORKER_SHARDING:
+        coordinator = ShardCoordinator(get_lease_backend(WORKER_LEASE_BACKEND, api_client))
+        worker_state.worker_id = coordinator.worker_id
+        logging.info(f"Newsletters are sharded between the workers, this one is {coordinator.worker_id}.")
+    scheduler = DueScheduler()
+    woken = False
+    while True:
+        if not await sync_schedule(api_client, scheduler, full=woken):
+            logging.warning("Could not fetch the newsletters. Retrying at the next sync.")
+        worker_state.scheduled_newsletters = len(scheduler)
+
+        due = scheduler.pop_due(time.time())
+        # A worker of a shard group joins the cycles of the others, its scheduler may lag behind
+        if due or (coordinator and woken):
+            logging.info(f"Starting newsletter generation cycle for {len(due)} due newsletters...")
+            # Newsletters are streamed from the API rather than held for the whole cycle
+            registered = api_client.iter_newsletters(status='active', fields=CYCLE_FIELDS) if coordinator else None
+            jobs = await run_cycle(api_client, due_ids=due, coordinator=coordinator, registered=registered,
+                                   total=len(scheduler) if coordinator else len(due))
+            reschedule(scheduler, due, jobs)
+        elif woken:
+            logging.info("No newsletter is due.")
+
+        next_due = scheduler.next_due()
+        sleep_seconds = SCHEDULER_SYNC_SECONDS if next_due is None else min(max(next_due - time.time(), 1), SCHEDULER_SYNC_SECONDS)
+        worker_state.next_cycle_at = datetime.fromtimestamp(next_due).isoformat() if next_due is not None else None
+        woken = await _interruptible_sleep(sleep_seconds, coordinator)
+
+
+async def _interruptible_sleep(total_seconds: float, coordinator=None) -> bool:
+    """
+    Sleep in 30-second chunks, breaking early if manual_trigger is set, or when another
+    worker of the shard group started a cycle (with a `coordinator`). Returns whether it broke early.
+    """
     elapsed = 0
     while elapsed < total_seconds:
         if worker_state.manual_trigger:
             worker_state.manual_trigger = False
             logging.info("Manual trigger received — starting new cycle.")
-            break
+            return True
+        if coordinator and await coordinator.other_cycle_started(worker_state.cycle_completed_at):
+            logging.info("Another worker started a cycle — joining it.")
+            return True
         chunk = min(30, total_seconds - elapsed)
         await asyncio.sleep(chunk)
         elapsed += chunk
+    return False
 
 
 if __name__ == "__main__":
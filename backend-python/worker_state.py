@@ -7,12 +7,20 @@ class WorkerState:
     status: str = "idle"  # "idle" | "running" | "stopping"
     cycle_started_at: Optional[str] = None
     cycle_completed_at: Optional[str] = None
-    next_cycle_at: Optional[str] = None
+    next_cycle_at: Optional[str] = None  # when the earliest scheduled newsletter is due
+    scheduled_newsletters: int = 0
     total_newsletters: int = 0
     processed_count: int = 0
     current_newsletter_topic: Optional[str] = None
-    current_step: Optional[str] = None  # "checking" | "searching" | "persisting" | "emailing"
+    current_step: Optional[str] = None  # "checking" | "searching" | "generating" | "persisting" | "emailing"
+    in_progress: Dict[str, Dict] = field(default_factory=dict)  # { newsletter_id: {"topic", "step"} }
     cycle_log: List[Dict] = field(default_factory=list)
+    search_stats: Dict = field(default_factory=dict)  # search coalescer hits/misses of the current cycle
+    hedge_stats: Dict = field(default_factory=dict)  # hedged search queries and time saved in the current cycle
+    llm_batch_stats: Dict = field(default_factory=dict)  # Batch API requests and batches of the current cycle
+    api_stats: Dict = field(default_factory=dict)  # bulk and single control-plane requests of the current cycle
+    worker_id: Optional[str] = None  # set when the cycle is sharded across workers
+    shards: List[Dict] = field(default_factory=list)  # progress reported by the live workers of the shard group
     should_stop: bool = False
     manual_trigger: bool = False
 
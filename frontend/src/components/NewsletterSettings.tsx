@@ -35,6 +35,7 @@ interface Newsletter {
   rankingStrategy: 'author_based' | 'embedding_based';
   frequency: 'weekly' | 'biweekly' | 'monthly';
   issueFormat: 'classic' | 'state_of_the_art';
+  searchEngine?: 'semantic_scholar' | 'openalex' | 'all' | 'local';
   queries: string[];
   filters?: {
     venues: string[];
@@ -118,6 +119,7 @@ export function NewsletterSettings({ onSave }: { onSave?: () => void }) {
         rankingStrategy: newsletter.rankingStrategy,
         frequency: newsletter.frequency,
         issueFormat: newsletter.issueFormat,
+        searchEngine: newsletter.searchEngine,
         queries: newsletter.queries,
         filters: newsletter.filters,
       });
@@ -329,6 +331,27 @@ export function NewsletterSettings({ onSave }: { onSave?: () => void }) {
               </Select>
             </div>
 
+            <div className="space-y-3">
+              <div className="space-y-1">
+                <Label className="text-base">Search Engine</Label>
+                <p className="text-sm text-muted-foreground">Where should the AI look for new papers?</p>
+              </div>
+              <Select
+                value={newsletter.searchEngine ?? 'semantic_scholar'}
+                onValueChange={(value: 'semantic_scholar' | 'openalex' | 'all' | 'local') => setNewsletter({ ...newsletter, searchEngine: value })}
+              >
+                <SelectTrigger className="w-full">
+                  <SelectValue placeholder="Select search engine" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="semantic_scholar">Semantic Scholar</SelectItem>
+                  <SelectItem value="openalex">OpenAlex</SelectItem>
+                  <SelectItem value="all">Both (Semantic Scholar + OpenAlex)</SelectItem>
+                  <SelectItem value="local">Local corpus (offline)</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+
             <div className="flex items-center justify-between p-4 border rounded-lg">
               <div className="space-y-0.5">
                 <Label className="text-base">